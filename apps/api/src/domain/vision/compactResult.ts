@@ -0,0 +1,156 @@
+// Rebuilds full vision results from the compact delta encoding the Pi pusher sends
+// (rasperrypi/vision_service/domain/compact_codec.py; the field layout is documented there).
+
+export const COMPACT_VERSION = 1;
+const DET_STRIDE = 6;
+const CONF_SCALE = 1000;
+const COORD_SCALE = 10000;
+const DEL_KEY = "__del__";
+
+export interface VisionDetection {
+  label: string;
+  class: string;
+  confidence: number;
+  conf: number;
+  x1: number;
+  y1: number;
+  x2: number;
+  y2: number;
+  bbox: number[];
+  extra?: Record<string, unknown>;
+}
+
+export interface VisionResult {
+  ts_ms: number;
+  source_frame_ts_ms: number;
+  frame: { width: number; height: number };
+  detections: VisionDetection[];
+  extra?: Record<string, unknown>;
+}
+
+// The delta references a base this decoder no longer has (e.g. after an API restart); the sender answers
+// a 409 with a keyframe
+export class UnknownBaseError extends Error {}
+
+function isRecord(v: unknown): v is Record<string, unknown> {
+  return typeof v === "object" && v !== null && !Array.isArray(v);
+}
+
+function num(v: unknown, field: string): number {
+  if (typeof v !== "number" || !Number.isFinite(v)) throw new Error(`${field} must be a finite number`);
+  return v;
+}
+
+function applyPatch(base: Record<string, unknown>, patch: Record<string, unknown>): Record<string, unknown> {
+  const out: Record<string, unknown> = { ...base };
+  const removed = patch[DEL_KEY];
+  if (Array.isArray(removed)) {
+    for (const k of removed) delete out[String(k)];
+  }
+  for (const [k, v] of Object.entries(patch)) {
+    if (k === DEL_KEY || k === "__proto__") continue;
+    const bv = out[k];
+    out[k] = isRecord(bv) && isRecord(v) && k in base ? applyPatch(bv, v) : v;
+  }
+  return out;
+}
+
+function labelsOf(full: VisionResult): string[] {
+  const labels: string[] = [];
+  for (const d of full.detections) {
+    if (!labels.includes(d.label)) labels.push(d.label);
+  }
+  return labels;
+}
+
+export function decodeCompact(msg: unknown, base: VisionResult | null): VisionResult {
+  if (!isRecord(msg)) throw new Error("message must be an object");
+  if (msg.v !== COMPACT_VERSION) throw new Error(`unsupported compact version: ${String(msg.v)}`);
+
+  const baseTs = msg.b === undefined ? null : num(msg.b, "b");
+  if (baseTs !== null && (!base || base.ts_ms !== baseTs)) throw new UnknownBaseError(`delta against unknown base ${baseTs}`);
+
+  const ts = num(msg.ts, "ts");
+  let frame: { width: number; height: number };
+  if (msg.fr !== undefined) {
+    if (!Array.isArray(msg.fr) || msg.fr.length !== 2) throw new Error("fr must be [width, height]");
+    frame = { width: num(msg.fr[0], "fr"), height: num(msg.fr[1], "fr") };
+  } else if (base) {
+    frame = { ...base.frame };
+  } else {
+    throw new Error("keyframe without fr");
+  }
+
+  let labels: string[];
+  if (msg.lb !== undefined) {
+    if (!Array.isArray(msg.lb) || !msg.lb.every((l) => typeof l === "string")) throw new Error("lb must be a list of strings");
+    labels = msg.lb as string[];
+  } else {
+    labels = base ? labelsOf(base) : [];
+  }
+
+  const patch = msg.x === undefined ? {} : msg.x;
+  if (!isRecord(patch)) throw new Error("x must be an object");
+  const extra = baseTs === null ? { ...patch } : applyPatch(base?.extra ?? {}, patch);
+
+  const flat = msg.d === undefined ? [] : msg.d;
+  if (!Array.isArray(flat) || flat.length % DET_STRIDE !== 0) throw new Error(`d must be a list of ${DET_STRIDE}-tuples`);
+  const detExtras = msg.dx === undefined ? {} : msg.dx;
+  if (!isRecord(detExtras)) throw new Error("dx must be an object");
+
+  const detections: VisionDetection[] = [];
+  for (let i = 0; i < flat.length / DET_STRIDE; i++) {
+    const [li, c, x1, y1, x2, y2] = flat.slice(i * DET_STRIDE, (i + 1) * DET_STRIDE).map((v) => num(v, "d"));
+    const label = labels[li];
+    if (label === undefined) throw new Error(`label index ${li} out of range`);
+    const conf = c / CONF_SCALE;
+    const bbox = [x1 / COORD_SCALE, y1 / COORD_SCALE, x2 / COORD_SCALE, y2 / COORD_SCALE];
+    const d: VisionDetection = {
+      label,
+      class: label,
+      confidence: conf,
+      conf,
+      x1: bbox[0],
+      y1: bbox[1],
+      x2: bbox[2],
+      y2: bbox[3],
+      bbox
+    };
+    const de = detExtras[String(i)];
+    if (isRecord(de)) d.extra = de;
+    detections.push(d);
+  }
+
+  const sf = msg.sf === undefined ? 0 : num(msg.sf, "sf");
+  const full: VisionResult = { ts_ms: ts, source_frame_ts_ms: ts + sf, frame, detections };
+  if (Object.keys(extra).length > 0) full.extra = extra;
+  return full;
+}
+
+export class CompactDecoder {
+  // Keeps a few recent results: the sender may still be on an older base if our 2xx got lost
+  private readonly recent = new Map<number, VisionResult>();
+  private readonly keep: number;
+
+  constructor(keep = 8) {
+    this.keep = Math.max(1, Math.floor(keep));
+  }
+
+  decode(msg: unknown): VisionResult {
+    const baseTs = isRecord(msg) && typeof msg.b === "number" ? msg.b : null;
+    const full = decodeCompact(msg, baseTs !== null ? this.recent.get(baseTs) ?? null : null);
+    this.recent.set(full.ts_ms, full);
+    while (this.recent.size > this.keep) {
+      this.recent.delete(Math.min(...this.recent.keys()));
+    }
+    return full;
+  }
+
+  latest(): VisionResult | null {
+    let out: VisionResult | null = null;
+    for (const r of this.recent.values()) {
+      if (!out || r.ts_ms > out.ts_ms) out = r;
+    }
+    return out;
+  }
+}
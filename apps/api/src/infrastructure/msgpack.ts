@@ -0,0 +1,108 @@
+// Decode-only MessagePack reader for the vision compact uplink. Covers the types msgpack-python emits for
+// plain dicts/lists (no ext types), so the API needs no codec dependency.
+export function decodeMsgpack(buf: Uint8Array): unknown {
+  const view = new DataView(buf.buffer, buf.byteOffset, buf.byteLength);
+  const text = new TextDecoder("utf-8", { fatal: true });
+  let pos = 0;
+
+  function need(n: number) {
+    if (pos + n > buf.length) throw new Error("msgpack: truncated input");
+  }
+
+  function uint(n: 1 | 2 | 4 | 8): number {
+    need(n);
+    const at = pos;
+    pos += n;
+    if (n === 1) return view.getUint8(at);
+    if (n === 2) return view.getUint16(at);
+    if (n === 4) return view.getUint32(at);
+    return Number(view.getBigUint64(at));
+  }
+
+  function int(n: 1 | 2 | 4 | 8): number {
+    need(n);
+    const at = pos;
+    pos += n;
+    if (n === 1) return view.getInt8(at);
+    if (n === 2) return view.getInt16(at);
+    if (n === 4) return view.getInt32(at);
+    return Number(view.getBigInt64(at));
+  }
+
+  function float(n: 4 | 8): number {
+    need(n);
+    const at = pos;
+    pos += n;
+    return n === 4 ? view.getFloat32(at) : view.getFloat64(at);
+  }
+
+  function str(n: number): string {
+    need(n);
+    const s = text.decode(buf.subarray(pos, pos + n));
+    pos += n;
+    return s;
+  }
+
+  function bin(n: number): Uint8Array {
+    need(n);
+    const b = buf.slice(pos, pos + n);
+    pos += n;
+    return b;
+  }
+
+  function arr(n: number): unknown[] {
+    const out: unknown[] = [];
+    for (let i = 0; i < n; i++) out.push(read());
+    return out;
+  }
+
+  function map(n: number): Record<string, unknown> {
+    const out: Record<string, unknown> = {};
+    for (let i = 0; i < n; i++) {
+      const k = String(read());
+      const v = read();
+      if (k !== "__proto__") out[k] = v;
+    }
+    return out;
+  }
+
+  function read(): unknown {
+    need(1);
+    const b = buf[pos++];
+    if (b <= 0x7f) return b;
+    if (b >= 0xe0) return b - 0x100;
+    if ((b & 0xf0) === 0x80) return map(b & 0x0f);
+    if ((b & 0xf0) === 0x90) return arr(b & 0x0f);
+    if ((b & 0xe0) === 0xa0) return str(b & 0x1f);
+    switch (b) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(uint(1));
+      case 0xc5: return bin(uint(2));
+      case 0xc6: return bin(uint(4));
+      case 0xca: return float(4);
+      case 0xcb: return float(8);
+      case 0xcc: return uint(1);
+      case 0xcd: return uint(2);
+      case 0xce: return uint(4);
+      case 0xcf: return uint(8);
+      case 0xd0: return int(1);
+      case 0xd1: return int(2);
+      case 0xd2: return int(4);
+      case 0xd3: return int(8);
+      case 0xd9: return str(uint(1));
+      case 0xda: return str(uint(2));
+      case 0xdb: return str(uint(4));
+      case 0xdc: return arr(uint(2));
+      case 0xdd: return arr(uint(4));
+      case 0xde: return map(uint(2));
+      case 0xdf: return map(uint(4));
+    }
+    throw new Error(`msgpack: unsupported type 0x${b.toString(16)}`);
+  }
+
+  const out = read();
+  if (pos !== buf.length) throw new Error("msgpack: trailing bytes");
+  return out;
+}
@@ -1,7 +1,9 @@
 import express from "express";
-import type { VisionToOrchestratorMessage } from "@kozatakip/shared";
+import type { GrowthTrend, VisionToOrchestratorMessage } from "@kozatakip/shared";
 import type { MessageRepository } from "../../application/ports/messageRepository.js";
 import { ingestAgentMessage } from "../../application/usecases/ingestAgentMessage.js";
+import { CompactDecoder, UnknownBaseError } from "../../domain/vision/compactResult.js";
+import { decodeMsgpack } from "../../infrastructure/msgpack.js";
 
 function asyncHandler(
   fn: (req: express.Request, res: express.Response, next: express.NextFunction) => Promise<void>
@@ -159,6 +161,12 @@ async function proxyFetch(req: express.Request, res: express.Response, kind: "fr
   }
 }
 
+const GROWTH_TRENDS: readonly GrowthTrend[] = ["growing", "shrinking", "stable", "unknown"];
+
+function isGrowthTrend(v: unknown): v is GrowthTrend {
+  return typeof v === "string" && (GROWTH_TRENDS as readonly string[]).includes(v);
+}
+
 function normalizeVisionMessage(body: unknown): VisionToOrchestratorMessage | null {
   if (!body || typeof body !== "object") return null;
   const b = body as Record<string, unknown>;
@@ -166,12 +174,15 @@ function normalizeVisionMessage(body: unknown): VisionToOrchestratorMessage | nu
   const timestamp = typeof b.timestamp === "string" ? b.timestamp : null;
   const movement_index = b.movement_index;
   const size_change_ratio = b.size_change_ratio;
+  const raw_trend = b.growth_trend;
+  const growth_trend = isGrowthTrend(raw_trend) ? raw_trend : undefined;
   const texture_anomaly = b.texture_anomaly;
   const confidence = b.confidence;
 
   if (!timestamp) return null;
   if (!isFiniteNumber(movement_index)) return null;
   if (!isFiniteNumber(size_change_ratio)) return null;
+  if (raw_trend !== undefined && !growth_trend) return null;
   if (typeof texture_anomaly !== "boolean") return null;
   if (!isFiniteNumber(confidence)) return null;
 
@@ -180,6 +191,7 @@ function normalizeVisionMessage(body: unknown): VisionToOrchestratorMessage | nu
     timestamp,
     movement_index,
     size_change_ratio,
+    ...(growth_trend ? { growth_trend } : {}),
     texture_anomaly,
     confidence
   };
@@ -187,6 +199,7 @@ function normalizeVisionMessage(body: unknown): VisionToOrchestratorMessage | nu
 
 export function createVisionRouter(repo: MessageRepository) {
   const router = express.Router();
+  const compact = new CompactDecoder();
 
   router.get(
     "/proxy/frame",
@@ -222,6 +235,26 @@ export function createVisionRouter(repo: MessageRepository) {
     })
   );
 
+  // Full results from the Pi pusher in the compact delta encoding (KOZA_PUSH_COMPACT_PATH=/api/vision/results)
+  router.post(
+    "/results",
+    express.raw({ type: "application/x-msgpack", limit: "2mb" }),
+    (req: express.Request, res: express.Response) => {
+      try {
+        const msg = Buffer.isBuffer(req.body) ? decodeMsgpack(req.body) : req.body;
+        const full = compact.decode(msg);
+        res.status(200).json({ ok: true, ts_ms: full.ts_ms });
+      } catch (e: unknown) {
+        const status = e instanceof UnknownBaseError ? 409 : 400;
+        res.status(status).json({ error: e instanceof Error ? e.message : "Invalid payload" });
+      }
+    }
+  );
+
+  router.get("/results/latest", (_req: express.Request, res: express.Response) => {
+    res.json({ ok: true, latest: compact.latest() });
+  });
+
   router.get(
     "/latest",
     asyncHandler(async (_req: express.Request, res: express.Response) => {
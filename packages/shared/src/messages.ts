@@ -30,11 +30,14 @@ export interface EnvironmentToOrchestratorMessage {
   recommended_action: EnvironmentAction[];
 }
 
+export type GrowthTrend = "growing" | "shrinking" | "stable" | "unknown";
+
 export interface VisionToOrchestratorMessage {
   agent: "vision";
   timestamp: ISO8601;
   movement_index: number;
   size_change_ratio: number;
+  growth_trend?: GrowthTrend;
   texture_anomaly: boolean;
   confidence: number;
 }
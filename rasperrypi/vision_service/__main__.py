@@ -1,28 +1,85 @@
 from __future__ import annotations
 
+import threading
+import time
+
 import uvicorn
 
 from vision_service import config
+from vision_service.application.usecases import get_health, get_stats
 from vision_service.infrastructure.camera_source import OpenCvCameraSource
+from vision_service.infrastructure.clip_recorder import ClipRecorder
+from vision_service.infrastructure.memory_stats import MemoryStats
 from vision_service.infrastructure.opencv_metric_extractor import OpenCvMetricExtractor
 from vision_service.infrastructure.result_pusher import KozaApiResultPusher
+from vision_service.infrastructure.shm_bus import ShmPublisher
+from vision_service.infrastructure.thermal_governor import ThermalGovernor
 from vision_service.infrastructure.yolo_engine import UltralyticsYoloEngine
 from vision_service.presentation.http_api import create_app
 
 
+def _mark(startup: dict, name: str, t0: float) -> None:
+  startup[name] = float(round((time.monotonic() - t0) * 1000.0, 1))
+
+
 def main() -> None:
+  t0 = time.monotonic()
+  startup: dict = {}
+
   camera = OpenCvCameraSource()
   camera.start()
+  _mark(startup, "camera_started", t0)
 
+  # Model import/load/warmup runs in the engine's loader thread; motion metrics are served until it is ready
   metrics = OpenCvMetricExtractor()
   yolo = UltralyticsYoloEngine(camera, metric_extractor=metrics)
   yolo.start()
+  _mark(startup, "engine_started", t0)
 
-  pusher = KozaApiResultPusher(yolo)
+  pusher = KozaApiResultPusher(yolo, camera)
   pusher.start()
 
-  app = create_app(camera, yolo)
-  uvicorn.run(app, host=config.BIND_HOST, port=config.BIND_PORT)
+  governor = ThermalGovernor()
+  governor.start()
+
+  recorder = ClipRecorder(camera, yolo)
+  recorder.start()
+
+  memory = MemoryStats()
+
+  app = create_app(camera, yolo, startup=startup, governor=governor, recorder=recorder, memory=memory)
+  _mark(startup, "app_created", t0)
+
+  workers = max(1, int(config.HTTP_WORKERS))
+  publisher = None
+  if config.SHM_ENABLED or workers > 1:
+    publisher = ShmPublisher(
+      camera,
+      yolo,
+      health=lambda: get_health(yolo, camera, startup, governor),
+      stats=lambda: {**get_stats(yolo, camera, memory), "shm": publisher.status()},
+    )
+    publisher.start()
+
+  try:
+    if workers == 1:
+      uvicorn.run(app, host=config.BIND_HOST, port=config.BIND_PORT)
+      return
+
+    # Capture and inference stay in this process; the public port is served from shared memory by worker
+    # processes that do not share our GIL, and the full app keeps the control endpoints on CONTROL_PORT
+    control = uvicorn.Server(uvicorn.Config(app, host=config.BIND_HOST, port=config.CONTROL_PORT))
+    threading.Thread(target=control.run, daemon=True).start()
+    uvicorn.run(
+      "vision_service.presentation.shm_app:create_shm_app",
+      factory=True,
+      host=config.BIND_HOST,
+      port=config.BIND_PORT,
+      workers=workers,
+    )
+  finally:
+    if publisher is not None:
+      publisher.stop()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Protocol
+from typing import Any, Callable, Dict, Protocol
 
 from vision_service.domain.models import FramePacket, YoloResult
 
@@ -8,14 +8,30 @@ from vision_service.domain.models import FramePacket, YoloResult
 class FrameSource(Protocol):
   def latest(self) -> FramePacket | None: ...
 
+  def stats(self) -> Dict[str, Any]: ...
+
 
 class YoloEngine(Protocol):
   def latest(self) -> YoloResult | None: ...
 
+  def status(self) -> Dict[str, Any]: ...
+
+  def stats(self) -> Dict[str, Any]: ...
+
+  def subscribe(self, listener: Callable[[YoloResult], None]) -> None: ...
+
 
 class ResultPusher(Protocol):
   def maybe_push(self, yolo: YoloResult) -> None: ...
 
 
+class Governor(Protocol):
+  def status(self) -> Dict[str, Any]: ...
+
+
+class StatsProvider(Protocol):
+  def snapshot(self) -> Dict[str, Any]: ...
+
+
 class MetricExtractor(Protocol):
   def extract(self, img_bgr, label: str, x1: float, y1: float, x2: float, y2: float): ...
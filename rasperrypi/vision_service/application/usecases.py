@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
-from vision_service.application.ports import FrameSource, ResultPusher, YoloEngine
+from vision_service import runtime_settings
+from vision_service.application.ports import FrameSource, Governor, ResultPusher, StatsProvider, YoloEngine
 from vision_service.domain.models import yolo_result_to_jsonable
 
 
-def get_latest_frame_jpeg(source: FrameSource) -> bytes | None:
+def get_latest_frame_jpeg(source: FrameSource) -> bytes | memoryview | None:
   pkt = source.latest()
   return pkt.jpeg_bytes if pkt else None
 
@@ -19,6 +20,55 @@ def get_latest_yolo_json(engine: YoloEngine, frame_source: FrameSource) -> Dict[
   return yolo_result_to_jsonable(y, f.width, f.height)
 
 
+def get_health(
+  engine: YoloEngine,
+  frame_source: FrameSource,
+  startup: Dict[str, Any] | None = None,
+  governor: Governor | None = None,
+) -> Dict[str, Any]:
+  f = frame_source.latest()
+  model = engine.status()
+  return {
+    "ok": True,
+    "ready": bool(model.get("ready")),
+    "frame_available": f is not None,
+    "model": model,
+    **({"startup_ms": dict(startup)} if startup else {}),
+    **({"governor": governor.status()} if governor is not None else {}),
+  }
+
+
+def get_stats(engine: YoloEngine, frame_source: FrameSource, memory: StatsProvider | None = None) -> Dict[str, Any]:
+  return {
+    "settings_version": runtime_settings.current().version,
+    "camera": frame_source.stats(),
+    "engine": engine.stats(),
+    **({"memory": memory.snapshot()} if memory is not None else {}),
+  }
+
+
+def get_runtime_config(engine: YoloEngine, frame_source: FrameSource) -> Dict[str, Any]:
+  return {
+    "settings": runtime_settings.settings_to_dict(runtime_settings.STORE.base()),
+    "effective": runtime_settings.settings_to_dict(runtime_settings.current()),
+    "last_change": runtime_settings.STORE.last_change(),
+    "stats": get_stats(engine, frame_source),
+  }
+
+
+def update_runtime_config(patch: Any, engine: YoloEngine, frame_source: FrameSource) -> Tuple[Dict[str, Any], List[str]]:
+  if not isinstance(patch, dict):
+    return {}, ["body must be a non-empty object"]
+  changes = dict(patch)
+  expected = changes.pop("version", None)
+  if expected is not None and (isinstance(expected, bool) or not isinstance(expected, int)):
+    return {}, ["version: must be an integer"]
+  _, errors = runtime_settings.STORE.apply(changes, expected_version=expected, stats_before=get_stats(engine, frame_source))
+  if errors:
+    return {}, errors
+  return get_runtime_config(engine, frame_source), []
+
+
 def push_if_enabled(pusher: ResultPusher, engine: YoloEngine) -> None:
   y = engine.latest()
   if y:
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from vision_service import config
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTS = (".mp4", ".avi", ".mkv", ".mov", ".h264", ".mjpeg", ".mjpg")
+
+FLAT_COLUMNS = [
+  "source",
+  "frame_index",
+  "ts_ms",
+  "detection_count",
+  "cocoon_count",
+  "larva_count",
+  "larva_density_area_ratio",
+  "movement_index",
+  "motion_score",
+  "movement_level",
+  "molting_state",
+  "size_change_ratio",
+  "growth_trend",
+  "diseased_confirmed",
+  "max_confidence",
+]
+
+
+@dataclass(frozen=True)
+class BatchTask:
+  kind: str  # "video" | "images"
+  paths: Tuple[str, ...]
+  start: int
+  end: int  # exclusive, -1 = until the end of the video
+
+  def key(self) -> str:
+    raw = "\0".join([self.kind, *self.paths, str(self.start), str(self.end)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _video_frame_count(path: str) -> int:
+  import cv2
+
+  cap = cv2.VideoCapture(path)
+  try:
+    return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+  finally:
+    cap.release()
+
+
+def collect_inputs(inputs: Iterable[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+  videos: List[str] = []
+  image_groups: Dict[str, List[str]] = {}
+
+  def _add(path: str) -> None:
+    low = path.lower()
+    if low.endswith(VIDEO_EXTS):
+      videos.append(path)
+    elif low.endswith(IMAGE_EXTS):
+      image_groups.setdefault(os.path.dirname(path), []).append(path)
+
+  for raw in inputs:
+    p = os.path.abspath(raw)
+    if os.path.isdir(p):
+      for root, _dirs, files in os.walk(p):
+        for name in files:
+          _add(os.path.join(root, name))
+    elif os.path.isfile(p):
+      _add(p)
+
+  for k in image_groups:
+    image_groups[k].sort()
+  return sorted(videos), image_groups
+
+
+# Default shard size: bounds the rows a worker holds before handing them back and lets one long video
+# spread over several processes
+DEFAULT_CHUNK_FRAMES = 2000
+
+
+def plan_tasks(inputs: Iterable[str], chunk_frames: int) -> List[BatchTask]:
+  videos, image_groups = collect_inputs(inputs)
+  tasks: List[BatchTask] = []
+
+  for v in videos:
+    if chunk_frames <= 0:
+      tasks.append(BatchTask(kind="video", paths=(v,), start=0, end=-1))
+      continue
+    n = _video_frame_count(v)
+    if n <= 0:
+      tasks.append(BatchTask(kind="video", paths=(v,), start=0, end=-1))
+      continue
+    for s in range(0, n, chunk_frames):
+      tasks.append(BatchTask(kind="video", paths=(v,), start=s, end=min(n, s + chunk_frames)))
+
+  # Images in one directory are treated as one time-ordered sequence (by file name)
+  for _dir, files in sorted(image_groups.items()):
+    step = chunk_frames if chunk_frames > 0 else len(files)
+    for s in range(0, len(files), step):
+      part = tuple(files[s : s + step])
+      tasks.append(BatchTask(kind="images", paths=part, start=s, end=s + len(part)))
+
+  return tasks
+
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(model_path: str, conf: float, iou: float, stage: str, roi: str = "", imgsz: int = 0) -> None:
+  import cv2
+
+  # One process per core already; keep OpenCV/torch from oversubscribing inside each worker
+  cv2.setNumThreads(1)
+  try:
+    import torch  # type: ignore
+
+    torch.set_num_threads(1)
+  except Exception:
+    pass
+
+  from vision_service.infrastructure.frame_analyzer import import_yolo
+
+  model = None
+  if model_path:
+    yolo_cls = import_yolo()
+    if yolo_cls is None:
+      raise RuntimeError("ultralytics is not available")
+    model = yolo_cls(model_path)
+
+  _worker.update(model=model, conf=float(conf), iou=float(iou), stage=stage, roi=roi, imgsz=int(imgsz))
+
+
+def _iter_task_frames(task: BatchTask, every_n: int):
+  import cv2
+
+  if task.kind == "images":
+    for i, path in enumerate(task.paths):
+      if i % every_n != 0:
+        continue
+      img = cv2.imread(path, cv2.IMREAD_COLOR)
+      if img is None:
+        continue
+      yield path, task.start + i, int(os.path.getmtime(path) * 1000), img
+    return
+
+  path = task.paths[0]
+  cap = cv2.VideoCapture(path)
+  try:
+    idx = 0
+    if task.start > 0:
+      # Decode one frame before the shard so the first emitted frame has a motion reference
+      idx = max(0, task.start - 1)
+      cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+    while task.end < 0 or idx < task.end:
+      ok, img = cap.read()
+      if not ok or img is None:
+        break
+      ts_ms = int(cap.get(cv2.CAP_PROP_POS_MSEC) or 0)
+      if idx == task.start - 1 or (idx - task.start) % every_n == 0:
+        yield path, idx, ts_ms, img
+      idx += 1
+  finally:
+    cap.release()
+
+
+def _flat_row(source: str, frame: int, ts_ms: int, dets: list, extra: Dict[str, Any]) -> Dict[str, Any]:
+  hint = extra.get("stage_hint") or {}
+  lm = extra.get("larva_metrics") or {}
+  molting = extra.get("molting") or {}
+  dc = extra.get("diseased_confirmation") or {}
+  growth = extra.get("growth") or {}
+  return {
+    "source": source,
+    "frame_index": int(frame),
+    "ts_ms": int(ts_ms),
+    "detection_count": len(dets),
+    "cocoon_count": hint.get("cocoon_count"),
+    "larva_count": hint.get("larva_count"),
+    "larva_density_area_ratio": lm.get("larva_density_area_ratio"),
+    "movement_index": lm.get("movement_index"),
+    "motion_score": lm.get("motion_score"),
+    "movement_level": lm.get("movement_level"),
+    "molting_state": molting.get("state"),
+    "size_change_ratio": growth.get("size_change_ratio"),
+    "growth_trend": growth.get("trend"),
+    "diseased_confirmed": dc.get("confirmed"),
+    "max_confidence": max((float(d.confidence) for d in dets), default=None),
+  }
+
+
+def run_task(task: BatchTask, every_n: int, flat: bool) -> Tuple[str, List[Dict[str, Any]], int]:
+  from vision_service.domain.models import YoloResult, yolo_result_to_jsonable
+  from vision_service.infrastructure.frame_analyzer import FrameAnalyzer, predict_kwargs
+  from vision_service.infrastructure.opencv_metric_extractor import OpenCvMetricExtractor
+
+  model = _worker.get("model")
+  conf = _worker.get("conf", 0.25)
+  iou = _worker.get("iou", 0.45)
+  stage = _worker.get("stage", "")
+  imgsz = int(_worker.get("imgsz", 0))
+
+  def _predict(img):
+    return model.predict(source=img, conf=conf, iou=iou, verbose=False, **predict_kwargs(img, imgsz))
+
+  analyzer = FrameAnalyzer(OpenCvMetricExtractor(), roi=_worker.get("roi", ""))
+  rows: List[Dict[str, Any]] = []
+  frames = 0
+  for source, idx, ts_ms, img in _iter_task_frames(task, max(1, every_n)):
+    if idx < task.start:
+      # Reference frame before the shard: motion only, no inference and no state-machine update
+      analyzer.prime_motion(img)
+      continue
+    dets, extra = analyzer.analyze(
+      img, ts_ms=ts_ms, stage_raw=stage, predict=_predict if model is not None else None, imgsz=imgsz
+    )
+    frames += 1
+    h, w = img.shape[:2]
+    if flat:
+      rows.append(_flat_row(source, idx, ts_ms, dets, extra))
+    else:
+      y = YoloResult(ts_ms=ts_ms, source_frame_ts_ms=ts_ms, detections=dets, extra=extra)
+      rows.append({"source": source, "frame_index": int(idx), **yolo_result_to_jsonable(y, w, h)})
+  return task.key(), rows, frames
+
+
+class _JsonlSink:
+  def __init__(self, path: str, resume: bool) -> None:
+    self._path = path
+    self._done_path = path + ".done"
+    self.done: Dict[str, int] = {}
+    if resume and os.path.exists(self._done_path):
+      with open(self._done_path, "r", encoding="utf-8") as f:
+        for line in f:
+          parts = line.rstrip("\n").split("\t")
+          if len(parts) == 2:
+            self.done[parts[0]] = int(parts[1])
+    size = os.path.getsize(path) if resume and os.path.exists(path) else 0
+    # Shards whose rows are not (all) in the data file any more (deleted or cut short) have to run again
+    lost = [k for k, end in self.done.items() if end > size]
+    if lost:
+      print(f"batch: {path} is missing rows of {len(lost)} finished shards; running them again", file=sys.stderr)
+      self.done = {k: end for k, end in self.done.items() if end <= size}
+    offset = max(self.done.values(), default=0)
+    self._f = open(path, "r+b" if size > 0 else "wb")
+    # Drop rows of a task that was interrupted half-way through being written
+    self._f.truncate(offset)
+    self._f.seek(offset)
+    self._done_f = open(self._done_path, "w", encoding="utf-8")
+    for k, end in sorted(self.done.items(), key=lambda kv: kv[1]):
+      self._done_f.write(f"{k}\t{end}\n")
+    self._done_f.flush()
+
+  def write(self, key: str, rows: List[Dict[str, Any]]) -> None:
+    for r in rows:
+      self._f.write(json.dumps(r, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+      self._f.write(b"\n")
+    self._f.flush()
+    os.fsync(self._f.fileno())
+    self._done_f.write(f"{key}\t{self._f.tell()}\n")
+    self._done_f.flush()
+
+  def close(self) -> None:
+    self._f.close()
+    self._done_f.close()
+
+
+class _CsvSink(_JsonlSink):
+  def write(self, key: str, rows: List[Dict[str, Any]]) -> None:
+    if self._f.tell() == 0:
+      self._f.write((",".join(FLAT_COLUMNS) + "\n").encode("utf-8"))
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=FLAT_COLUMNS, extrasaction="ignore")
+    w.writerows(rows)
+    self._f.write(buf.getvalue().encode("utf-8"))
+    self._f.flush()
+    os.fsync(self._f.fileno())
+    self._done_f.write(f"{key}\t{self._f.tell()}\n")
+    self._done_f.flush()
+
+
+class _ParquetSink:
+  # A directory of part files (one per task) is a regular parquet dataset and resumes naturally
+  def __init__(self, path: str, resume: bool) -> None:
+    import pyarrow  # type: ignore  # noqa: F401
+
+    self._dir = path
+    os.makedirs(path, exist_ok=True)
+    self.done: Dict[str, int] = {}
+    for name in os.listdir(path):
+      if name.endswith(".parquet"):
+        if resume:
+          self.done[name[: -len(".parquet")]] = 0
+        else:
+          os.remove(os.path.join(path, name))
+
+  def write(self, key: str, rows: List[Dict[str, Any]]) -> None:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+
+    # Explicit schema so parts where a column is all-null still share one dataset schema
+    schema = pa.schema(
+      [
+        ("source", pa.string()),
+        ("frame_index", pa.int64()),
+        ("ts_ms", pa.int64()),
+        ("detection_count", pa.int32()),
+        ("cocoon_count", pa.int32()),
+        ("larva_count", pa.int32()),
+        ("larva_density_area_ratio", pa.float64()),
+        ("movement_index", pa.float64()),
+        ("motion_score", pa.float64()),
+        ("movement_level", pa.string()),
+        ("molting_state", pa.string()),
+        ("size_change_ratio", pa.float64()),
+        ("growth_trend", pa.string()),
+        ("diseased_confirmed", pa.bool_()),
+        ("max_confidence", pa.float64()),
+      ]
+    )
+    table = pa.Table.from_pylist([{c: r.get(c) for c in FLAT_COLUMNS} for r in rows], schema=schema)
+    tmp = os.path.join(self._dir, f".{key}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, os.path.join(self._dir, f"{key}.parquet"))
+
+  def close(self) -> None:
+    pass
+
+
+def _open_sink(path: str, fmt: str, resume: bool):
+  if fmt == "parquet":
+    return _ParquetSink(path, resume)
+  if fmt == "csv":
+    return _CsvSink(path, resume)
+  return _JsonlSink(path, resume)
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+  p = argparse.ArgumentParser(prog="python -m vision_service.batch", description="Offline analysis of tray image/video archives")
+  p.add_argument("inputs", nargs="+", help="video files, image files or directories")
+  p.add_argument("-o", "--out", required=True, help="output .jsonl/.csv file or parquet directory")
+  p.add_argument("--format", choices=("jsonl", "csv", "parquet"), default=None, help="default: from --out extension")
+  p.add_argument("--model", default=config.YOLO_MODEL_PATH, help="YOLO model path (default: KOZA_YOLO_MODEL)")
+  p.add_argument("--conf", type=float, default=config.YOLO_CONF)
+  p.add_argument("--iou", type=float, default=config.YOLO_IOU)
+  p.add_argument("--stage", default=config.ACTIVE_STAGE, help="stage key used for movement/molting thresholds")
+  p.add_argument("--roi", default=config.ROI, help="tray ROI, x1,y1,x2,y2 or x,y;x,y;... normalized (default: KOZA_ROI)")
+  p.add_argument("--imgsz", type=int, default=config.YOLO_IMGSZ, help="inference size, 0 = model default (default: KOZA_YOLO_IMGSZ)")
+  p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+  p.add_argument("--every-n", type=int, default=1, help="analyse every Nth frame")
+  p.add_argument(
+    "--chunk-frames",
+    type=int,
+    default=DEFAULT_CHUNK_FRAMES,
+    help=(
+      f"split sequences into shards of N frames (default {DEFAULT_CHUNK_FRAMES}; 0 = one shard per file/directory, "
+      "held in memory whole; molting and growth state restart per shard)"
+    ),
+  )
+  p.add_argument("--resume", action="store_true", help="skip shards already written to --out")
+  return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  args = _parse_args(argv)
+  fmt = args.format
+  if fmt is None:
+    low = args.out.lower()
+    fmt = "csv" if low.endswith(".csv") else "parquet" if low.endswith(".parquet") or os.path.isdir(args.out) else "jsonl"
+
+  tasks = plan_tasks(args.inputs, int(args.chunk_frames))
+  sink = _open_sink(args.out, fmt, bool(args.resume))
+  todo = [t for t in tasks if t.key() not in sink.done]
+  print(f"batch: {len(tasks)} shards, {len(tasks) - len(todo)} already done, {len(todo)} to run", file=sys.stderr)
+
+  t0 = time.monotonic()
+  frames = 0
+  workers = max(1, int(args.workers))
+  flat = fmt != "jsonl"
+  try:
+    with ProcessPoolExecutor(
+      max_workers=workers,
+      initializer=_init_worker,
+      initargs=(args.model, args.conf, args.iou, args.stage, args.roi, args.imgsz),
+    ) as pool:
+      pending = set()
+      queue = list(reversed(todo))
+      # Keep a bounded number of shards in flight so results stream out instead of piling up in memory
+      while queue or pending:
+        while queue and len(pending) < workers * 2:
+          pending.add(pool.submit(run_task, queue.pop(), int(args.every_n), flat))
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+          key, rows, n = fut.result()
+          sink.write(key, rows)
+          frames += n
+          elapsed = max(1e-6, time.monotonic() - t0)
+          print(f"batch: shard {key} {n} frames ({frames / elapsed:.1f} frames/s)", file=sys.stderr)
+  finally:
+    sink.close()
+
+  elapsed = max(1e-6, time.monotonic() - t0)
+  print(f"batch: {frames} frames in {elapsed:.1f}s ({frames / elapsed:.1f} frames/s, {workers} workers)", file=sys.stderr)
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
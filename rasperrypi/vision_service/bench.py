@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from vision_service.domain.compact_codec import (
+  COORD_SCALE,
+  CompactDecoder,
+  CompactEncoder,
+  msgpack_available,
+  pack,
+  unpack,
+)
+from vision_service.infrastructure.jpeg_codec import DECODE_SCALES, OpenCvJpegCodec, TurboJpegCodec
+
+_BATCH_KEYS = ("source", "frame_index")
+
+
+def _read_results(paths: List[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+  # Accepts the JSONL written by vision_service.batch, or one /yolo/latest.json body per line
+  for path in paths:
+    with open(path, "r", encoding="utf-8") as f:
+      for line in f:
+        line = line.strip()
+        if not line:
+          continue
+        row = json.loads(line)
+        source = str(row.get("source", path))
+        yield source, {k: v for k, v in row.items() if k not in _BATCH_KEYS}
+
+
+def _poll_results(url: str, count: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+  import requests
+
+  endpoint = f"{url.rstrip('/')}/yolo/latest.json"
+  last = -1
+  got = 0
+  failures = 0
+  while got < count:
+    r = requests.get(endpoint, params={"after_ts": last, "timeout": 10}, timeout=15)
+    if r.status_code == 204:
+      # Long-poll timed out without a newer result
+      continue
+    if 400 <= r.status_code < 500:
+      print(f"bench: {endpoint} answered {r.status_code}, stopping", file=sys.stderr)
+      return
+    if r.status_code != 200:
+      failures += 1
+      if failures >= 5:
+        print(f"bench: {endpoint} answered {r.status_code} {failures} times in a row, stopping", file=sys.stderr)
+        return
+      time.sleep(min(10.0, 0.5 * 2**failures))
+      continue
+    failures = 0
+    y = r.json()
+    last = int(y["ts_ms"])
+    got += 1
+    yield url, y
+
+
+def _max_bbox_error(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+  err = 0.0
+  for da, db in zip(a.get("detections") or [], b.get("detections") or []):
+    for k in ("x1", "y1", "x2", "y2"):
+      err = max(err, abs(float(da[k]) - float(db[k])))
+  return err
+
+
+class _Meter:
+  def __init__(self) -> None:
+    self.n = 0
+    self.bytes = 0
+    self.enc_s = 0.0
+    self.dec_s = 0.0
+
+  def add(self, size: int, enc_s: float, dec_s: float) -> None:
+    self.n += 1
+    self.bytes += size
+    self.enc_s += enc_s
+    self.dec_s += dec_s
+
+  def row(self, name: str, ref_bytes: float) -> str:
+    n = max(1, self.n)
+    avg = self.bytes / n
+    ratio = avg / ref_bytes if ref_bytes else 0.0
+    return f"{name:<26} {avg:>10.0f} {ratio:>8.2f} {self.enc_s / n * 1e6:>10.1f} {self.dec_s / n * 1e6:>10.1f}"
+
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+  t0 = time.perf_counter()
+  out = fn()
+  return out, time.perf_counter() - t0
+
+
+def payload_bench(results: Iterator[Tuple[str, Dict[str, Any]]], keyframe_every: int) -> int:
+  fmts = ["json"] + (["msgpack"] if msgpack_available() else [])
+  meters: Dict[str, _Meter] = {}
+  states: Dict[str, Tuple[CompactEncoder, CompactDecoder]] = {}
+  max_err = 0.0
+  mismatches = 0
+  prev_source: Optional[str] = None
+
+  for source, full in results:
+    if source != prev_source:
+      states = {f: (CompactEncoder(keyframe_every), CompactDecoder()) for f in fmts}
+      prev_source = source
+
+    raw, enc = _timed(lambda: json.dumps(full, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    _, dec = _timed(lambda: json.loads(raw))
+    meters.setdefault("json (full)", _Meter()).add(len(raw), enc, dec)
+
+    for fmt in fmts:
+      encoder, decoder = states[fmt]
+
+      (body, content_type), enc = _timed(lambda: pack(encoder.encode(full), fmt))
+      out, dec = _timed(lambda: decoder.decode(unpack(body, content_type)))
+      msg = unpack(body, content_type)
+      encoder.ack(full, msg)
+      kind = "delta" if "b" in msg else "keyframe"
+      meters.setdefault(f"compact {fmt} {kind}", _Meter()).add(len(body), enc, dec)
+
+      max_err = max(max_err, _max_bbox_error(full, out))
+      if out.get("extra") != full.get("extra") or len(out["detections"]) != len(full.get("detections") or []):
+        mismatches += 1
+
+  ref = meters.get("json (full)")
+  if ref is None or ref.n == 0:
+    print("bench: no results", file=sys.stderr)
+    return 1
+
+  ref_bytes = ref.bytes / ref.n
+  print(f"{'encoding':<26} {'avg bytes':>10} {'ratio':>8} {'enc us':>10} {'dec us':>10}")
+  for name, m in meters.items():
+    print(m.row(name, ref_bytes) + f"   (n={m.n})")
+  print(f"roundtrip: max bbox error {max_err:.6f} (quantum {1.0 / COORD_SCALE}), extra mismatches {mismatches}")
+  return 0 if mismatches == 0 else 2
+
+
+def jpeg_bench(path: Optional[str], width: int, height: int, frames: int, quality: int, repeat: int) -> int:
+  import cv2
+
+  from vision_service.infrastructure.replay_source import load_replay_frames
+
+  jpegs = load_replay_frames(path, width, height, frames, quality)
+  if not jpegs:
+    print("bench: no frames", file=sys.stderr)
+    return 1
+
+  codecs: List[Any] = [OpenCvJpegCodec()]
+  try:
+    codecs.append(TurboJpegCodec())
+  except Exception as e:
+    print(f"turbojpeg unavailable ({e}); only OpenCV is measured", file=sys.stderr)
+
+  full = [cv2.imdecode(np.frombuffer(j, dtype=np.uint8), cv2.IMREAD_COLOR) for j in jpegs]
+  h, w = full[0].shape[:2]
+  print(f"{len(jpegs)} frames {w}x{h}, quality {quality}, {repeat} passes")
+  print(f"{'codec':<10} {'op':<24} {'out':>10} {'avg ms':>8} {'avg KB':>8}")
+
+  def run(name: str, op: str, fn: Callable[[int], Any]) -> None:
+    t0 = time.perf_counter()
+    out = None
+    kb = 0.0
+    for _ in range(repeat):
+      for i in range(len(jpegs)):
+        out = fn(i)
+        if not isinstance(out, np.ndarray):
+          kb += len(out) / 1024.0
+    n = repeat * len(jpegs)
+    shape = f"{out.shape[1]}x{out.shape[0]}" if isinstance(out, np.ndarray) else "jpeg"
+    size = f"{kb / n:>8.1f}" if kb else f"{'':>8}"
+    print(f"{name:<10} {op:<24} {shape:>10} {(time.perf_counter() - t0) / n * 1000.0:>8.2f} {size}")
+
+  for codec in codecs:
+    for d in DECODE_SCALES:
+      run(codec.name, f"decode 1/{d}", lambda i, c=codec, d=d: c.decode(jpegs[i], d))
+    for d in DECODE_SCALES[1:]:
+      # What a reduced decode replaces: full decode, then an area resize to the same size
+      run(
+        codec.name,
+        f"decode 1/1 + resize 1/{d}",
+        lambda i, c=codec, d=d: cv2.resize(c.decode(jpegs[i], 1), (w // d, h // d), interpolation=cv2.INTER_AREA),
+      )
+    run(codec.name, "encode", lambda i, c=codec: c.encode(full[i], quality))
+  return 0
+
+
+def analyze_bench(path: Optional[str], width: int, height: int, frames: int, roi: str, imgsz: int) -> int:
+  # FrameAnalyzer cost per frame without model time (stub with zero inference cost), and a check that every
+  # detection keeps the confidence the model gave its box (growth tracking enabled)
+  import cv2
+
+  from vision_service.infrastructure.frame_analyzer import FrameAnalyzer, parse_yolo_boxes
+  from vision_service.infrastructure.opencv_metric_extractor import OpenCvMetricExtractor
+  from vision_service.infrastructure.replay_source import load_replay_frames
+  from vision_service.infrastructure.stub_model import StubYoloModel
+
+  jpegs = load_replay_frames(path, width, height, frames, 90)
+  if not jpegs:
+    print("bench: no frames", file=sys.stderr)
+    return 1
+
+  model = StubYoloModel(infer_ms=0.0, detections=8, labels=("larva", "cocoon", "diseased"))
+  analyzer = FrameAnalyzer(OpenCvMetricExtractor(), roi=roi)
+  confs: List[float] = []
+
+  def _predict(img: np.ndarray) -> Any:
+    res = model.predict(source=img)
+    confs[:] = [b[4] for b in parse_yolo_boxes(res)]
+    return res
+
+  mismatches = 0
+  total_s = 0.0
+  for i, jpeg in enumerate(jpegs):
+    img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    (dets, _), dt = _timed(lambda: analyzer.analyze(img, ts_ms=i * 1000, stage_raw="", predict=_predict, imgsz=imgsz))
+    total_s += dt
+    # ROI filtering may drop boxes but never changes a kept box's confidence
+    if any(d.confidence not in confs for d in dets):
+      mismatches += 1
+
+  h, w = cv2.imdecode(np.frombuffer(jpegs[0], dtype=np.uint8), cv2.IMREAD_COLOR).shape[:2]
+  print(f"{len(jpegs)} frames {w}x{h}, roi {roi or 'full'}, imgsz {imgsz}: {total_s / len(jpegs) * 1000.0:.2f} ms/frame")
+  print(f"confidence mismatches {mismatches}")
+  return 0 if mismatches == 0 else 2
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+  p = argparse.ArgumentParser(prog="python -m vision_service.bench", description="Micro benchmarks for the vision service")
+  sub = p.add_subparsers(dest="cmd", required=True)
+
+  pp = sub.add_parser("payload", help="size/CPU of full JSON vs the compact delta encoding on recorded results")
+  pp.add_argument("inputs", nargs="*", help="JSONL from vision_service.batch (or one latest.json body per line)")
+  pp.add_argument("--url", default=None, help="instead of files, long-poll a running service, e.g. http://pi:8000")
+  pp.add_argument("--count", type=int, default=200, help="results to collect with --url")
+  pp.add_argument("--keyframe-every", type=int, default=30)
+
+  pj = sub.add_parser("jpeg", help="OpenCV vs libjpeg-turbo decode (full and reduced DCT scale) and encode time")
+  pj.add_argument("source", nargs="?", default=None, help="video file or image folder (default: synthetic frames)")
+  pj.add_argument("--width", type=int, default=1280)
+  pj.add_argument("--height", type=int, default=720)
+  pj.add_argument("--frames", type=int, default=30)
+  pj.add_argument("--quality", type=int, default=85)
+  pj.add_argument("--repeat", type=int, default=5)
+
+  pa = sub.add_parser("analyze", help="FrameAnalyzer time per frame with a zero-cost stub model, plus an output check")
+  pa.add_argument("source", nargs="?", default=None, help="video file or image folder (default: synthetic frames)")
+  pa.add_argument("--width", type=int, default=1280)
+  pa.add_argument("--height", type=int, default=720)
+  pa.add_argument("--frames", type=int, default=30)
+  pa.add_argument("--roi", default="", help="same format as KOZA_ROI")
+  pa.add_argument("--imgsz", type=int, default=0)
+  return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  args = _parse_args(argv)
+  if args.cmd == "payload":
+    if args.url:
+      results = _poll_results(args.url, int(args.count))
+    elif args.inputs:
+      results = _read_results(args.inputs)
+    else:
+      print("bench: give JSONL inputs or --url", file=sys.stderr)
+      return 1
+    return payload_bench(results, int(args.keyframe_every))
+  if args.cmd == "jpeg":
+    return jpeg_bench(args.source, int(args.width), int(args.height), int(args.frames), int(args.quality), max(1, int(args.repeat)))
+  if args.cmd == "analyze":
+    return analyze_bench(args.source, int(args.width), int(args.height), max(1, int(args.frames)), str(args.roi), max(0, int(args.imgsz)))
+  return 1
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
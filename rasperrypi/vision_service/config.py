@@ -22,11 +22,23 @@ def env_float(name: str, default: float) -> float:
 
 BIND_HOST = env_str("KOZA_BIND_HOST", "0.0.0.0")
 BIND_PORT = env_int("KOZA_BIND_PORT", 8080)
+# With more than one worker the public port is served from shared memory by N uvicorn workers and the
+# full (control) app moves to KOZA_CONTROL_PORT
+HTTP_WORKERS = env_int("KOZA_HTTP_WORKERS", 1)
+CONTROL_PORT = env_int("KOZA_CONTROL_PORT", 8081)
 
 CAMERA_SOURCE = env_str("KOZA_CAMERA_SOURCE", "0")
 CAMERA_FPS = env_float("KOZA_CAMERA_FPS", 8.0)
 CAMERA_WIDTH = env_int("KOZA_CAMERA_WIDTH", 1280)
 CAMERA_HEIGHT = env_int("KOZA_CAMERA_HEIGHT", 720)
+JPEG_QUALITY = env_int("KOZA_JPEG_QUALITY", 85)
+# JPEG codec for camera encode and engine decode: auto (libjpeg-turbo via PyTurboJPEG when present), turbojpeg, opencv
+JPEG_CODEC = env_str("KOZA_JPEG_CODEC", "auto")
+JPEG_SUBSAMPLING = env_str("KOZA_JPEG_SUBSAMPLING", "420")
+JPEG_FAST_DCT = env_str("KOZA_JPEG_FAST_DCT", "1") in ("1", "true", "TRUE", "yes", "YES")
+TURBOJPEG_LIB = env_str("KOZA_TURBOJPEG_LIB", "")
+# Engine decode size: 1 = full frame, 2 or 4 = reduced DCT decode, 0 = largest that still covers the model input
+JPEG_DECODE_SCALE = env_int("KOZA_JPEG_DECODE_SCALE", 1)
 
 ACTIVE_STAGE = env_str("KOZA_ACTIVE_STAGE", "")
 
@@ -34,6 +46,25 @@ YOLO_MODEL_PATH = env_str("KOZA_YOLO_MODEL", "")
 YOLO_CONF = env_float("KOZA_YOLO_CONF", 0.25)
 YOLO_IOU = env_float("KOZA_YOLO_IOU", 0.45)
 YOLO_INFER_EVERY_N_FRAMES = env_int("KOZA_YOLO_EVERY_N_FRAMES", 3)
+# Inference input size (long side, letterboxed to a multiple of 32); 0 = model default
+YOLO_IMGSZ = env_int("KOZA_YOLO_IMGSZ", 0)
+# Tray ROI, normalized to the frame: "x1,y1,x2,y2" or polygon "x,y;x,y;x,y;..." (empty = full frame)
+ROI = env_str("KOZA_ROI", "")
+# Rolling size baselines (mean larva/cocoon bbox area) behind size_change_ratio: current window vs trailing horizons
+GROWTH_HORIZONS_H = env_str("KOZA_GROWTH_HORIZONS_H", "6,24,72")
+GROWTH_RATIO_HORIZON_H = env_float("KOZA_GROWTH_RATIO_HORIZON_H", 24.0)
+GROWTH_CURRENT_SEC = env_float("KOZA_GROWTH_CURRENT_SEC", 900.0)
+GROWTH_BUCKETS = env_int("KOZA_GROWTH_BUCKETS", 48)
+# Per-region baselines over the ROI split into rows x cols ("1x1" = whole tray only)
+GROWTH_GRID = env_str("KOZA_GROWTH_GRID", "1x1")
+GROWTH_TREND_EPS = env_float("KOZA_GROWTH_TREND_EPS", 0.03)
+GROWTH_MIN_COVERAGE = env_float("KOZA_GROWTH_MIN_COVERAGE", 0.25)
+# Every N inference cycles with an ROI/imgsz active, time one full-frame inference to report the latency saved (0 = off)
+ROI_REFERENCE_EVERY = env_int("KOZA_ROI_REFERENCE_EVERY", 50)
+# Run one dummy inference after the background model load so the first real predict is not slow
+YOLO_WARMUP_ENABLED = env_str("KOZA_YOLO_WARMUP", "1") in ("1", "true", "TRUE", "yes", "YES")
+# Poll the model file every N seconds and hot-reload it when it changes (0 = off)
+YOLO_MODEL_WATCH_SEC = env_int("KOZA_YOLO_MODEL_WATCH_SEC", 0)
 
 MM_PER_PIXEL = env_float("KOZA_MM_PER_PIXEL", 0.0)
 COLOR_LAB_TARGET = env_str("KOZA_COLOR_LAB_TARGET", "")
@@ -46,6 +77,58 @@ DISEASED_CONF_THRESHOLD = env_float("KOZA_DISEASED_CONF_THRESHOLD", 0.6)
 KOZA_API_BASE = env_str("KOZA_API_BASE", "")  # e.g. http://<server>:3000
 KOZA_PUSH_ENABLED = env_str("KOZA_PUSH_ENABLED", "0") in ("1", "true", "TRUE", "yes", "YES")
 KOZA_PUSH_EVERY_SEC = env_int("KOZA_PUSH_EVERY_SEC", 5)
+# Also push the full result in the compact delta encoding (domain/compact_codec.py) to this path (empty = off)
+KOZA_PUSH_COMPACT_PATH = env_str("KOZA_PUSH_COMPACT_PATH", "")
+KOZA_PUSH_COMPACT_FORMAT = env_str("KOZA_PUSH_COMPACT_FORMAT", "msgpack")  # msgpack | json
+KOZA_PUSH_KEYFRAME_EVERY = env_int("KOZA_PUSH_KEYFRAME_EVERY", 30)
+
+# Publish frames/results into named shared memory for extra HTTP workers and local consumers (forced on when
+# KOZA_HTTP_WORKERS > 1)
+SHM_ENABLED = env_str("KOZA_SHM_ENABLED", "0") in ("1", "true", "TRUE", "yes", "YES")
+SHM_NAME = env_str("KOZA_SHM_NAME", "koza_vision")
+SHM_FRAME_SLOTS = env_int("KOZA_SHM_FRAME_SLOTS", 4)
+SHM_FRAME_SLOT_KB = env_int("KOZA_SHM_FRAME_SLOT_KB", 512)
+SHM_RESULT_KB = env_int("KOZA_SHM_RESULT_KB", 256)
+SHM_STATUS_SEC = env_float("KOZA_SHM_STATUS_SEC", 1.0)
+SHM_POLL_MS = env_float("KOZA_SHM_POLL_MS", 10.0)
+
+# Upper bound for /yolo/latest.json?after_ts= long-poll waits and SSE keepalive interval
+LONGPOLL_MAX_SEC = env_float("KOZA_LONGPOLL_MAX_SEC", 25.0)
+SSE_KEEPALIVE_SEC = env_float("KOZA_SSE_KEEPALIVE_SEC", 15.0)
+
+# Thermal/load governor: steps capture fps, inference cadence and JPEG quality down under pressure.
+# Thresholds are comma separated, one per throttle level (warm, hot, critical).
+GOVERNOR_ENABLED = env_str("KOZA_GOVERNOR_ENABLED", "1") in ("1", "true", "TRUE", "yes", "YES")
+GOVERNOR_INTERVAL_SEC = env_float("KOZA_GOVERNOR_INTERVAL_SEC", 5.0)
+GOVERNOR_MIN_DWELL_SEC = env_float("KOZA_GOVERNOR_MIN_DWELL_SEC", 15.0)
+GOVERNOR_TEMP_C = env_str("KOZA_GOVERNOR_TEMP_C", "70,75,80")
+GOVERNOR_TEMP_HYST_C = env_float("KOZA_GOVERNOR_TEMP_HYST_C", 4.0)
+GOVERNOR_LOAD_PER_CPU = env_str("KOZA_GOVERNOR_LOAD_PER_CPU", "1.5,2.0,3.0")
+GOVERNOR_LOAD_HYST = env_float("KOZA_GOVERNOR_LOAD_HYST", 0.3)
+GOVERNOR_MEM_AVAIL_MIN = env_str("KOZA_GOVERNOR_MEM_AVAIL_MIN", "0.15,0.10,0.05")
+GOVERNOR_MEM_HYST = env_float("KOZA_GOVERNOR_MEM_HYST", 0.05)
+THERMAL_ZONE_PATH = env_str("KOZA_THERMAL_ZONE_PATH", "/sys/class/thermal/thermal_zone0/temp")
+LOADAVG_PATH = env_str("KOZA_LOADAVG_PATH", "/proc/loadavg")
+MEMINFO_PATH = env_str("KOZA_MEMINFO_PATH", "/proc/meminfo")
+
+# Event-triggered clip recording (diseased confirmation, molting state change) as JPEG sequences
+RECORD_ENABLED = env_str("KOZA_RECORD_ENABLED", "0") in ("1", "true", "TRUE", "yes", "YES")
+RECORD_DIR = env_str("KOZA_RECORD_DIR", "./recordings")
+RECORD_PRE_ROLL_SEC = env_float("KOZA_RECORD_PRE_ROLL_SEC", 5.0)
+RECORD_POST_ROLL_SEC = env_float("KOZA_RECORD_POST_ROLL_SEC", 5.0)
+RECORD_MAX_CLIP_SEC = env_float("KOZA_RECORD_MAX_CLIP_SEC", 60.0)
+RECORD_RING_MAX_MB = env_int("KOZA_RECORD_RING_MAX_MB", 16)
+# In-memory size of one clip while it records (pre-roll included); the clip is closed early when it hits this
+RECORD_CLIP_MAX_MB = env_int("KOZA_RECORD_CLIP_MAX_MB", 64)
+RECORD_QUOTA_MB = env_int("KOZA_RECORD_QUOTA_MB", 256)
+
+# "low" caps in-memory rings/queues (pre-roll, recorder queue) and freezes long-lived objects out of the GC
+MEMORY_BUDGET = env_str("KOZA_MEMORY_BUDGET", "normal")
+# Track Python/NumPy allocations with tracemalloc and report them in /stats (adds overhead)
+MEMORY_TRACE = env_str("KOZA_MEMORY_TRACE", "0") in ("1", "true", "TRUE", "yes", "YES")
+
+# Required as x-admin-token header on admin endpoints; empty disables them (403)
+ADMIN_TOKEN = env_str("KOZA_ADMIN_TOKEN", "")
 
 # Allow browser to request directly from Pi
 CORS_ALLOW_ORIGINS = env_str("KOZA_CORS_ALLOW_ORIGINS", "*")
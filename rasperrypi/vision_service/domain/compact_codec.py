@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+  import msgpack  # type: ignore
+except Exception:  # pragma: no cover
+  msgpack = None  # type: ignore
+
+# Compact wire format for results produced by yolo_result_to_jsonable.
+#
+#   v        format version
+#   ts       ts_ms
+#   sf       source_frame_ts_ms - ts_ms
+#   b        ts_ms of the base message this one is a delta against (absent = keyframe)
+#   fr       [width, height]                     (omitted when equal to the base)
+#   lb       label table                         (omitted when equal to the base)
+#   d        detections, flat ints, DET_STRIDE per detection:
+#            label index, confidence * CONF_SCALE, x1, y1, x2, y2 * COORD_SCALE
+#   dx       {detection index: detection extra}
+#   x        patch against the base "extra" (full "extra" in a keyframe)
+#
+# Patches only carry changed keys; nested dicts are patched recursively and removed keys are
+# listed under DEL_KEY. The duplicated label/class, confidence/conf and bbox fields are rebuilt by the decoder.
+# The central API decodes the same format in apps/api/src/domain/vision/compactResult.ts; keep the two in step.
+
+VERSION = 1
+DET_STRIDE = 6
+CONF_SCALE = 1000
+COORD_SCALE = 10000
+DEL_KEY = "__del__"
+
+
+def _q(v: float, scale: int) -> int:
+  return int(round(float(v) * scale))
+
+
+def diff_dict(base: Dict[str, Any], cur: Dict[str, Any]) -> Dict[str, Any]:
+  patch: Dict[str, Any] = {}
+  for k, v in cur.items():
+    if k not in base:
+      patch[k] = v
+      continue
+    bv = base[k]
+    if bv == v:
+      continue
+    if isinstance(bv, dict) and isinstance(v, dict):
+      patch[k] = diff_dict(bv, v)
+    else:
+      patch[k] = v
+  removed = [k for k in base if k not in cur]
+  if removed:
+    patch[DEL_KEY] = removed
+  return patch
+
+
+def apply_patch(base: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+  out = dict(base)
+  for k in patch.get(DEL_KEY, []):
+    out.pop(k, None)
+  for k, v in patch.items():
+    if k == DEL_KEY:
+      continue
+    bv = out.get(k)
+    if isinstance(bv, dict) and isinstance(v, dict) and k in base:
+      out[k] = apply_patch(bv, v)
+    else:
+      out[k] = v
+  return out
+
+
+def _labels_and_dets(full: Dict[str, Any]) -> Tuple[List[str], List[int], Dict[int, Any]]:
+  labels: List[str] = []
+  index: Dict[str, int] = {}
+  flat: List[int] = []
+  extras: Dict[int, Any] = {}
+  for i, d in enumerate(full.get("detections") or []):
+    label = str(d.get("label"))
+    li = index.get(label)
+    if li is None:
+      li = index[label] = len(labels)
+      labels.append(label)
+    flat.extend(
+      [
+        li,
+        _q(d.get("confidence", 0.0), CONF_SCALE),
+        _q(d.get("x1", 0.0), COORD_SCALE),
+        _q(d.get("y1", 0.0), COORD_SCALE),
+        _q(d.get("x2", 0.0), COORD_SCALE),
+        _q(d.get("y2", 0.0), COORD_SCALE),
+      ]
+    )
+    if isinstance(d.get("extra"), dict):
+      extras[i] = d["extra"]
+  return labels, flat, extras
+
+
+def encode_compact(full: Dict[str, Any], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+  ts = int(full["ts_ms"])
+  frame = full.get("frame") or {}
+  fr = [int(frame.get("width", 0)), int(frame.get("height", 0))]
+  labels, flat, extras = _labels_and_dets(full)
+  extra = full.get("extra") if isinstance(full.get("extra"), dict) else {}
+
+  msg: Dict[str, Any] = {"v": VERSION, "ts": ts, "sf": int(full.get("source_frame_ts_ms", ts)) - ts}
+  if base is None:
+    msg["fr"] = fr
+    msg["lb"] = labels
+    msg["x"] = extra
+  else:
+    base_frame = base.get("frame") or {}
+    base_labels, _, _ = _labels_and_dets(base)
+    base_extra = base.get("extra") if isinstance(base.get("extra"), dict) else {}
+    msg["b"] = int(base["ts_ms"])
+    if fr != [int(base_frame.get("width", 0)), int(base_frame.get("height", 0))]:
+      msg["fr"] = fr
+    if labels != base_labels:
+      msg["lb"] = labels
+    patch = diff_dict(base_extra, extra)
+    if patch:
+      msg["x"] = patch
+
+  if flat:
+    msg["d"] = flat
+  if extras:
+    # msgpack/json keys stay strings for portability
+    msg["dx"] = {str(k): v for k, v in extras.items()}
+  return msg
+
+
+def decode_compact(msg: Dict[str, Any], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+  if int(msg.get("v", 0)) != VERSION:
+    raise ValueError(f"unsupported compact version: {msg.get('v')}")
+
+  base_ts = msg.get("b")
+  if base_ts is not None:
+    if base is None or int(base.get("ts_ms", -1)) != int(base_ts):
+      raise ValueError(f"delta against unknown base {base_ts}")
+
+  ts = int(msg["ts"])
+  if "fr" in msg:
+    w, h = int(msg["fr"][0]), int(msg["fr"][1])
+  else:
+    w, h = int(base["frame"]["width"]), int(base["frame"]["height"])
+
+  if "lb" in msg:
+    labels = list(msg["lb"])
+  else:
+    labels, _, _ = _labels_and_dets(base)
+
+  if base_ts is None:
+    extra = dict(msg.get("x") or {})
+  else:
+    base_extra = base.get("extra") if isinstance(base.get("extra"), dict) else {}
+    extra = apply_patch(base_extra, msg.get("x") or {})
+
+  det_extras = msg.get("dx") or {}
+  flat = msg.get("d") or []
+  dets: List[Dict[str, Any]] = []
+  for i in range(len(flat) // DET_STRIDE):
+    li, c, x1, y1, x2, y2 = flat[i * DET_STRIDE : (i + 1) * DET_STRIDE]
+    label = labels[int(li)]
+    conf = float(c) / CONF_SCALE
+    bx = [float(x1) / COORD_SCALE, float(y1) / COORD_SCALE, float(x2) / COORD_SCALE, float(y2) / COORD_SCALE]
+    d: Dict[str, Any] = {
+      "label": label,
+      "class": label,
+      "confidence": conf,
+      "conf": conf,
+      "x1": bx[0],
+      "y1": bx[1],
+      "x2": bx[2],
+      "y2": bx[3],
+      "bbox": bx,
+    }
+    de = det_extras.get(str(i))
+    if isinstance(de, dict):
+      d["extra"] = de
+    dets.append(d)
+
+  full: Dict[str, Any] = {
+    "ts_ms": ts,
+    "source_frame_ts_ms": ts + int(msg.get("sf", 0)),
+    "frame": {"width": w, "height": h},
+    "detections": dets,
+  }
+  if extra:
+    full["extra"] = extra
+  return full
+
+
+def msgpack_available() -> bool:
+  return msgpack is not None
+
+
+def pack(msg: Dict[str, Any], fmt: str = "msgpack") -> Tuple[bytes, str]:
+  if fmt == "msgpack" and msgpack is not None:
+    return msgpack.packb(msg, use_bin_type=True), "application/x-msgpack"
+  return json.dumps(msg, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), "application/json"
+
+
+def unpack(raw: bytes, content_type: str = "application/x-msgpack") -> Dict[str, Any]:
+  if "msgpack" in (content_type or ""):
+    if msgpack is None:
+      raise RuntimeError("msgpack is not available")
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+  return json.loads(raw)
+
+
+class CompactEncoder:
+  # Deltas are always taken against the last message the receiver acknowledged, so a lost
+  # message only costs a larger next delta. A keyframe is forced every keyframe_every messages.
+  def __init__(self, keyframe_every: int = 30) -> None:
+    self._keyframe_every = max(1, int(keyframe_every))
+    self._acked: Optional[Dict[str, Any]] = None
+    self._since_keyframe = 0
+
+  def encode(self, full: Dict[str, Any]) -> Dict[str, Any]:
+    base = self._acked if self._since_keyframe < self._keyframe_every else None
+    return encode_compact(full, base)
+
+  def ack(self, full: Dict[str, Any], msg: Dict[str, Any]) -> None:
+    self._acked = full
+    self._since_keyframe = 1 if "b" not in msg else self._since_keyframe + 1
+
+  def reset(self) -> None:
+    self._acked = None
+    self._since_keyframe = 0
+
+
+class CompactDecoder:
+  # Keeps a few recent messages: the sender may still be on an older base if an ack got lost.
+  def __init__(self, keep: int = 8) -> None:
+    self._keep = max(1, int(keep))
+    self._recent: Dict[int, Dict[str, Any]] = {}
+
+  def decode(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+    base_ts = msg.get("b")
+    base = self._recent.get(int(base_ts)) if base_ts is not None else None
+    full = decode_compact(msg, base)
+    self._recent[int(full["ts_ms"])] = full
+    while len(self._recent) > self._keep:
+      self._recent.pop(min(self._recent))
+    return full
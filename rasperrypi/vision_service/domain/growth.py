@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+GROWTH_LABELS = ("larva", "cocoon")
+
+
+def parse_hours_list(raw: str) -> List[float]:
+  out: List[float] = []
+  for part in (raw or "").split(","):
+    part = part.strip().lower().rstrip("h")
+    if not part:
+      continue
+    try:
+      v = float(part)
+    except ValueError:
+      continue
+    if v > 0 and v not in out:
+      out.append(v)
+  return sorted(out)
+
+
+def parse_grid(raw: str) -> Tuple[int, int]:
+  # "rows x cols", e.g. "2x3"; anything invalid means a single region
+  try:
+    r, c = [int(v) for v in (raw or "").lower().replace(" ", "").split("x")]
+  except ValueError:
+    return 1, 1
+  return max(1, min(8, r)), max(1, min(8, c))
+
+
+def _horizon_key(hours: float) -> str:
+  return f"{hours:g}h"
+
+
+class RollingMean:
+  # Weighted mean over a trailing time window kept as a fixed ring of time buckets: add() and mean() are O(1)
+  # (bucket expiry is amortized over elapsed buckets) and memory is fixed by the bucket count.
+  def __init__(self, horizon_sec: float, buckets: int) -> None:
+    self._n = max(1, int(buckets))
+    self.bucket_ms = max(1, int(float(horizon_sec) * 1000.0 / self._n))
+    self._sum = [0.0] * self._n
+    self._weight = [0.0] * self._n
+    self._total = 0.0
+    self._total_weight = 0.0
+    self._head: Optional[int] = None
+    self._first: Optional[int] = None
+
+  def _advance(self, b: int) -> None:
+    if self._head is None:
+      self._head = b
+      return
+    if b <= self._head:
+      return
+    for i in range(1, min(b - self._head, self._n) + 1):
+      slot = (self._head + i) % self._n
+      self._total -= self._sum[slot]
+      self._total_weight -= self._weight[slot]
+      self._sum[slot] = 0.0
+      self._weight[slot] = 0.0
+    self._head = b
+    if self._total_weight <= 1e-9:
+      # Window ran empty: drop float residue and restart the coverage clock at the next sample
+      self._total = 0.0
+      self._total_weight = 0.0
+      self._first = None
+    elif self._first is not None and self._first <= b - self._n:
+      self._first = b - self._n + 1
+
+  def add(self, ts_ms: int, value: float, weight: float = 1.0) -> None:
+    b = int(ts_ms) // self.bucket_ms
+    self._advance(b)
+    if self._head is None or b <= self._head - self._n:
+      return
+    slot = b % self._n
+    self._sum[slot] += float(value) * float(weight)
+    self._weight[slot] += float(weight)
+    self._total += float(value) * float(weight)
+    self._total_weight += float(weight)
+    if self._first is None or b < self._first:
+      self._first = b
+
+  def expire(self, ts_ms: int) -> None:
+    self._advance(int(ts_ms) // self.bucket_ms)
+
+  def mean(self) -> Optional[float]:
+    if self._total_weight <= 1e-9:
+      return None
+    return self._total / self._total_weight
+
+  def weight(self) -> float:
+    return max(0.0, self._total_weight)
+
+  def coverage(self) -> float:
+    # Share of the window spanned since the first sample (1.0 once the window has filled once)
+    if self._head is None or self._first is None:
+      return 0.0
+    return min(1.0, (self._head - self._first + 1) / float(self._n))
+
+  def span_ms(self) -> int:
+    return int(self.coverage() * self._n * self.bucket_ms)
+
+
+class SizeSeries:
+  # Mean per-object area (as a share of the frame) for one label: a short "current" window and longer baselines
+  def __init__(self, current_sec: float, horizons_h: Sequence[float], buckets: int) -> None:
+    self.current = RollingMean(current_sec, max(2, min(int(buckets), 12)))
+    self.horizons = {h: RollingMean(h * 3600.0, buckets) for h in horizons_h}
+
+  def add(self, ts_ms: int, area_ratio_sum: float, count: int) -> None:
+    mean = area_ratio_sum / float(count)
+    self.current.add(ts_ms, mean, count)
+    for m in self.horizons.values():
+      m.add(ts_ms, mean, count)
+
+  def expire(self, ts_ms: int) -> None:
+    self.current.expire(ts_ms)
+    for m in self.horizons.values():
+      m.expire(ts_ms)
+
+  def ratio(self, hours: float, min_coverage: float) -> Optional[float]:
+    cur = self.current.mean()
+    m = self.horizons.get(hours)
+    base = m.mean() if m is not None else None
+    if cur is None or base is None or base <= 0 or m.coverage() < min_coverage:
+      return None
+    return cur / base
+
+  def snapshot(self, min_coverage: float) -> Optional[Dict[str, Any]]:
+    cur = self.current.mean()
+    if cur is None:
+      return None
+    horizons: Dict[str, Any] = {}
+    for h, m in self.horizons.items():
+      base = m.mean()
+      if base is None:
+        continue
+      r = self.ratio(h, min_coverage)
+      horizons[_horizon_key(h)] = {
+        "baseline_area_ratio": float(base),
+        "coverage": round(m.coverage(), 3),
+        **({"ratio": float(r)} if r is not None else {}),
+      }
+    return {"current_area_ratio": float(cur), "current_n": int(round(self.current.weight())), "horizons": horizons}
+
+  def rate_per_day(self, hours: float, min_coverage: float) -> Optional[float]:
+    # A trailing mean lags the present by about half its span under steady growth
+    r = self.ratio(hours, min_coverage)
+    m = self.horizons.get(hours)
+    if r is None or m is None:
+      return None
+    half_days = m.span_ms() / 2.0 / 86400000.0
+    if half_days <= 0:
+      return None
+    return (r - 1.0) / half_days
+
+
+class GrowthTracker:
+  def __init__(
+    self,
+    horizons_h: Sequence[float] = (6.0, 24.0, 72.0),
+    ratio_horizon_h: float = 24.0,
+    current_sec: float = 900.0,
+    buckets: int = 48,
+    grid: Tuple[int, int] = (1, 1),
+    trend_eps: float = 0.03,
+    min_coverage: float = 0.25,
+  ) -> None:
+    hs = sorted({float(h) for h in horizons_h if float(h) > 0} | {float(ratio_horizon_h)})
+    self.ratio_horizon_h = float(ratio_horizon_h)
+    self.grid = (max(1, int(grid[0])), max(1, int(grid[1])))
+    self.trend_eps = float(trend_eps)
+    self.min_coverage = float(min_coverage)
+    self._series = {label: SizeSeries(current_sec, hs, buckets) for label in GROWTH_LABELS}
+    # Regions only track the ratio horizon to keep memory at rows*cols*labels*buckets
+    self._regions: Dict[Tuple[int, int, str], SizeSeries] = {}
+    if self.grid != (1, 1):
+      for r in range(self.grid[0]):
+        for c in range(self.grid[1]):
+          for label in GROWTH_LABELS:
+            self._regions[(r, c, label)] = SizeSeries(current_sec, [self.ratio_horizon_h], buckets)
+
+  def region_of(self, cx: float, cy: float, rect: Tuple[float, float, float, float]) -> Tuple[int, int]:
+    x0, y0, x1, y1 = rect
+    rows, cols = self.grid
+    c = int((cx - x0) / max(1e-9, x1 - x0) * cols)
+    r = int((cy - y0) / max(1e-9, y1 - y0) * rows)
+    return min(rows - 1, max(0, r)), min(cols - 1, max(0, c))
+
+  def update(self, ts_ms: int, samples: Sequence[Tuple[str, float, int, int]]) -> Dict[str, Any]:
+    # samples: (label, area ratio, region row, region col) per detection, label in GROWTH_LABELS
+    totals: Dict[str, List[float]] = {}
+    region_totals: Dict[Tuple[int, int, str], List[float]] = {}
+    for label, area_ratio, r, c in samples:
+      t = totals.setdefault(label, [0.0, 0])
+      t[0] += area_ratio
+      t[1] += 1
+      if self._regions:
+        rt = region_totals.setdefault((r, c, label), [0.0, 0])
+        rt[0] += area_ratio
+        rt[1] += 1
+
+    for label, s in self._series.items():
+      t = totals.get(label)
+      if t:
+        s.add(ts_ms, t[0], int(t[1]))
+      else:
+        s.expire(ts_ms)
+    for key, rs in self._regions.items():
+      rt = region_totals.get(key)
+      if rt:
+        rs.add(ts_ms, rt[0], int(rt[1]))
+      else:
+        rs.expire(ts_ms)
+    return self.snapshot()
+
+  def size_change_ratio(self) -> Optional[float]:
+    # Larvae drive growth; once only cocoons are seen their (slower) size change is reported instead
+    for label in GROWTH_LABELS:
+      r = self._series[label].ratio(self.ratio_horizon_h, self.min_coverage)
+      if r is not None:
+        return r
+    return None
+
+  def trend(self, ratio: Optional[float]) -> str:
+    if ratio is None:
+      return "unknown"
+    if ratio > 1.0 + self.trend_eps:
+      return "growing"
+    if ratio < 1.0 - self.trend_eps:
+      return "shrinking"
+    return "stable"
+
+  def snapshot(self) -> Dict[str, Any]:
+    ratio = self.size_change_ratio()
+    out: Dict[str, Any] = {
+      "size_change_ratio": float(ratio) if ratio is not None else None,
+      "trend": self.trend(ratio),
+      "ratio_horizon": _horizon_key(self.ratio_horizon_h),
+    }
+    for label, s in self._series.items():
+      snap = s.snapshot(self.min_coverage)
+      if snap is None:
+        continue
+      rate = s.rate_per_day(self.ratio_horizon_h, self.min_coverage)
+      if rate is not None:
+        snap["rate_per_day"] = float(rate)
+      out[label] = snap
+
+    regions: Dict[str, Any] = {}
+    for (r, c, label), s in self._regions.items():
+      rr = s.ratio(self.ratio_horizon_h, self.min_coverage)
+      if rr is not None:
+        regions.setdefault(f"r{r}c{c}", {})[label] = float(rr)
+    if regions:
+      out["regions"] = regions
+    return out
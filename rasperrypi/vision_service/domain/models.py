@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 
 @dataclass(frozen=True)
@@ -25,7 +25,7 @@ class FramePacket:
   ts_ms: int
   width: int
   height: int
-  jpeg_bytes: bytes
+  jpeg_bytes: Union[bytes, memoryview]
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+Point = Tuple[float, float]
+
+LETTERBOX_STRIDE = 32
+
+
+def parse_roi(raw: str) -> Optional[List[Point]]:
+  # "x1,y1,x2,y2" rectangle or "x,y;x,y;x,y[;...]" polygon, normalized to the frame (0..1)
+  s = (raw or "").strip()
+  if not s:
+    return None
+  try:
+    if ";" in s:
+      pts = [tuple(float(v) for v in p.split(",")) for p in s.split(";") if p.strip()]
+      if len(pts) < 3 or any(len(p) != 2 for p in pts):
+        raise ValueError("polygon needs at least 3 x,y points")
+      poly = [(float(p[0]), float(p[1])) for p in pts]
+    else:
+      vals = [float(v) for v in s.split(",")]
+      if len(vals) != 4:
+        raise ValueError("rectangle needs x1,y1,x2,y2")
+      x1, x2 = sorted((vals[0], vals[2]))
+      y1, y2 = sorted((vals[1], vals[3]))
+      poly = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+  except ValueError as e:
+    raise ValueError(f"invalid ROI {raw!r}: {e}")
+
+  poly = [(min(1.0, max(0.0, x)), min(1.0, max(0.0, y))) for x, y in poly]
+  xs = [p[0] for p in poly]
+  ys = [p[1] for p in poly]
+  if max(xs) - min(xs) <= 0 or max(ys) - min(ys) <= 0:
+    raise ValueError(f"invalid ROI {raw!r}: empty area")
+  return poly
+
+
+def is_axis_rect(poly: List[Point]) -> bool:
+  if len(poly) != 4:
+    return False
+  xs = sorted({p[0] for p in poly})
+  ys = sorted({p[1] for p in poly})
+  return len(xs) == 2 and len(ys) == 2
+
+
+def roi_rect_px(poly: Optional[List[Point]], w: int, h: int) -> Tuple[int, int, int, int]:
+  if not poly:
+    return 0, 0, int(w), int(h)
+  x1 = int(math.floor(min(p[0] for p in poly) * w))
+  y1 = int(math.floor(min(p[1] for p in poly) * h))
+  x2 = int(math.ceil(max(p[0] for p in poly) * w))
+  y2 = int(math.ceil(max(p[1] for p in poly) * h))
+  return max(0, x1), max(0, y1), min(int(w), max(x1 + 1, x2)), min(int(h), max(y1 + 1, y2))
+
+
+def letterbox_shape(w: int, h: int, imgsz: int, stride: int = LETTERBOX_STRIDE) -> Tuple[float, int, int, int, int]:
+  # (scale, resized w, resized h, canvas w, canvas h): long side scaled to imgsz, canvas padded up to the stride
+  scale = float(imgsz) / float(max(1, max(w, h)))
+  nw = max(1, int(round(w * scale)))
+  nh = max(1, int(round(h * scale)))
+  cw = int(math.ceil(nw / stride) * stride)
+  ch = int(math.ceil(nh / stride) * stride)
+  return scale, nw, nh, cw, ch
+
+
+@dataclass(frozen=True)
+class RoiTransform:
+  # Maps coordinates of the image given to the model back to the full frame
+  offset_x: int = 0
+  offset_y: int = 0
+  scale: float = 1.0
+  pad_x: int = 0
+  pad_y: int = 0
+
+  def to_frame(self, x: float, y: float) -> Point:
+    return (x - self.pad_x) / self.scale + self.offset_x, (y - self.pad_y) / self.scale + self.offset_y
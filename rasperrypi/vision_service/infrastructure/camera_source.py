@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import threading
 import time
-from typing import Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import cv2
 
-from vision_service import config
+from vision_service import config, runtime_settings
 from vision_service.domain.models import FramePacket
+from vision_service.infrastructure import profiler
+from vision_service.infrastructure.jpeg_codec import load_codec
+from vision_service.infrastructure.perf_stats import PerfStats
 
 
 def _parse_source(src: str) -> Union[int, str]:
@@ -21,14 +24,20 @@ class OpenCvCameraSource:
   def __init__(self) -> None:
     self._lock = threading.Lock()
     self._latest: Optional[FramePacket] = None
+    self._listeners: List[Callable[[FramePacket], None]] = []
     self._stop = threading.Event()
     self._thread: Optional[threading.Thread] = None
+    self._stats = PerfStats()
+    self._codec, codec_error = load_codec()
+    self._stats.set("jpeg_codec", self._codec.name)
+    if codec_error:
+      self._stats.set("jpeg_codec_error", codec_error)
 
   def start(self) -> None:
     if self._thread and self._thread.is_alive():
       return
     self._stop.clear()
-    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread = threading.Thread(target=self._run, name="koza-camera", daemon=True)
     self._thread.start()
 
   def stop(self) -> None:
@@ -38,36 +47,78 @@ class OpenCvCameraSource:
     with self._lock:
       return self._latest
 
+  def subscribe(self, listener: Callable[[FramePacket], None]) -> None:
+    with self._lock:
+      self._listeners.append(listener)
+
+  def unsubscribe(self, listener: Callable[[FramePacket], None]) -> None:
+    with self._lock:
+      if listener in self._listeners:
+        self._listeners.remove(listener)
+
+  def _publish(self, pkt: FramePacket) -> None:
+    with self._lock:
+      self._latest = pkt
+      listeners = list(self._listeners)
+    for listener in listeners:
+      try:
+        listener(pkt)
+      except Exception:
+        pass
+
+  def stats(self) -> Dict[str, Any]:
+    return self._stats.snapshot()
+
+  def _apply_resolution(self, cap, settings: runtime_settings.RuntimeSettings) -> None:
+    if settings.camera_width > 0:
+      cap.set(cv2.CAP_PROP_FRAME_WIDTH, settings.camera_width)
+    if settings.camera_height > 0:
+      cap.set(cv2.CAP_PROP_FRAME_HEIGHT, settings.camera_height)
+
   def _run(self) -> None:
     src = _parse_source(config.CAMERA_SOURCE)
     cap = cv2.VideoCapture(src)
 
     try:
-      if config.CAMERA_WIDTH > 0:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
-      if config.CAMERA_HEIGHT > 0:
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
-
-      fps = max(0.5, float(config.CAMERA_FPS))
-      interval = 1.0 / fps
+      settings = runtime_settings.current()
+      self._apply_resolution(cap, settings)
+      frame = None
 
       while not self._stop.is_set():
-        ok, frame = cap.read()
+        profiler.checkpoint("camera")
+        cur = runtime_settings.current()
+        if cur != settings:
+          if (cur.camera_width, cur.camera_height) != (settings.camera_width, settings.camera_height):
+            self._apply_resolution(cap, cur)
+          settings = cur
+        interval = 1.0 / max(0.5, float(settings.camera_fps))
+        t_start = time.monotonic()
+
+        # Read into the previous frame's buffer; it is only used for encoding below and never published
+        ok, frame = cap.read(frame)
         if not ok or frame is None:
+          frame = None
           time.sleep(0.25)
           continue
 
         h, w = frame.shape[:2]
-        ok2, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-        if not ok2:
+        t_enc = time.monotonic()
+        data = self._codec.encode(frame, int(settings.jpeg_quality))
+        if data is None:
           time.sleep(interval)
           continue
+        self._stats.observe("encode_ms", (time.monotonic() - t_enc) * 1000.0)
+
+        pkt = FramePacket(ts_ms=int(time.time() * 1000), width=int(w), height=int(h), jpeg_bytes=data)
+        self._publish(pkt)
 
-        pkt = FramePacket(ts_ms=int(time.time() * 1000), width=int(w), height=int(h), jpeg_bytes=bytes(buf))
-        with self._lock:
-          self._latest = pkt
+        self._stats.tick("capture_fps")
+        self._stats.observe("jpeg_kb", len(pkt.jpeg_bytes) / 1024.0)
+        self._stats.set("frame_size", [int(w), int(h)])
+        self._stats.set("settings_version", settings.version)
 
-        time.sleep(interval)
+        # Pace to the configured fps instead of sleeping a full interval after the read/encode work
+        time.sleep(max(0.0, interval - (time.monotonic() - t_start)))
     finally:
       try:
         cap.release()
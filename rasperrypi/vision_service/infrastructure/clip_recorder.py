@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from vision_service import config
+from vision_service.domain.models import FramePacket, YoloResult
+from vision_service.infrastructure import profiler
+from vision_service.infrastructure.memory_stats import (
+  LOW_BUDGET_CLIP_MB,
+  LOW_BUDGET_PRE_ROLL_SEC,
+  LOW_BUDGET_RING_MB,
+  LOW_BUDGET_WRITE_QUEUE,
+  budget_cap,
+)
+
+
+_REC_ID_RE = re.compile(r"^[0-9]{13}_[a-z0-9_]+$")
+_FRAME_NAME_RE = re.compile(r"^(frame_[0-9]{5}\.jpg|meta\.json)$")
+
+
+@dataclass
+class _ActiveClip:
+  rec_id: str
+  trigger_ts_ms: int
+  post_roll_until_ms: int
+  events: List[Dict[str, Any]]
+  frames: List[FramePacket] = field(default_factory=list)
+  size_bytes: int = 0
+  truncated: bool = False
+
+
+def detect_trigger_events(prev: Optional[Dict[str, Any]], extra: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+  if not isinstance(extra, dict) or not isinstance(prev, dict):
+    return []
+  events: List[Dict[str, Any]] = []
+
+  dc_prev = prev.get("diseased_confirmation")
+  dc_cur = extra.get("diseased_confirmation")
+  was = bool(dc_prev.get("confirmed")) if isinstance(dc_prev, dict) else False
+  now = bool(dc_cur.get("confirmed")) if isinstance(dc_cur, dict) else False
+  if now and not was:
+    events.append({"type": "diseased_confirmed", "hits": dc_cur.get("hits"), "window_n": dc_cur.get("window_n")})
+
+  m_prev = prev.get("molting")
+  m_cur = extra.get("molting")
+  s_prev = m_prev.get("state") if isinstance(m_prev, dict) else None
+  s_cur = m_cur.get("state") if isinstance(m_cur, dict) else None
+  if s_prev and s_cur and s_prev != s_cur:
+    events.append({"type": "molting_state", "from": s_prev, "to": s_cur})
+
+  return events
+
+
+class ClipRecorder:
+  def __init__(self, frame_source, yolo_engine) -> None:
+    self._frame_source = frame_source
+    self._engine = yolo_engine
+    self._dir = os.path.abspath(config.RECORD_DIR)
+    self._pre_roll_ms = int(max(0.0, budget_cap(float(config.RECORD_PRE_ROLL_SEC), LOW_BUDGET_PRE_ROLL_SEC)) * 1000)
+    self._post_roll_ms = int(max(0.0, float(config.RECORD_POST_ROLL_SEC)) * 1000)
+    self._ring_max_bytes = int(max(1, budget_cap(config.RECORD_RING_MAX_MB, LOW_BUDGET_RING_MB)) * 1024 * 1024)
+    # Never below the ring, so a clip always has room for its pre-roll plus at least one more frame
+    self._clip_max_bytes = max(
+      self._ring_max_bytes + 1, int(max(1, budget_cap(config.RECORD_CLIP_MAX_MB, LOW_BUDGET_CLIP_MB)) * 1024 * 1024)
+    )
+    self._quota_bytes = int(max(1, config.RECORD_QUOTA_MB) * 1024 * 1024)
+    self._max_clip_ms = int(max(1.0, float(config.RECORD_MAX_CLIP_SEC)) * 1000)
+
+    self._lock = threading.Lock()
+    self._ring: Deque[FramePacket] = deque()
+    self._ring_bytes = 0
+    self._active: Optional[_ActiveClip] = None
+    self._prev_extra: Optional[Dict[str, Any]] = None
+
+    self._write_queue: "queue.Queue[_ActiveClip]" = queue.Queue(maxsize=int(budget_cap(4, LOW_BUDGET_WRITE_QUEUE)))
+    self._stop = threading.Event()
+    self._writer: Optional[threading.Thread] = None
+    self._started = False
+
+    self._index: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    self._dropped = 0
+    self._evicted = 0
+
+  def start(self) -> None:
+    if not config.RECORD_ENABLED or self._started:
+      return
+    self._started = True
+    os.makedirs(self._dir, exist_ok=True)
+    self._load_index()
+    self._stop.clear()
+    self._writer = threading.Thread(target=self._run_writer, name="koza-recorder", daemon=True)
+    self._writer.start()
+    self._frame_source.subscribe(self._on_frame)
+    self._engine.subscribe(self._on_result)
+
+  def stop(self) -> None:
+    self._stop.set()
+
+  def status(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "enabled": bool(config.RECORD_ENABLED),
+        "ring_frames": len(self._ring),
+        "ring_bytes": int(self._ring_bytes),
+        "recording": self._active.rec_id if self._active else None,
+        "recording_bytes": int(self._active.size_bytes) if self._active else 0,
+        "clip_max_bytes": int(self._clip_max_bytes),
+        "disk_bytes": int(sum(v[0] for v in self._index.values())),
+        "quota_bytes": int(self._quota_bytes),
+        "dropped": int(self._dropped),
+        "evicted": int(self._evicted),
+      }
+
+  def list_recordings(self) -> List[Dict[str, Any]]:
+    with self._lock:
+      items = [{"id": k, "bytes": v[0], **v[1]} for k, v in self._index.items()]
+    items.sort(key=lambda x: x["id"], reverse=True)
+    return items
+
+  def recording_file(self, rec_id: str, name: str) -> Optional[str]:
+    if not _REC_ID_RE.match(rec_id or "") or not _FRAME_NAME_RE.match(name or ""):
+      return None
+    with self._lock:
+      if rec_id not in self._index:
+        return None
+    path = os.path.join(self._dir, rec_id, name)
+    return path if os.path.isfile(path) else None
+
+  def _on_frame(self, pkt: FramePacket) -> None:
+    done: Optional[_ActiveClip] = None
+    with self._lock:
+      self._ring.append(pkt)
+      self._ring_bytes += len(pkt.jpeg_bytes)
+      # Pre-roll ring is bounded both by time and by bytes
+      while self._ring and (
+        self._ring_bytes > self._ring_max_bytes or int(pkt.ts_ms) - int(self._ring[0].ts_ms) > self._pre_roll_ms
+      ):
+        old = self._ring.popleft()
+        self._ring_bytes -= len(old.jpeg_bytes)
+
+      clip = self._active
+      if clip is not None:
+        clip.frames.append(pkt)
+        clip.size_bytes += len(pkt.jpeg_bytes)
+        # Active clips are bounded by bytes as well as time; a clip that hits the byte cap is closed early
+        clip.truncated = clip.size_bytes >= self._clip_max_bytes
+        if (
+          clip.truncated
+          or int(pkt.ts_ms) >= clip.post_roll_until_ms
+          or int(pkt.ts_ms) - clip.trigger_ts_ms >= self._max_clip_ms
+        ):
+          done = clip
+          self._active = None
+
+    if done is not None:
+      self._enqueue(done)
+
+  def _on_result(self, y: YoloResult) -> None:
+    with self._lock:
+      prev = self._prev_extra
+      self._prev_extra = y.extra if isinstance(y.extra, dict) else None
+      events = detect_trigger_events(prev, y.extra)
+      if not events:
+        return
+
+      ts = int(y.ts_ms)
+      if self._active is not None:
+        self._active.events.extend([{**e, "ts_ms": ts} for e in events])
+        self._active.post_roll_until_ms = ts + self._post_roll_ms
+        return
+
+      rec_id = f"{ts:013d}_{events[0]['type']}"
+      self._active = _ActiveClip(
+        rec_id=rec_id,
+        trigger_ts_ms=ts,
+        post_roll_until_ms=ts + self._post_roll_ms,
+        events=[{**e, "ts_ms": ts} for e in events],
+        frames=list(self._ring),
+        size_bytes=self._ring_bytes,
+      )
+
+  def _enqueue(self, clip: _ActiveClip) -> None:
+    try:
+      self._write_queue.put_nowait(clip)
+    except queue.Full:
+      with self._lock:
+        self._dropped += 1
+
+  def _run_writer(self) -> None:
+    while not self._stop.is_set():
+      profiler.checkpoint("recorder")
+      try:
+        clip = self._write_queue.get(timeout=1.0)
+      except queue.Empty:
+        continue
+      try:
+        self._write_clip(clip)
+        self._enforce_quota()
+      except Exception:
+        with self._lock:
+          self._dropped += 1
+
+  def _write_clip(self, clip: _ActiveClip) -> None:
+    final_dir = os.path.join(self._dir, clip.rec_id)
+    tmp_dir = final_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    total = 0
+    frames_meta: List[Dict[str, Any]] = []
+    for i, pkt in enumerate(clip.frames):
+      name = f"frame_{i:05d}.jpg"
+      with open(os.path.join(tmp_dir, name), "wb") as f:
+        f.write(pkt.jpeg_bytes)
+      total += len(pkt.jpeg_bytes)
+      frames_meta.append({"name": name, "ts_ms": int(pkt.ts_ms)})
+
+    meta = {
+      "trigger_ts_ms": int(clip.trigger_ts_ms),
+      "events": clip.events,
+      "frame_count": len(frames_meta),
+      "truncated": bool(clip.truncated),
+      "start_ts_ms": frames_meta[0]["ts_ms"] if frames_meta else None,
+      "end_ts_ms": frames_meta[-1]["ts_ms"] if frames_meta else None,
+      "frames": frames_meta,
+    }
+    raw = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    with open(os.path.join(tmp_dir, "meta.json"), "wb") as f:
+      f.write(raw)
+    total += len(raw)
+
+    os.replace(tmp_dir, final_dir)
+    with self._lock:
+      self._index[clip.rec_id] = (int(total), _summary(meta))
+
+  def _enforce_quota(self) -> None:
+    while True:
+      with self._lock:
+        used = sum(v[0] for v in self._index.values())
+        if used <= self._quota_bytes or len(self._index) <= 1:
+          return
+        oldest = min(self._index.keys())
+        self._index.pop(oldest, None)
+        self._evicted += 1
+      shutil.rmtree(os.path.join(self._dir, oldest), ignore_errors=True)
+
+  def _load_index(self) -> None:
+    index: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    for name in os.listdir(self._dir):
+      path = os.path.join(self._dir, name)
+      if name.endswith(".tmp"):
+        shutil.rmtree(path, ignore_errors=True)
+        continue
+      if not _REC_ID_RE.match(name) or not os.path.isdir(path):
+        continue
+      try:
+        with open(os.path.join(path, "meta.json"), "rb") as f:
+          meta = json.loads(f.read())
+        size = sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+      except Exception:
+        continue
+      index[name] = (int(size), _summary(meta))
+    with self._lock:
+      self._index = index
+    self._enforce_quota()
+
+
+def _summary(meta: Dict[str, Any]) -> Dict[str, Any]:
+  return {k: meta.get(k) for k in ("trigger_ts_ms", "events", "frame_count", "start_ts_ms", "end_ts_ms")}
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from vision_service import config
+from vision_service.application.ports import MetricExtractor
+from vision_service.domain.growth import GrowthTracker, parse_grid, parse_hours_list
+from vision_service.domain.molting import MoltingStateMachine
+from vision_service.domain.models import BBox, Detection
+from vision_service.domain.roi import Point, RoiTransform, is_axis_rect, letterbox_shape, parse_roi, roi_rect_px
+
+
+MOVEMENT_THRESHOLDS = {
+  "adaptasyon": {"risk_low": 0.15, "stress_high": 0.50, "ideal": (0.25, 0.40), "normal": (0.20, 0.45)},
+  "larva_1": {"risk_low": 0.20, "stress_high": 0.60, "ideal": (0.30, 0.50), "normal": (0.25, 0.55)},
+  "larva_2": {"risk_low": 0.15, "stress_high": 0.50, "ideal": (0.25, 0.40), "normal": (0.20, 0.45)},
+  "larva_3": {"risk_low": 0.10, "stress_high": 0.45, "ideal": (0.20, 0.35), "normal": (0.15, 0.40)},
+  "larva_4": {"risk_low": 0.08, "stress_high": 0.40, "ideal": (0.15, 0.30), "normal": (0.10, 0.35)},
+  "larva_5": {"risk_low": 0.05, "stress_high": 0.35, "ideal": (0.10, 0.25), "normal": (0.08, 0.30)},
+  "koza_oncesi": {"risk_low": 0.02, "stress_high": 0.25, "ideal": (0.05, 0.15), "normal": (0.03, 0.20)},
+  "koza": {"risk_low": None, "stress_high": None, "ideal": (0.00, 0.00), "normal": (0.00, 0.02)},
+}
+
+
+def import_yolo():
+  try:
+    from ultralytics import YOLO  # type: ignore
+  except Exception:  # pragma: no cover
+    return None
+  return YOLO
+
+
+def normalize_stage_key(stage_raw: str) -> str:
+  s = (stage_raw or "").strip().lower()
+  if not s:
+    return ""
+  s = s.replace("-", "_")
+  if s in ("adaptasyon", "adaptation", "adaptation_0_1", "adaptasyon_0_1", "day0", "day_0", "day1", "day_1"):
+    return "adaptasyon"
+  if s in ("koza", "cocoon", "cocoon_stage"):
+    return "koza"
+  if s in ("koza_oncesi", "kozaoncesi", "pre_koza", "prekoza", "pre_cocoon"):
+    return "koza_oncesi"
+  if s.startswith("larva"):
+    return s
+  if s.startswith("instar"):
+    parts = s.replace("instar", "").strip("_")
+    if parts.isdigit():
+      return f"larva_{parts}"
+    if parts.startswith("_") and parts[1:].isdigit():
+      return f"larva_{parts[1:]}"
+  return s
+
+
+def is_cocoon_label(label: str) -> bool:
+  l = (label or "").strip().lower()
+  return l in ("cocoon", "cocoons", "koza", "koza_cocoon") or "cocoon" in l or "koza" in l
+
+
+def is_larva_label(label: str) -> bool:
+  l = (label or "").strip().lower()
+  return l in ("larva", "larvae", "kurt", "bocek", "böcek") or "larva" in l
+
+
+def is_diseased_label(label: str) -> bool:
+  l = (label or "").strip().lower()
+  return l in ("diseased", "disease", "hasta", "hastalik") or "diseas" in l or "hasta" in l
+
+
+def parse_yolo_boxes(res) -> List[Tuple[float, float, float, float, float, str]]:
+  out: List[Tuple[float, float, float, float, float, str]] = []
+  if not res or len(res) == 0:
+    return out
+  r0 = res[0]
+  names = getattr(r0, "names", None)
+  boxes = getattr(r0, "boxes", None)
+  if boxes is None:
+    return out
+  xyxy = getattr(boxes, "xyxy", None)
+  conf = getattr(boxes, "conf", None)
+  cls = getattr(boxes, "cls", None)
+  if xyxy is None or conf is None or cls is None:
+    return out
+
+  xyxy_list = xyxy.cpu().numpy().tolist()
+  conf_list = conf.cpu().numpy().tolist()
+  cls_list = cls.cpu().numpy().tolist()
+  for i in range(min(len(xyxy_list), len(conf_list), len(cls_list))):
+    x1, y1, x2, y2 = [float(v) for v in xyxy_list[i]]
+    ci = int(cls_list[i])
+    label = str(ci)
+    if isinstance(names, dict) and ci in names:
+      label = str(names[ci])
+    out.append((x1, y1, x2, y2, float(conf_list[i]), label))
+  return out
+
+
+def predict_kwargs(frame: np.ndarray, imgsz: int) -> Dict[str, Any]:
+  # The frame is already letterboxed to a stride multiple, so passing its own shape keeps ultralytics from resizing again
+  if int(imgsz) <= 0:
+    return {}
+  return {"imgsz": [int(frame.shape[0]), int(frame.shape[1])]}
+
+
+def _scale_size_block(det_extra: Optional[Dict[str, Any]], s: float) -> Optional[Dict[str, Any]]:
+  # Metric extractor sizes are in decoded pixels; rescale them to full-frame pixels after a reduced decode
+  size = det_extra.get("size") if isinstance(det_extra, dict) else None
+  if not isinstance(size, dict):
+    return det_extra
+  out = dict(size)
+  for k in ("width_px", "height_px"):
+    if k in out:
+      out[k] = int(round(out[k] * s))
+  if "area_px" in out:
+    out["area_px"] = int(round(out["area_px"] * s * s))
+  for k in ("width_mm", "height_mm"):
+    if k in out:
+      out[k] = float(out[k] * s)
+  if "area_mm2" in out:
+    out["area_mm2"] = float(out["area_mm2"] * s * s)
+  return {**det_extra, "size": out}
+
+
+@dataclass
+class _RoiGeometry:
+  rect: Tuple[int, int, int, int]
+  polygon: Optional[np.ndarray]
+  mask: Optional[np.ndarray]
+  active: bool
+
+
+def _movement_thresholds_payload(stage_thresholds: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+  if stage_thresholds is None:
+    return {}
+  return {
+    "movement_thresholds": {
+      "ideal": list(stage_thresholds.get("ideal")) if isinstance(stage_thresholds.get("ideal"), tuple) else None,
+      "normal": list(stage_thresholds.get("normal")) if isinstance(stage_thresholds.get("normal"), tuple) else None,
+      "risk_low": stage_thresholds.get("risk_low"),
+      "stress_high": stage_thresholds.get("stress_high"),
+    }
+  }
+
+
+class FrameAnalyzer:
+  def __init__(self, metric_extractor: MetricExtractor | None = None, roi: str | None = None) -> None:
+    self._metric_extractor = metric_extractor
+    self.roi_error: Optional[str] = None
+    self._roi: Optional[List[Point]] = None
+    try:
+      self._roi = parse_roi(getattr(config, "ROI", "") if roi is None else roi)
+    except ValueError as e:
+      # A bad ROI falls back to the full frame; the error is surfaced in extra["roi"]
+      self.roi_error = str(e)
+    self._geometry: Optional[_RoiGeometry] = None
+    self._geometry_size: Tuple[int, int] = (0, 0)
+    self._canvas: np.ndarray | None = None
+    self.last_input: Dict[str, int] = {}
+    self._diseased_window = deque(maxlen=max(1, int(getattr(config, "DISEASED_WINDOW_N", 10) or 10)))
+    self._prev_gray: np.ndarray | None = None
+    self._gray_buf: np.ndarray | None = None
+    self._diff_buf: np.ndarray | None = None
+    self._molting = MoltingStateMachine()
+    self._growth = GrowthTracker(
+      horizons_h=parse_hours_list(getattr(config, "GROWTH_HORIZONS_H", "6,24,72")),
+      ratio_horizon_h=float(getattr(config, "GROWTH_RATIO_HORIZON_H", 24.0) or 24.0),
+      current_sec=float(getattr(config, "GROWTH_CURRENT_SEC", 900.0) or 900.0),
+      buckets=int(getattr(config, "GROWTH_BUCKETS", 48) or 48),
+      grid=parse_grid(getattr(config, "GROWTH_GRID", "1x1")),
+      trend_eps=float(getattr(config, "GROWTH_TREND_EPS", 0.03)),
+      min_coverage=float(getattr(config, "GROWTH_MIN_COVERAGE", 0.25)),
+    )
+
+  def _roi_geometry(self, w: int, h: int) -> _RoiGeometry:
+    g = self._geometry
+    if g is not None and self._geometry_size == (w, h):
+      return g
+    rect = roi_rect_px(self._roi, w, h)
+    polygon = None
+    mask = None
+    if self._roi and not is_axis_rect(self._roi):
+      polygon = np.array([[p[0] * w, p[1] * h] for p in self._roi], dtype=np.float32)
+      x0, y0, x1, y1 = rect
+      mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+      cv2.fillPoly(mask, [np.round(polygon - [x0, y0]).astype(np.int32)], 255)
+    g = _RoiGeometry(rect=rect, polygon=polygon, mask=mask, active=rect != (0, 0, w, h) or polygon is not None)
+    self._geometry = g
+    self._geometry_size = (w, h)
+    return g
+
+  def model_input(self, crop: np.ndarray, imgsz: int) -> Tuple[np.ndarray, float, int, int]:
+    # Crop is resized once into a reused stride-aligned canvas; the padding keeps the letterbox gray from allocation
+    if int(imgsz) <= 0:
+      return crop, 1.0, 0, 0
+    h, w = crop.shape[:2]
+    scale, nw, nh, cw, ch = letterbox_shape(w, h, int(imgsz))
+    if self._canvas is None or self._canvas.shape[:2] != (ch, cw):
+      self._canvas = np.full((ch, cw, 3), 114, dtype=np.uint8)
+    pad_x = (cw - nw) // 2
+    pad_y = (ch - nh) // 2
+    cv2.resize(crop, (nw, nh), dst=self._canvas[pad_y : pad_y + nh, pad_x : pad_x + nw], interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR)
+    return self._canvas, scale, pad_x, pad_y
+
+  def roi_extent(self, w: int, h: int) -> Tuple[int, int]:
+    # ROI crop size for a w x h frame, without touching the cached geometry
+    x0, y0, x1, y1 = roi_rect_px(self._roi, w, h)
+    return x1 - x0, y1 - y0
+
+  def roi_active(self, w: int, h: int, imgsz: int = 0) -> bool:
+    return self._roi_geometry(w, h).active or int(imgsz) > 0
+
+  def motion(self, img: np.ndarray, mask: np.ndarray | None = None) -> Tuple[Optional[float], Optional[float]]:
+    motion_score = None
+    movement_index = None
+    try:
+      h, w = img.shape[:2]
+      # Two grayscale buffers swapped every frame plus one diff buffer; reallocated only on a resolution change
+      if self._gray_buf is None or self._gray_buf.shape != (h, w):
+        self._gray_buf = np.empty((h, w), dtype=np.uint8)
+        self._diff_buf = np.empty((h, w), dtype=np.uint8)
+        self._prev_gray = None
+
+      gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+      if self._prev_gray is not None:
+        diff = cv2.absdiff(gray, self._prev_gray, dst=self._diff_buf)
+        mean_diff = float(cv2.mean(diff, mask=mask)[0]) if diff.size else 0.0
+        movement_index = max(0.0, min(1.0, (mean_diff / 255.0)))
+        motion_score = movement_index * 100.0
+        self._gray_buf = self._prev_gray
+      else:
+        self._gray_buf = np.empty((h, w), dtype=np.uint8)
+      self._prev_gray = gray
+    except Exception:
+      motion_score = None
+      movement_index = None
+    return movement_index, motion_score
+
+  def prime_motion(self, img: np.ndarray) -> None:
+    # Sets the motion reference from a frame that is not itself analysed (e.g. the frame before a batch shard)
+    geo = self._roi_geometry(*img.shape[1::-1])
+    x0, y0, x1, y1 = geo.rect
+    self.motion(img[y0:y1, x0:x1] if geo.active else img, geo.mask)
+
+  def analyze(
+    self,
+    img: np.ndarray,
+    ts_ms: int,
+    stage_raw: str,
+    predict: Callable[[np.ndarray], Any] | None = None,
+    imgsz: int = 0,
+    frame_scale: float = 1.0,
+  ) -> Tuple[List[Detection], Dict[str, Any]]:
+    # frame_scale > 1 when img was decoded at reduced size; outputs stay in full-frame pixels
+    fs = float(frame_scale)
+    h_img, w_img = img.shape[:2]
+    frame_area_px = float(max(1, w_img * h_img)) * fs * fs
+
+    # Motion and inference only look at the tray ROI; detections are mapped back to full-frame pixels below
+    geo = self._roi_geometry(w_img, h_img)
+    x0, y0, x1_roi, y1_roi = geo.rect
+    crop = img[y0:y1_roi, x0:x1_roi] if geo.active else img
+    self.last_input = {
+      "pixels_frame": int(w_img * h_img),
+      "pixels_motion": int(cv2.countNonZero(geo.mask)) if geo.mask is not None else int(crop.shape[0] * crop.shape[1]),
+    }
+
+    movement_index, motion_score = self.motion(crop, geo.mask)
+
+    active_stage_key = normalize_stage_key(stage_raw)
+    stage_thresholds = MOVEMENT_THRESHOLDS.get(active_stage_key)
+
+    movement_level = None
+    if movement_index is not None and stage_thresholds is not None:
+      risk_low = stage_thresholds.get("risk_low")
+      stress_high = stage_thresholds.get("stress_high")
+      if isinstance(risk_low, (int, float)) and movement_index < float(risk_low):
+        movement_level = "low_risk"
+      elif isinstance(stress_high, (int, float)) and movement_index > float(stress_high):
+        movement_level = "high_stress"
+      else:
+        movement_level = "normal"
+
+    molting = self._molting.update(
+      ts_ms=int(ts_ms),
+      stage_key=active_stage_key,
+      movement_index=movement_index,
+    )
+
+    movement_payload = {
+      **({"movement_index": float(movement_index)} if movement_index is not None else {}),
+      **({"motion_score": float(motion_score)} if motion_score is not None else {}),
+      **({"movement_level": movement_level} if movement_level is not None else {}),
+      **({"movement_stage": active_stage_key} if isinstance(active_stage_key, str) and active_stage_key else {}),
+      **_movement_thresholds_payload(stage_thresholds),
+    }
+
+    if predict is None:
+      extra = {
+        "stage_hint": {
+          "cocoon_count": 0,
+          "larva_count": 0,
+          "has_cocoon": False,
+          "has_larva": False,
+          "stage": "none",
+        },
+        "larva_metrics": {
+          "larva_density_area_ratio": 0.0,
+          "larva_bbox_area_px_sum": 0.0,
+          **movement_payload,
+        },
+        "molting": molting,
+        "model_loaded": False,
+      }
+      extra.update(self._roi_payload(geo, 0, fs))
+      return [], extra
+
+    diseased_conf_threshold = float(getattr(config, "DISEASED_CONF_THRESHOLD", 0.6) or 0.6)
+    diseased_min_hits = int(getattr(config, "DISEASED_MIN_HITS", 3) or 3)
+
+    infer_img, scale, pad_x, pad_y = self.model_input(crop, imgsz)
+    self.last_input["pixels_infer"] = int(infer_img.shape[0] * infer_img.shape[1])
+    tf = RoiTransform(offset_x=x0, offset_y=y0, scale=scale, pad_x=pad_x, pad_y=pad_y) if crop is not img or infer_img is not crop else None
+    res = predict(infer_img)
+
+    dets: List[Detection] = []
+    diseased_hit = False
+    cocoon_count = 0
+    larva_count = 0
+    larva_area_px_sum = 0.0
+    growth_samples: List[Tuple[str, float, int, int]] = []
+    rect_full = tuple(float(v) * fs for v in geo.rect)
+    for x1, y1, x2, y2, c, label in parse_yolo_boxes(res):
+      if tf is not None:
+        x1, y1 = tf.to_frame(x1, y1)
+        x2, y2 = tf.to_frame(x2, y2)
+        # Clamp to the ROI rect, not the frame: box parts in the letterbox padding lie outside the tray
+        x1, x2 = min(max(x1, float(x0)), float(x1_roi)), min(max(x2, float(x0)), float(x1_roi))
+        y1, y2 = min(max(y1, float(y0)), float(y1_roi)), min(max(y2, float(y0)), float(y1_roi))
+      if geo.polygon is not None and cv2.pointPolygonTest(geo.polygon, ((x1 + x2) / 2.0, (y1 + y2) / 2.0), False) < 0:
+        continue
+
+      det_extra = None
+      if is_cocoon_label(label) and self._metric_extractor is not None:
+        det_extra = self._metric_extractor.extract(img, label, x1, y1, x2, y2)
+      if fs != 1.0:
+        x1, y1, x2, y2 = x1 * fs, y1 * fs, x2 * fs, y2 * fs
+        det_extra = _scale_size_block(det_extra, fs)
+
+      if is_diseased_label(label) and c >= diseased_conf_threshold:
+        diseased_hit = True
+
+      w_px = max(0.0, float(max(x1, x2) - min(x1, x2)))
+      h_px = max(0.0, float(max(y1, y2) - min(y1, y2)))
+      growth_label = None
+      if is_cocoon_label(label):
+        cocoon_count += 1
+        growth_label = "cocoon"
+      if is_larva_label(label):
+        larva_count += 1
+        larva_area_px_sum += w_px * h_px
+        growth_label = "larva"
+      if growth_label is not None:
+        row, col = self._growth.region_of((x1 + x2) / 2.0, (y1 + y2) / 2.0, rect_full)
+        growth_samples.append((growth_label, w_px * h_px / frame_area_px, row, col))
+
+      dets.append(Detection(label=label, confidence=c, bbox=BBox(x1=x1, y1=y1, x2=x2, y2=y2), extra=det_extra))
+
+    self._diseased_window.append(bool(diseased_hit))
+    hits = int(sum(1 for x in self._diseased_window if x))
+    window_n = int(len(self._diseased_window))
+    confirmed = bool(window_n > 0 and hits >= diseased_min_hits)
+
+    larva_density_ratio = float(larva_area_px_sum / frame_area_px)
+    stage = "cocoon" if cocoon_count > 0 else "larva" if larva_count > 0 else "none"
+
+    extra = {
+      "stage_hint": {
+        "cocoon_count": int(cocoon_count),
+        "larva_count": int(larva_count),
+        "has_cocoon": bool(cocoon_count > 0),
+        "has_larva": bool(larva_count > 0),
+        "stage": stage,
+      },
+      "larva_metrics": {
+        "larva_density_area_ratio": float(larva_density_ratio),
+        "larva_bbox_area_px_sum": float(larva_area_px_sum),
+        **movement_payload,
+      },
+      "molting": molting,
+      "growth": self._growth.update(int(ts_ms), growth_samples),
+      "diseased_confirmation": {
+        "window_n": int(window_n),
+        "min_hits": int(diseased_min_hits),
+        "hits": int(hits),
+        "threshold_conf": float(diseased_conf_threshold),
+        "confirmed": bool(confirmed),
+      },
+    }
+    extra.update(self._roi_payload(geo, imgsz, fs))
+    return dets, extra
+
+  def _roi_payload(self, geo: _RoiGeometry, imgsz: int, fs: float = 1.0) -> Dict[str, Any]:
+    if not geo.active and int(imgsz) <= 0 and not self.roi_error:
+      return {}
+    return {
+      "roi": {
+        "rect_px": [int(round(v * fs)) for v in geo.rect],
+        "polygon": geo.polygon is not None,
+        **({"imgsz": int(imgsz)} if int(imgsz) > 0 else {}),
+        **({"error": self.roi_error} if self.roi_error else {}),
+      }
+    }
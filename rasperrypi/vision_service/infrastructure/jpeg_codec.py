@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from vision_service import config
+
+try:
+  import turbojpeg  # type: ignore
+except Exception:  # pragma: no cover
+  turbojpeg = None
+
+# Reduced-size decodes happen in the DCT domain (libjpeg scale_denom), so 1/2 and 1/4 skip most of the IDCT
+# and colour conversion work instead of decoding full size and resizing afterwards
+DECODE_SCALES = (1, 2, 4)
+# Ultralytics' default input size, used to pick a decode scale when no explicit imgsz is set
+DEFAULT_MODEL_INPUT = 640
+
+_CV_DECODE_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4}
+_CV_SAMPLING = {
+  "444": getattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR_444", None),
+  "422": getattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR_422", None),
+  "420": getattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR_420", None),
+}
+
+
+def turbojpeg_available() -> bool:
+  return turbojpeg is not None
+
+
+class OpenCvJpegCodec:
+  name = "opencv"
+
+  def __init__(self, subsampling: str = "420") -> None:
+    self._extra_params = []
+    sampling = _CV_SAMPLING.get(subsampling)
+    if sampling is not None and hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR"):
+      self._extra_params = [int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR), int(sampling)]
+
+  def decode(self, data: Any, scale: int = 1) -> Optional[np.ndarray]:
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), _CV_DECODE_FLAGS.get(int(scale), cv2.IMREAD_COLOR))
+
+  def encode(self, img: np.ndarray, quality: int) -> Optional[Any]:
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality), *self._extra_params])
+    if not ok:
+      return None
+    # The encoded array is fresh per call, so hand out a read-only view of it instead of copying into bytes
+    buf.setflags(write=False)
+    return memoryview(buf)
+
+
+class TurboJpegCodec:
+  name = "turbojpeg"
+
+  def __init__(self, subsampling: str = "420", fast_dct: bool = True, lib_path: str = "") -> None:
+    if turbojpeg is None:
+      raise RuntimeError("PyTurboJPEG is not installed")
+    self._tj = turbojpeg.TurboJPEG(lib_path or None)
+    self._subsample = {
+      "444": turbojpeg.TJSAMP_444,
+      "422": turbojpeg.TJSAMP_422,
+      "420": turbojpeg.TJSAMP_420,
+    }.get(subsampling, turbojpeg.TJSAMP_420)
+    self._encode_flags = turbojpeg.TJFLAG_FASTDCT if fast_dct else 0
+    self._decode_flags = (turbojpeg.TJFLAG_FASTDCT | turbojpeg.TJFLAG_FASTUPSAMPLE) if fast_dct else 0
+
+  def decode(self, data: Any, scale: int = 1) -> Optional[np.ndarray]:
+    factor = None if int(scale) <= 1 else (1, int(scale))
+    return self._tj.decode(data, pixel_format=turbojpeg.TJPF_BGR, scaling_factor=factor, flags=self._decode_flags)
+
+  def encode(self, img: np.ndarray, quality: int) -> Optional[Any]:
+    return self._tj.encode(
+      img,
+      quality=int(quality),
+      pixel_format=turbojpeg.TJPF_BGR,
+      jpeg_subsample=self._subsample,
+      flags=self._encode_flags,
+    )
+
+
+def load_codec(kind: str | None = None) -> Tuple[Any, Optional[str]]:
+  # (codec, error): "auto" and "turbojpeg" fall back to OpenCV when PyTurboJPEG or libturbojpeg is missing
+  kind = (kind if kind is not None else getattr(config, "JPEG_CODEC", "auto")).strip().lower() or "auto"
+  subsampling = str(getattr(config, "JPEG_SUBSAMPLING", "420"))
+  if kind in ("auto", "turbojpeg", "turbo"):
+    try:
+      return TurboJpegCodec(subsampling, bool(getattr(config, "JPEG_FAST_DCT", True)), getattr(config, "TURBOJPEG_LIB", "")), None
+    except Exception as e:
+      error = None if kind == "auto" and turbojpeg is None else f"turbojpeg unavailable: {e}"
+      return OpenCvJpegCodec(subsampling), error
+  if kind != "opencv":
+    return OpenCvJpegCodec(subsampling), f"unknown JPEG codec {kind!r}"
+  return OpenCvJpegCodec(subsampling), None
+
+
+def pick_decode_scale(width: int, height: int, need_long_side: int, max_scale: int = 4) -> int:
+  # Largest scale whose decoded long side still covers what the model (or the letterbox) will use
+  long_side = max(int(width), int(height))
+  for d in sorted(DECODE_SCALES, reverse=True):
+    if d <= int(max_scale) and d > 1 and long_side / d >= int(need_long_side):
+      return d
+  return 1
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Optional
+
+from vision_service import config
+
+# Caps applied in KOZA_MEMORY_BUDGET=low mode
+LOW_BUDGET_RING_MB = 4
+LOW_BUDGET_CLIP_MB = 8
+LOW_BUDGET_PRE_ROLL_SEC = 2.0
+LOW_BUDGET_WRITE_QUEUE = 1
+
+
+def low_memory_mode() -> bool:
+  return (config.MEMORY_BUDGET or "").strip().lower() == "low"
+
+
+def budget_cap(value: float, low_cap: float) -> float:
+  if low_memory_mode():
+    return min(value, low_cap)
+  return value
+
+
+def read_rss_bytes() -> Optional[int]:
+  try:
+    with open("/proc/self/statm", "r", encoding="ascii") as f:
+      pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE")
+  except Exception:
+    return None
+
+
+def settle_gc() -> None:
+  # Long-lived startup objects (model weights wrappers, modules) are moved out of the collector's view,
+  # so later full collections only walk the short-lived per-frame objects.
+  if not low_memory_mode():
+    return
+  gc.collect()
+  gc.freeze()
+
+
+class MemoryStats:
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._prev_t: Optional[float] = None
+    self._prev_collections: Optional[list] = None
+    if config.MEMORY_TRACE and not tracemalloc.is_tracing():
+      tracemalloc.start()
+
+  def snapshot(self) -> Dict[str, Any]:
+    now = time.monotonic()
+    collections = [int(s.get("collections", 0)) for s in gc.get_stats()]
+    threshold0 = gc.get_threshold()[0]
+
+    out: Dict[str, Any] = {
+      "budget": "low" if low_memory_mode() else "normal",
+      "allocated_blocks": int(sys.getallocatedblocks()),
+      "gc_collections": collections,
+      "gc_frozen": int(gc.get_freeze_count()),
+    }
+    rss = read_rss_bytes()
+    if rss is not None:
+      out["rss_mb"] = float(round(rss / (1024 * 1024), 1))
+
+    with self._lock:
+      if self._prev_t is not None and self._prev_collections is not None and now > self._prev_t:
+        dt = now - self._prev_t
+        gen0_rate = (collections[0] - self._prev_collections[0]) / dt
+        out["gc_gen0_per_sec"] = float(round(gen0_rate, 3))
+        # A gen0 collection runs every threshold0 net container allocations, so this approximates the steady-state rate
+        out["est_container_allocs_per_sec"] = float(round(gen0_rate * threshold0, 1))
+      self._prev_t = now
+      self._prev_collections = collections
+
+    if tracemalloc.is_tracing():
+      cur, peak = tracemalloc.get_traced_memory()
+      out["traced_mb"] = float(round(cur / (1024 * 1024), 2))
+      out["traced_peak_mb"] = float(round(peak / (1024 * 1024), 2))
+    return out
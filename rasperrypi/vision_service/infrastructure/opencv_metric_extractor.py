@@ -41,6 +41,7 @@ def _delta_e76(lab1: tuple[float, float, float], lab2: tuple[float, float, float
 class OpenCvMetricExtractor:
   def __init__(self) -> None:
     self._lab_target = _parse_lab_target(getattr(config, "COLOR_LAB_TARGET", ""))
+    self._gray_scratch: np.ndarray | None = None
 
   def extract(self, img_bgr: np.ndarray, label: str, x1: float, y1: float, x2: float, y2: float) -> Optional[Dict[str, Any]]:
     if img_bgr is None or img_bgr.size == 0:
@@ -75,9 +76,16 @@ class OpenCvMetricExtractor:
     if self._lab_target is not None:
       delta_e = _delta_e76((l_val, a_val, b_val), self._lab_target)
 
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    mean_gray = float(np.mean(gray)) if gray.size else 0.0
-    std_gray = float(np.std(gray)) if gray.size else 0.0
+    # Gray ROI goes into a view of a frame-sized scratch buffer; meanStdDev avoids np.std's float64 temporaries
+    if self._gray_scratch is None or self._gray_scratch.shape != (h_img, w_img):
+      self._gray_scratch = np.empty((h_img, w_img), dtype=np.uint8)
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=self._gray_scratch[: roi.shape[0], : roi.shape[1]])
+    mean_gray = 0.0
+    std_gray = 0.0
+    if gray.size:
+      m, sd = cv2.meanStdDev(gray)
+      mean_gray = float(m[0, 0])
+      std_gray = float(sd[0, 0])
     homogeneity = None
     if mean_gray > 1e-6:
       homogeneity = float(std_gray / mean_gray)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class Ema:
+  def __init__(self, alpha: float = 0.1) -> None:
+    self._alpha = float(alpha)
+    self.value: Optional[float] = None
+    self.count = 0
+
+  def add(self, v: float) -> None:
+    self.count += 1
+    if self.value is None:
+      self.value = float(v)
+    else:
+      self.value = float(self.value * (1.0 - self._alpha) + float(v) * self._alpha)
+
+
+class RateMeter:
+  def __init__(self, alpha: float = 0.1) -> None:
+    self._interval = Ema(alpha)
+    self._last: Optional[float] = None
+
+  def tick(self) -> None:
+    now = time.monotonic()
+    if self._last is not None:
+      self._interval.add(now - self._last)
+    self._last = now
+
+  def rate(self) -> Optional[float]:
+    v = self._interval.value
+    if v is None or v <= 0:
+      return None
+    return float(1.0 / v)
+
+
+class PerfStats:
+  def __init__(self, alpha: float = 0.1) -> None:
+    self._alpha = alpha
+    self._lock = threading.Lock()
+    self._emas: Dict[str, Ema] = {}
+    self._rates: Dict[str, RateMeter] = {}
+    self._values: Dict[str, Any] = {}
+
+  def observe(self, name: str, v: float) -> None:
+    with self._lock:
+      e = self._emas.get(name)
+      if e is None:
+        e = self._emas[name] = Ema(self._alpha)
+      e.add(v)
+
+  def tick(self, name: str) -> None:
+    with self._lock:
+      r = self._rates.get(name)
+      if r is None:
+        r = self._rates[name] = RateMeter(self._alpha)
+      r.tick()
+
+  def set(self, name: str, v: Any) -> None:
+    with self._lock:
+      self._values[name] = v
+
+  def snapshot(self) -> Dict[str, Any]:
+    with self._lock:
+      out: Dict[str, Any] = dict(self._values)
+      for k, e in self._emas.items():
+        if e.value is not None:
+          out[k] = float(round(e.value, 3))
+      for k, r in self._rates.items():
+        rate = r.rate()
+        if rate is not None:
+          out[k] = float(round(rate, 3))
+    return out
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Service threads are started with these names so a profile can be scoped to one of them
+THREAD_NAMES: Dict[str, str] = {
+  "engine": "koza-engine",
+  "camera": "koza-camera",
+  "pusher": "koza-pusher",
+  "governor": "koza-governor",
+  "recorder": "koza-recorder",
+}
+
+MAX_PROFILE_SEC = 60.0
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_FORMATS = ("pstats", "collapsed")
+
+
+class ProfileError(Exception):
+  pass
+
+
+class ProfileBusy(ProfileError):
+  pass
+
+
+class ProfileStalled(ProfileError):
+  pass
+
+
+def _short_path(path: str) -> str:
+  i = path.rfind("site-packages" + os.sep)
+  if i >= 0:
+    return path[i + len("site-packages") + 1 :]
+  i = path.rfind("vision_service" + os.sep)
+  if i >= 0:
+    return path[i:]
+  return os.path.basename(path)
+
+
+def _frame_label(code) -> str:
+  return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_labels(frame) -> List[str]:
+  out: List[str] = []
+  while frame is not None:
+    out.append(_frame_label(frame.f_code))
+    frame = frame.f_back
+  out.reverse()
+  return out
+
+
+def dump_threads() -> str:
+  frames = sys._current_frames()
+  buf = io.StringIO()
+  for t in sorted(threading.enumerate(), key=lambda t: t.name):
+    buf.write(f'Thread "{t.name}" ident={t.ident} daemon={t.daemon} alive={t.is_alive()}\n')
+    frame = frames.get(t.ident) if t.ident is not None else None
+    if frame is None:
+      buf.write("  <no frame>\n\n")
+      continue
+    buf.write("".join(traceback.format_stack(frame)))
+    buf.write("\n")
+  return buf.getvalue()
+
+
+class _CprofileSession:
+  def __init__(self, seconds: float) -> None:
+    self.seconds = float(seconds)
+    self.prof: Optional[cProfile.Profile] = None
+    self.started_at = 0.0
+    self.done = threading.Event()
+    self.abandoned = False
+
+  # Runs in the target thread: cProfile only ever sees the thread that enabled it
+  def step(self) -> None:
+    if self.done.is_set():
+      return
+    if self.prof is None:
+      if self.abandoned:
+        self.done.set()
+        return
+      self.prof = cProfile.Profile()
+      self.started_at = time.monotonic()
+      self.prof.enable()
+      return
+    if self.abandoned or time.monotonic() - self.started_at >= self.seconds:
+      self.prof.disable()
+      self.done.set()
+
+
+class ThreadProfiler:
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._busy = False
+    self._pending: Dict[str, _CprofileSession] = {}
+
+  def checkpoint(self, target: str) -> None:
+    # Called once per loop iteration by the service threads; a dict truth test while no cProfile session is pending
+    if not self._pending:
+      return
+    s = self._pending.get(target)
+    if s is not None:
+      s.step()
+      if s.abandoned and s.done.is_set():
+        self._drop(s)
+
+  def _drop(self, session: _CprofileSession) -> None:
+    with self._lock:
+      self._pending = {k: v for k, v in self._pending.items() if v is not session}
+
+  def _acquire(self) -> None:
+    with self._lock:
+      if self._busy:
+        raise ProfileBusy("a profile is already running")
+      self._busy = True
+
+  def _release(self) -> None:
+    with self._lock:
+      self._busy = False
+
+  def profile(self, target: str, seconds: float, mode: str = "sample", fmt: str = "pstats", interval_ms: float = 5.0, limit: int = 60) -> str:
+    if target != "all" and target not in THREAD_NAMES:
+      raise ProfileError(f"target must be one of all, {', '.join(THREAD_NAMES)}")
+    if mode not in PROFILE_MODES:
+      raise ProfileError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+    if fmt not in PROFILE_FORMATS:
+      raise ProfileError(f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    if mode == "cprofile" and (target == "all" or fmt == "collapsed"):
+      raise ProfileError("mode=cprofile needs a single target and format=pstats")
+    seconds = min(max(0.1, float(seconds)), MAX_PROFILE_SEC)
+
+    self._acquire()
+    try:
+      if mode == "cprofile":
+        return self._run_cprofile(target, seconds, limit)
+      stacks, samples = self._run_sampler(target, seconds, max(1.0, float(interval_ms)) / 1000.0)
+      if fmt == "collapsed":
+        return "".join(f"{stack} {n}\n" for stack, n in stacks.most_common())
+      return _sample_table(stacks, samples, seconds, limit)
+    finally:
+      self._release()
+
+  def _run_sampler(self, target: str, seconds: float, interval: float) -> Tuple[Counter, int]:
+    wanted = set(THREAD_NAMES.values()) if target == "all" else {THREAD_NAMES[target]}
+    stacks: Counter = Counter()
+    samples = 0
+    me = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+      names = {t.ident: t.name for t in threading.enumerate() if t.name in wanted}
+      if not names:
+        raise ProfileError(f"no running thread for target {target}")
+      for ident, frame in sys._current_frames().items():
+        if ident == me or ident not in names:
+          continue
+        stacks[";".join([names[ident], *_stack_labels(frame)])] += 1
+      samples += 1
+      time.sleep(interval)
+    return stacks, samples
+
+  def _run_cprofile(self, target: str, seconds: float, limit: int) -> str:
+    session = _CprofileSession(seconds)
+    with self._lock:
+      if target in self._pending:
+        raise ProfileBusy(f"an earlier profile of {target} is still waiting for the thread to finish its iteration")
+      self._pending = {**self._pending, target: session}
+    try:
+      # The target has to pass its loop checkpoint once to start and once more to stop
+      if not session.done.wait(timeout=seconds + max(5.0, seconds)):
+        session.abandoned = True
+        if session.prof is None:
+          raise ProfileStalled(f"{target} thread did not reach its loop checkpoint; it may be stalled (see /debug/threads)")
+        raise ProfileStalled(f"{target} thread did not finish its loop iteration in time; it may be stalled (see /debug/threads)")
+    finally:
+      # A started but abandoned session stays registered so the thread can still disable its profiler
+      if not (session.abandoned and session.prof is not None and not session.done.is_set()):
+        self._drop(session)
+
+    buf = io.StringIO()
+    st = pstats.Stats(session.prof, stream=buf)
+    st.sort_stats("cumulative").print_stats(int(limit))
+    return buf.getvalue()
+
+
+def _sample_table(stacks: Counter, samples: int, seconds: float, limit: int) -> str:
+  self_counts: Counter = Counter()
+  total_counts: Counter = Counter()
+  thread_samples = 0
+  for stack, n in stacks.items():
+    parts = stack.split(";")[1:]
+    thread_samples += n
+    if parts:
+      self_counts[parts[-1]] += n
+    for label in set(parts):
+      total_counts[label] += n
+
+  out = io.StringIO()
+  out.write(f"{samples} sampling rounds over {seconds:.1f}s, {thread_samples} thread samples\n\n")
+  out.write(f"{'total':>8} {'total%':>7} {'self':>8} {'self%':>7}  function\n")
+  denom = float(max(1, thread_samples))
+  for label, n in total_counts.most_common(int(limit)):
+    s = self_counts.get(label, 0)
+    out.write(f"{n:>8} {100.0 * n / denom:>6.1f}% {s:>8} {100.0 * s / denom:>6.1f}%  {label}\n")
+  return out.getvalue()
+
+
+PROFILER = ThreadProfiler()
+checkpoint = PROFILER.checkpoint
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from vision_service import runtime_settings
+from vision_service.domain.models import FramePacket
+from vision_service.infrastructure import profiler
+from vision_service.infrastructure.perf_stats import PerfStats
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_replay_frames(path: str | None, width: int, height: int, max_frames: int, quality: int) -> List[bytes]:
+  params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+  frames: List[bytes] = []
+
+  def _add(img: np.ndarray) -> None:
+    if width > 0 and height > 0 and (img.shape[1], img.shape[0]) != (width, height):
+      img = cv2.resize(img, (width, height))
+    ok, buf = cv2.imencode(".jpg", img, params)
+    if ok:
+      frames.append(buf.tobytes())
+
+  if path and os.path.isdir(path):
+    for name in sorted(os.listdir(path)):
+      if len(frames) >= max_frames:
+        break
+      if name.lower().endswith(_IMAGE_EXTS):
+        img = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR)
+        if img is not None:
+          _add(img)
+  elif path:
+    cap = cv2.VideoCapture(path)
+    try:
+      while len(frames) < max_frames:
+        ok, img = cap.read()
+        if not ok or img is None:
+          break
+        _add(img)
+    finally:
+      cap.release()
+  else:
+    # Synthetic tray: textured background with a few blobs drifting across it
+    w, h = max(64, width or 640), max(48, height or 480)
+    rng = np.random.default_rng(7)
+    bg = cv2.GaussianBlur(rng.integers(60, 200, (h, w, 3), dtype=np.uint8), (7, 7), 0)
+    blobs = [(rng.uniform(0, w), rng.uniform(0, h), rng.uniform(-4, 4), rng.uniform(-4, 4)) for _ in range(8)]
+    for i in range(max(1, min(max_frames, 120))):
+      img = bg.copy()
+      for bx, by, vx, vy in blobs:
+        cx, cy = int((bx + vx * i) % w), int((by + vy * i) % h)
+        cv2.ellipse(img, (cx, cy), (max(4, w // 40), max(3, h // 60)), (i * 3) % 180, 0, 360, (235, 235, 225), -1)
+      _add(img)
+
+  if not frames:
+    raise ValueError(f"no frames could be loaded from {path!r}")
+  return frames
+
+
+class ReplayFrameSource:
+  # Drop-in FrameSource that loops pre-encoded frames at the runtime-settings fps (load tests, demos)
+  def __init__(self, path: str | None = None, width: int = 0, height: int = 0, max_frames: int = 300) -> None:
+    settings = runtime_settings.current()
+    self._frames = load_replay_frames(
+      path,
+      int(width or settings.camera_width),
+      int(height or settings.camera_height),
+      int(max_frames),
+      int(settings.jpeg_quality),
+    )
+    first = cv2.imdecode(np.frombuffer(self._frames[0], dtype=np.uint8), cv2.IMREAD_COLOR)
+    self._size = (int(first.shape[1]), int(first.shape[0]))
+    self._lock = threading.Lock()
+    self._latest: Optional[FramePacket] = None
+    self._listeners: List[Callable[[FramePacket], None]] = []
+    self._stop = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+    self._stats = PerfStats()
+
+  def start(self) -> None:
+    if self._thread and self._thread.is_alive():
+      return
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run, name="koza-camera", daemon=True)
+    self._thread.start()
+
+  def stop(self) -> None:
+    self._stop.set()
+
+  def latest(self) -> FramePacket | None:
+    with self._lock:
+      return self._latest
+
+  def subscribe(self, listener: Callable[[FramePacket], None]) -> None:
+    with self._lock:
+      self._listeners.append(listener)
+
+  def unsubscribe(self, listener: Callable[[FramePacket], None]) -> None:
+    with self._lock:
+      if listener in self._listeners:
+        self._listeners.remove(listener)
+
+  def _publish(self, pkt: FramePacket) -> None:
+    with self._lock:
+      self._latest = pkt
+      listeners = list(self._listeners)
+    for listener in listeners:
+      try:
+        listener(pkt)
+      except Exception:
+        pass
+
+  def stats(self) -> Dict[str, Any]:
+    return self._stats.snapshot()
+
+  def _run(self) -> None:
+    i = 0
+    w, h = self._size
+    while not self._stop.is_set():
+      profiler.checkpoint("camera")
+      settings = runtime_settings.current()
+      interval = 1.0 / max(0.5, float(settings.camera_fps))
+      t_start = time.monotonic()
+
+      data = self._frames[i % len(self._frames)]
+      i += 1
+      self._publish(FramePacket(ts_ms=int(time.time() * 1000), width=w, height=h, jpeg_bytes=data))
+
+      self._stats.tick("capture_fps")
+      self._stats.observe("jpeg_kb", len(data) / 1024.0)
+      self._stats.set("frame_size", [w, h])
+      self._stats.set("settings_version", settings.version)
+      time.sleep(max(0.0, interval - (time.monotonic() - t_start)))
@@ -7,7 +7,9 @@ from typing import Optional
 import requests
 
 from vision_service import config
-from vision_service.domain.models import Detection, YoloResult
+from vision_service.domain.compact_codec import CompactEncoder, pack
+from vision_service.domain.models import Detection, YoloResult, yolo_result_to_jsonable
+from vision_service.infrastructure import profiler
 
 
 def _compute_movement_index(dets: list[Detection]) -> float:
@@ -28,8 +30,10 @@ def _compute_confidence(dets: list[Detection]) -> float:
 
 
 class KozaApiResultPusher:
-  def __init__(self, yolo_engine) -> None:
+  def __init__(self, yolo_engine, frame_source=None) -> None:
     self._engine = yolo_engine
+    self._frame_source = frame_source
+    self._compact = CompactEncoder(keyframe_every=config.KOZA_PUSH_KEYFRAME_EVERY)
     self._stop = threading.Event()
     self._thread: Optional[threading.Thread] = None
 
@@ -41,7 +45,7 @@ class KozaApiResultPusher:
     if self._thread and self._thread.is_alive():
       return
     self._stop.clear()
-    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread = threading.Thread(target=self._run, name="koza-pusher", daemon=True)
     self._thread.start()
 
   def stop(self) -> None:
@@ -55,6 +59,7 @@ class KozaApiResultPusher:
     last_ts = 0
 
     while not self._stop.is_set():
+      profiler.checkpoint("pusher")
       y = self._engine.latest()
       if y and y.ts_ms != last_ts:
         last_ts = y.ts_ms
@@ -66,15 +71,38 @@ class KozaApiResultPusher:
     url = f"{base}/api/vision/messages"
 
     dets = list(yolo.detections)
+    growth = (yolo.extra or {}).get("growth") or {}
+    ratio = growth.get("size_change_ratio")
     payload = {
       "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
       "movement_index": _compute_movement_index(dets),
-      "size_change_ratio": 1.0,
+      "size_change_ratio": float(ratio) if isinstance(ratio, (int, float)) else 1.0,
+      "growth_trend": growth.get("trend", "unknown"),
       "texture_anomaly": _compute_texture_anomaly(dets),
       "confidence": _compute_confidence(dets),
     }
 
     try:
       requests.post(url, json=payload, timeout=4)
+    except Exception:
+      pass
+
+    if config.KOZA_PUSH_COMPACT_PATH:
+      self._push_compact(base, yolo)
+
+  def _push_compact(self, base: str, yolo: YoloResult) -> None:
+    f = self._frame_source.latest() if self._frame_source is not None else None
+    full = yolo_result_to_jsonable(yolo, f.width if f else 0, f.height if f else 0)
+    msg = self._compact.encode(full)
+    body, content_type = pack(msg, config.KOZA_PUSH_COMPACT_FORMAT)
+    url = f"{base}/{config.KOZA_PUSH_COMPACT_PATH.lstrip('/')}"
+
+    try:
+      r = requests.post(url, data=body, headers={"content-type": content_type}, timeout=4)
     except Exception:
       return
+    if 200 <= r.status_code < 300:
+      self._compact.ack(full, msg)
+    elif r.status_code == 409:
+      # Receiver lost our base (restart); next message goes out as a keyframe
+      self._compact.reset()
@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from vision_service import config
+from vision_service.domain.models import FramePacket, YoloResult, yolo_result_to_jsonable
+from vision_service.infrastructure.memory_stats import budget_cap
+
+# Named shared-memory segments written by the capture/inference process and read by HTTP workers
+# or other local consumers (e.g. a sensor bridge):
+#
+#   <name>_result, <name>_health, <name>_stats   latest-value slots holding UTF-8 JSON
+#   <name>_frames                                ring of the latest JPEG frames
+#
+# Every slot is guarded by a seqlock: the writer makes seq odd, writes, then makes it even again;
+# readers copy the payload and retry when seq changed or was odd. Python gives no memory fences,
+# so readers also check a CRC32 of the payload before trusting it.
+# Readers copy the payload once (that copy is what the CRC is checked against): a view into the slot could be
+# overwritten by the next write while a consumer still holds it, which the seqlock cannot detect.
+
+SLOT_MAGIC = b"KZS1"
+RING_MAGIC = b"KZR1"
+
+# magic, capacity, seq, ts_ms, length, crc32
+_SLOT_HDR = struct.Struct("<4sIQqII")
+# magic, slots, slot_size, write counter
+_RING_HDR = struct.Struct("<4sIIQ4x")
+# seq, ts_ms, width, height, length, crc32
+_FRAME_HDR = struct.Struct("<QqIIII")
+
+_SEQ_OFF = 8
+_RING_COUNTER_OFF = 12
+_READ_RETRIES = 64
+
+LOW_BUDGET_FRAME_SLOTS = 2
+
+
+def segment_name(suffix: str) -> str:
+  return f"{config.SHM_NAME}_{suffix}"
+
+
+def _create(name: str, size: int) -> shared_memory.SharedMemory:
+  try:
+    stale = shared_memory.SharedMemory(name=name)
+  except FileNotFoundError:
+    pass
+  else:
+    # Left behind by a producer that did not exit cleanly
+    stale.close()
+    stale.unlink()
+  return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+class _MappedSegment:
+  # Read-only mapping of a producer's segment. Readers do not go through SharedMemory: before Python 3.13 it
+  # registers every attach with the resource tracker, which uvicorn's spawned workers share with the producer,
+  # and unregistering there would drop the producer's own registration. Only the producer tracks and unlinks.
+  def __init__(self, name: str) -> None:
+    self.name = name
+    self._name = "/" + name.lstrip("/")
+    self._fd = os.open(f"/dev/shm/{name.lstrip('/')}", os.O_RDONLY)
+    try:
+      self.size = os.fstat(self._fd).st_size
+      self._mmap = mmap.mmap(self._fd, self.size, prot=mmap.PROT_READ)
+    except Exception:
+      os.close(self._fd)
+      raise
+    self.buf = memoryview(self._mmap)
+
+  def close(self) -> None:
+    self.buf.release()
+    self._mmap.close()
+    os.close(self._fd)
+
+
+def _attach(name: str) -> _MappedSegment:
+  return _MappedSegment(name)
+
+
+def _read_seq(buf, off: int) -> int:
+  return struct.unpack_from("<Q", buf, off)[0]
+
+
+def _write_seq(buf, off: int, seq: int) -> None:
+  struct.pack_into("<Q", buf, off, seq)
+
+
+class SeqlockSlot:
+  def __init__(self, shm, owner: bool) -> None:
+    self._shm = shm
+    self._owner = owner
+    magic, capacity, _, _, _, _ = _SLOT_HDR.unpack_from(shm.buf, 0)
+    if owner:
+      capacity = shm.size - _SLOT_HDR.size
+      _SLOT_HDR.pack_into(shm.buf, 0, SLOT_MAGIC, capacity, 0, 0, 0, 0)
+    elif magic != SLOT_MAGIC:
+      raise ValueError(f"{shm.name}: not a slot segment")
+    self.capacity = int(capacity)
+    self.oversize = 0
+
+  @classmethod
+  def create(cls, name: str, capacity: int) -> "SeqlockSlot":
+    return cls(_create(name, _SLOT_HDR.size + int(capacity)), owner=True)
+
+  @classmethod
+  def attach(cls, name: str) -> "SeqlockSlot":
+    return cls(_attach(name), owner=False)
+
+  def write(self, ts_ms: int, payload: bytes) -> bool:
+    n = len(payload)
+    if n > self.capacity:
+      self.oversize += 1
+      return False
+    buf = self._shm.buf
+    seq = _read_seq(buf, _SEQ_OFF)
+    _write_seq(buf, _SEQ_OFF, seq + 1)
+    buf[_SLOT_HDR.size : _SLOT_HDR.size + n] = payload
+    struct.pack_into("<qII", buf, _SEQ_OFF + 8, int(ts_ms), n, zlib.crc32(payload))
+    _write_seq(buf, _SEQ_OFF, seq + 2)
+    return True
+
+  def header(self) -> Tuple[int, int]:
+    # (seq, ts_ms) without copying the payload; cheap enough to poll
+    _, _, seq, ts, _, _ = _SLOT_HDR.unpack_from(self._shm.buf, 0)
+    return int(seq), int(ts)
+
+  def read(self) -> Optional[Tuple[int, int, bytes]]:
+    buf = self._shm.buf
+    for _ in range(_READ_RETRIES):
+      _, _, s1, ts, n, crc = _SLOT_HDR.unpack_from(buf, 0)
+      if s1 == 0:
+        return None
+      if s1 & 1 or n > self.capacity:
+        time.sleep(0)
+        continue
+      data = bytes(buf[_SLOT_HDR.size : _SLOT_HDR.size + n])
+      if _read_seq(buf, _SEQ_OFF) == s1 and zlib.crc32(data) == crc:
+        return int(s1), int(ts), data
+      time.sleep(0)
+    return None
+
+  def close(self) -> None:
+    try:
+      self._shm.close()
+      if self._owner:
+        self._shm.unlink()
+    except Exception:
+      pass
+
+  def replaced(self) -> bool:
+    return _replaced(self._shm)
+
+
+class FrameRing:
+  def __init__(self, shm, owner: bool, slots: int = 0, slot_size: int = 0) -> None:
+    self._shm = shm
+    self._owner = owner
+    if owner:
+      _RING_HDR.pack_into(shm.buf, 0, RING_MAGIC, slots, slot_size, 0)
+    magic, slots, slot_size, _ = _RING_HDR.unpack_from(shm.buf, 0)
+    if magic != RING_MAGIC:
+      raise ValueError(f"{shm.name}: not a frame ring segment")
+    self.slots = int(slots)
+    self.slot_size = int(slot_size)
+    self.oversize = 0
+
+  @classmethod
+  def create(cls, name: str, slots: int, slot_size: int) -> "FrameRing":
+    slots = max(2, int(slots))
+    size = _RING_HDR.size + slots * (_FRAME_HDR.size + int(slot_size))
+    return cls(_create(name, size), owner=True, slots=slots, slot_size=int(slot_size))
+
+  @classmethod
+  def attach(cls, name: str) -> "FrameRing":
+    return cls(_attach(name), owner=False)
+
+  def _slot_off(self, i: int) -> int:
+    return _RING_HDR.size + i * (_FRAME_HDR.size + self.slot_size)
+
+  def counter(self) -> int:
+    return int(struct.unpack_from("<Q", self._shm.buf, _RING_COUNTER_OFF)[0])
+
+  def write(self, pkt: FramePacket) -> bool:
+    data = pkt.jpeg_bytes
+    n = len(data)
+    if n > self.slot_size:
+      self.oversize += 1
+      return False
+    buf = self._shm.buf
+    c = self.counter()
+    off = self._slot_off(c % self.slots)
+    seq = _read_seq(buf, off)
+    _write_seq(buf, off, seq + 1)
+    buf[off + _FRAME_HDR.size : off + _FRAME_HDR.size + n] = data
+    struct.pack_into("<qIIII", buf, off + 8, int(pkt.ts_ms), int(pkt.width), int(pkt.height), n, zlib.crc32(data))
+    _write_seq(buf, off, seq + 2)
+    struct.pack_into("<Q", buf, _RING_COUNTER_OFF, c + 1)
+    return True
+
+  def read_latest(self) -> Optional[FramePacket]:
+    buf = self._shm.buf
+    for _ in range(_READ_RETRIES):
+      c = self.counter()
+      if c == 0:
+        return None
+      off = self._slot_off((c - 1) % self.slots)
+      s1, ts, w, h, n, crc = _FRAME_HDR.unpack_from(buf, off)
+      if s1 & 1 or n > self.slot_size:
+        time.sleep(0)
+        continue
+      data = bytes(buf[off + _FRAME_HDR.size : off + _FRAME_HDR.size + n])
+      if _read_seq(buf, off) == s1 and zlib.crc32(data) == crc:
+        return FramePacket(ts_ms=int(ts), width=int(w), height=int(h), jpeg_bytes=data)
+      time.sleep(0)
+    return None
+
+  def close(self) -> None:
+    try:
+      self._shm.close()
+      if self._owner:
+        self._shm.unlink()
+    except Exception:
+      pass
+
+  def replaced(self) -> bool:
+    return _replaced(self._shm)
+
+
+def _replaced(shm) -> bool:
+  # A restarted producer unlinks and recreates the segment; our mapping then points at the old inode
+  try:
+    return os.fstat(shm._fd).st_ino != os.stat(f"/dev/shm/{shm._name.lstrip('/')}").st_ino  # type: ignore[attr-defined]
+  except FileNotFoundError:
+    return True
+  except Exception:
+    return False
+
+
+class ShmPublisher:
+  def __init__(
+    self,
+    frame_source,
+    yolo_engine,
+    health: Callable[[], Dict[str, Any]],
+    stats: Callable[[], Dict[str, Any]],
+  ) -> None:
+    self._frame_source = frame_source
+    self._engine = yolo_engine
+    self._health = health
+    self._stats = stats
+    self._frames: Optional[FrameRing] = None
+    self._result: Optional[SeqlockSlot] = None
+    self._health_slot: Optional[SeqlockSlot] = None
+    self._stats_slot: Optional[SeqlockSlot] = None
+    self._size = (0, 0)
+    self._stop = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+  def start(self) -> None:
+    if self._frames is not None:
+      return
+    slots = int(budget_cap(config.SHM_FRAME_SLOTS, LOW_BUDGET_FRAME_SLOTS))
+    self._frames = FrameRing.create(segment_name("frames"), slots, int(config.SHM_FRAME_SLOT_KB) * 1024)
+    self._result = SeqlockSlot.create(segment_name("result"), int(config.SHM_RESULT_KB) * 1024)
+    self._health_slot = SeqlockSlot.create(segment_name("health"), 64 * 1024)
+    self._stats_slot = SeqlockSlot.create(segment_name("stats"), 64 * 1024)
+    self._frame_source.subscribe(self._on_frame)
+    self._engine.subscribe(self._on_result)
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run_status, name="koza-shm-status", daemon=True)
+    self._thread.start()
+
+  def stop(self) -> None:
+    self._stop.set()
+    self._frame_source.unsubscribe(self._on_frame)
+    self._engine.unsubscribe(self._on_result)
+    for seg in (self._frames, self._result, self._health_slot, self._stats_slot):
+      if seg is not None:
+        seg.close()
+    self._frames = self._result = self._health_slot = self._stats_slot = None
+
+  def status(self) -> Dict[str, Any]:
+    return {
+      "name": config.SHM_NAME,
+      "frame_slots": self._frames.slots if self._frames else 0,
+      "frames_written": self._frames.counter() if self._frames else 0,
+      "frames_oversize": self._frames.oversize if self._frames else 0,
+      "results_oversize": self._result.oversize if self._result else 0,
+    }
+
+  def _on_frame(self, pkt: FramePacket) -> None:
+    self._size = (int(pkt.width), int(pkt.height))
+    ring = self._frames
+    if ring is not None:
+      ring.write(pkt)
+
+  def _on_result(self, y: YoloResult) -> None:
+    slot = self._result
+    if slot is None:
+      return
+    w, h = self._size
+    raw = json.dumps(yolo_result_to_jsonable(y, w, h), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    slot.write(int(y.ts_ms), raw)
+
+  def _run_status(self) -> None:
+    interval = max(0.2, float(config.SHM_STATUS_SEC))
+    while not self._stop.is_set():
+      now_ms = int(time.time() * 1000)
+      for slot, fn in ((self._health_slot, self._health), (self._stats_slot, self._stats)):
+        if slot is None:
+          continue
+        try:
+          slot.write(now_ms, json.dumps(fn(), separators=(",", ":")).encode("utf-8"))
+        except Exception:
+          continue
+      self._stop.wait(interval)
+
+
+class ShmBusReader:
+  # Attaches lazily, so readers may start before the producer; re-attaches when the producer restarts.
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._frames: Optional[FrameRing] = None
+    self._slots: Dict[str, SeqlockSlot] = {}
+    self._checked_at = 0.0
+
+  def _check(self) -> None:
+    now = time.monotonic()
+    if now - self._checked_at < 1.0:
+      return
+    self._checked_at = now
+    if self._frames is not None and self._frames.replaced():
+      self._frames.close()
+      self._frames = None
+    for key, slot in list(self._slots.items()):
+      if slot.replaced():
+        slot.close()
+        del self._slots[key]
+
+  def _slot(self, suffix: str) -> Optional[SeqlockSlot]:
+    with self._lock:
+      self._check()
+      slot = self._slots.get(suffix)
+      if slot is None:
+        try:
+          slot = self._slots[suffix] = SeqlockSlot.attach(segment_name(suffix))
+        except (FileNotFoundError, ValueError):
+          return None
+      return slot
+
+  def _ring(self) -> Optional[FrameRing]:
+    with self._lock:
+      self._check()
+      if self._frames is None:
+        try:
+          self._frames = FrameRing.attach(segment_name("frames"))
+        except (FileNotFoundError, ValueError):
+          return None
+      return self._frames
+
+  def latest_frame(self) -> Optional[FramePacket]:
+    ring = self._ring()
+    return ring.read_latest() if ring is not None else None
+
+  def result_header(self) -> Optional[Tuple[int, int]]:
+    slot = self._slot("result")
+    return slot.header() if slot is not None else None
+
+  def latest_result_bytes(self) -> Optional[Tuple[int, bytes]]:
+    slot = self._slot("result")
+    got = slot.read() if slot is not None else None
+    return (got[1], got[2]) if got is not None else None
+
+  def latest_result(self) -> Optional[Dict[str, Any]]:
+    got = self.latest_result_bytes()
+    return json.loads(got[1]) if got is not None else None
+
+  def health_bytes(self) -> Optional[bytes]:
+    slot = self._slot("health")
+    got = slot.read() if slot is not None else None
+    return got[2] if got is not None else None
+
+  def stats_bytes(self) -> Optional[bytes]:
+    slot = self._slot("stats")
+    got = slot.read() if slot is not None else None
+    return got[2] if got is not None else None
+
+  def close(self) -> None:
+    with self._lock:
+      if self._frames is not None:
+        self._frames.close()
+        self._frames = None
+      for slot in self._slots.values():
+        slot.close()
+      self._slots.clear()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+class _Array:
+  # Mimics the torch tensor calls parse_yolo_boxes makes (.cpu().numpy())
+  def __init__(self, a: np.ndarray) -> None:
+    self._a = a
+
+  def cpu(self) -> "_Array":
+    return self
+
+  def numpy(self) -> np.ndarray:
+    return self._a
+
+
+class _Boxes:
+  def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> None:
+    self.xyxy = _Array(xyxy)
+    self.conf = _Array(conf)
+    self.cls = _Array(cls)
+
+
+class _Result:
+  def __init__(self, names: Dict[int, str], boxes: _Boxes) -> None:
+    self.names = names
+    self.boxes = boxes
+
+
+class StubYoloModel:
+  # Stands in for an ultralytics YOLO model with a fixed inference cost and deterministic boxes.
+  # spin=True burns CPU while holding the GIL (pessimistic); otherwise the cost is a sleep, like native inference.
+  def __init__(
+    self,
+    infer_ms: float = 150.0,
+    detections: int = 6,
+    labels: Sequence[str] = ("larva", "cocoon"),
+    spin: bool = False,
+    seed: int = 1,
+  ) -> None:
+    self._infer_s = max(0.0, float(infer_ms)) / 1000.0
+    self._n = max(0, int(detections))
+    self._names = {i: str(l) for i, l in enumerate(labels or ("larva",))}
+    self._spin = bool(spin)
+    self._rng = np.random.default_rng(seed)
+
+  def predict(self, source: Any = None, conf: float = 0.25, iou: float = 0.45, verbose: bool = False, **kwargs: Any) -> List[_Result]:
+    t0 = time.monotonic()
+    h, w = source.shape[:2] if isinstance(source, np.ndarray) else (480, 640)
+    xy = self._rng.uniform(0, 1, (self._n, 2)) * [w * 0.9, h * 0.9]
+    wh = self._rng.uniform(0.03, 0.1, (self._n, 2)) * [w, h]
+    xyxy = np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+    confs = self._rng.uniform(max(0.0, float(conf)), 1.0, self._n).astype(np.float32)
+    cls = self._rng.integers(0, len(self._names), self._n).astype(np.float32)
+
+    remaining = self._infer_s - (time.monotonic() - t0)
+    if self._spin:
+      while time.monotonic() - t0 < self._infer_s:
+        pass
+    elif remaining > 0:
+      time.sleep(remaining)
+    return [_Result(self._names, _Boxes(xyxy, confs, cls))]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from vision_service import config, runtime_settings
+from vision_service.infrastructure import profiler
+
+
+def _parse_thresholds(raw: str, default: List[float]) -> List[float]:
+  try:
+    vals = [float(p.strip()) for p in (raw or "").split(",") if p.strip()]
+  except Exception:
+    return list(default)
+  return vals if vals else list(default)
+
+
+def read_cpu_temp_c(path: str) -> Optional[float]:
+  try:
+    with open(path, "r", encoding="ascii") as f:
+      v = float(f.read().strip())
+  except Exception:
+    return None
+  # sysfs thermal zones report millidegrees
+  return v / 1000.0 if v > 1000.0 else v
+
+
+def read_load1(path: str) -> Optional[float]:
+  try:
+    with open(path, "r", encoding="ascii") as f:
+      return float(f.read().split()[0])
+  except Exception:
+    return None
+
+
+def read_mem_available_ratio(path: str) -> Optional[float]:
+  total = None
+  avail = None
+  try:
+    with open(path, "r", encoding="ascii") as f:
+      for line in f:
+        if line.startswith("MemTotal:"):
+          total = float(line.split()[1])
+        elif line.startswith("MemAvailable:"):
+          avail = float(line.split()[1])
+        if total is not None and avail is not None:
+          break
+  except Exception:
+    return None
+  if not total or avail is None:
+    return None
+  return float(avail / total)
+
+
+def pressure_level(value: Optional[float], thresholds: List[float], current: int, hysteresis: float, higher_is_worse: bool = True) -> int:
+  if value is None:
+    return 0
+  v = float(value) if higher_is_worse else -float(value)
+  th = [float(t) if higher_is_worse else -float(t) for t in thresholds]
+
+  up = sum(1 for t in th if v >= t)
+  if up >= current:
+    return up
+  # Only step down once the value has cleared the threshold by the hysteresis margin
+  return min(current, sum(1 for t in th if v >= t - float(hysteresis)))
+
+
+class ThermalGovernor:
+  def __init__(self, store: runtime_settings.RuntimeSettingsStore | None = None) -> None:
+    self._store = store if store is not None else runtime_settings.STORE
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+    self._temp_th = _parse_thresholds(config.GOVERNOR_TEMP_C, [70.0, 75.0, 80.0])
+    self._load_th = _parse_thresholds(config.GOVERNOR_LOAD_PER_CPU, [1.5, 2.0, 3.0])
+    self._mem_th = _parse_thresholds(config.GOVERNOR_MEM_AVAIL_MIN, [0.15, 0.10, 0.05])
+    self._cpu_count = max(1, os.cpu_count() or 1)
+
+    self._level = 0
+    self._since_ts_ms = int(time.time() * 1000)
+    self._last_step: Optional[float] = None
+    self._readings: Dict[str, Any] = {}
+
+  def start(self) -> None:
+    if not config.GOVERNOR_ENABLED:
+      return
+    if self._thread and self._thread.is_alive():
+      return
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run, name="koza-governor", daemon=True)
+    self._thread.start()
+
+  def stop(self) -> None:
+    self._stop.set()
+
+  def status(self) -> Dict[str, Any]:
+    with self._lock:
+      lvl = runtime_settings.THROTTLE_LEVELS[self._level]
+      return {
+        "enabled": bool(config.GOVERNOR_ENABLED),
+        "level": int(lvl.level),
+        "name": lvl.name,
+        "since_ts_ms": int(self._since_ts_ms),
+        "readings": dict(self._readings),
+      }
+
+  def step(self) -> int:
+    temp_c = read_cpu_temp_c(config.THERMAL_ZONE_PATH)
+    load1 = read_load1(config.LOADAVG_PATH)
+    mem_ratio = read_mem_available_ratio(config.MEMINFO_PATH)
+    load_per_cpu = float(load1 / self._cpu_count) if load1 is not None else None
+
+    with self._lock:
+      cur = self._level
+      max_level = len(runtime_settings.THROTTLE_LEVELS) - 1
+      desired = max(
+        pressure_level(temp_c, self._temp_th, cur, float(config.GOVERNOR_TEMP_HYST_C)),
+        pressure_level(load_per_cpu, self._load_th, cur, float(config.GOVERNOR_LOAD_HYST)),
+        pressure_level(mem_ratio, self._mem_th, cur, float(config.GOVERNOR_MEM_HYST), higher_is_worse=False),
+      )
+      desired = max(0, min(max_level, desired))
+
+      self._readings = {
+        "cpu_temp_c": temp_c,
+        "load1": load1,
+        "load_per_cpu": load_per_cpu,
+        "mem_available_ratio": mem_ratio,
+        "desired_level": desired,
+      }
+
+      now = time.monotonic()
+      dwell_ok = self._last_step is None or (now - self._last_step) >= float(config.GOVERNOR_MIN_DWELL_SEC)
+      if desired == cur or not dwell_ok:
+        return cur
+
+      # One level per step so a single hot reading does not jump straight to the lowest fidelity
+      nxt = cur + 1 if desired > cur else cur - 1
+      self._level = nxt
+      self._last_step = now
+      self._since_ts_ms = int(time.time() * 1000)
+
+    self._store.set_throttle(runtime_settings.THROTTLE_LEVELS[nxt] if nxt > 0 else None)
+    return nxt
+
+  def _run(self) -> None:
+    interval = max(1.0, float(config.GOVERNOR_INTERVAL_SEC))
+    while not self._stop.is_set():
+      profiler.checkpoint("governor")
+      try:
+        self.step()
+      except Exception:
+        pass
+      self._stop.wait(interval)
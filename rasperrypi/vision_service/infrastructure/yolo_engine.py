@@ -1,49 +1,85 @@
 from __future__ import annotations
 
+import gc
+import hashlib
+import os
 import threading
 import time
-from collections import deque
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 
-import cv2
 import numpy as np
 
-from vision_service import config
+from vision_service import config, runtime_settings
 from vision_service.application.ports import MetricExtractor
-from vision_service.domain.molting import MoltingStateMachine
-from vision_service.domain.models import BBox, Detection, FramePacket, YoloResult
+from vision_service.domain.models import FramePacket, YoloResult
+from vision_service.infrastructure import profiler
+from vision_service.infrastructure.frame_analyzer import FrameAnalyzer, import_yolo, predict_kwargs
+from vision_service.infrastructure.jpeg_codec import DEFAULT_MODEL_INPUT, load_codec, pick_decode_scale
+from vision_service.infrastructure.memory_stats import settle_gc
+from vision_service.infrastructure.perf_stats import PerfStats
 
-try:
-  from ultralytics import YOLO  # type: ignore
-except Exception:  # pragma: no cover
-  YOLO = None  # type: ignore
+
+def _elapsed_ms(t0: float) -> float:
+  return float(round((time.monotonic() - t0) * 1000.0, 1))
+
+
+def _file_sha256(path: str) -> str:
+  h = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+      h.update(chunk)
+  return h.hexdigest()
 
 
 class UltralyticsYoloEngine:
-  def __init__(self, frame_source, metric_extractor: MetricExtractor | None = None) -> None:
+  def __init__(self, frame_source, metric_extractor: MetricExtractor | None = None, model=None) -> None:
     self._frame_source = frame_source
     self._metric_extractor = metric_extractor
     self._lock = threading.Lock()
     self._latest: Optional[YoloResult] = None
+    self._listeners: List[Callable[[YoloResult], None]] = []
     self._stop = threading.Event()
     self._thread: Optional[threading.Thread] = None
 
     self._model = None
-    if config.YOLO_MODEL_PATH and YOLO is not None:
-      self._model = YOLO(config.YOLO_MODEL_PATH)
+    self._infer_lock = threading.Lock()
+    self._reload_lock = threading.Lock()
+    self._loader_thread: Optional[threading.Thread] = None
+    self._watch_thread: Optional[threading.Thread] = None
+    self._model_status: Dict[str, Any] = {
+      "state": "idle" if config.YOLO_MODEL_PATH else "disabled",
+      "path": config.YOLO_MODEL_PATH or None,
+      "sha256": None,
+      "generation": 0,
+      "loaded_at_ms": None,
+      "error": None,
+      "timings_ms": {},
+      "last_reload": None,
+    }
 
     self._frame_counter = 0
+    self._infer_cycles = 0
+    self._stats = PerfStats()
+
+    self._analyzer = FrameAnalyzer(metric_extractor)
+    self._codec, codec_error = load_codec()
+    self._stats.set("jpeg_codec", self._codec.name)
+    if codec_error:
+      self._stats.set("jpeg_codec_error", codec_error)
 
-    self._diseased_window = deque(maxlen=max(1, int(getattr(config, "DISEASED_WINDOW_N", 10) or 10)))
-    self._prev_gray: np.ndarray | None = None
-    self._molting = MoltingStateMachine()
+    # A pre-built model (e.g. the load-test stub) skips the background loader
+    if model is not None:
+      self._swap_model(model, {"path": None, "sha256": None})
+      self._model_status["state"] = "ready"
 
   def start(self) -> None:
     if self._thread and self._thread.is_alive():
       return
     self._stop.clear()
-    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread = threading.Thread(target=self._run, name="koza-engine", daemon=True)
     self._thread.start()
+    self._start_loader()
+    self._start_watcher()
 
   def stop(self) -> None:
     self._stop.set()
@@ -52,247 +88,323 @@ class UltralyticsYoloEngine:
     with self._lock:
       return self._latest
 
+  def subscribe(self, listener: Callable[[YoloResult], None]) -> None:
+    with self._lock:
+      self._listeners.append(listener)
+
+  def unsubscribe(self, listener: Callable[[YoloResult], None]) -> None:
+    with self._lock:
+      if listener in self._listeners:
+        self._listeners.remove(listener)
+
+  def _publish(self, y: YoloResult) -> None:
+    with self._lock:
+      self._latest = y
+      listeners = list(self._listeners)
+    for listener in listeners:
+      try:
+        listener(y)
+      except Exception:
+        pass
+
+  def stats(self) -> Dict[str, Any]:
+    out = self._stats.snapshot()
+    if "infer_full_ms" in out and "infer_ms" in out:
+      out["infer_saved_ms"] = float(round(out["infer_full_ms"] - out["infer_ms"], 3))
+    return out
+
+  def status(self) -> Dict[str, Any]:
+    with self._lock:
+      st = dict(self._model_status)
+      st["timings_ms"] = dict(self._model_status.get("timings_ms") or {})
+    st["ready"] = st.get("state") == "ready"
+    return st
+
+  def _set_status(self, **kwargs: Any) -> None:
+    with self._lock:
+      timings = kwargs.pop("timings_ms", None)
+      self._model_status.update(kwargs)
+      if isinstance(timings, dict):
+        self._model_status["timings_ms"] = {**(self._model_status.get("timings_ms") or {}), **timings}
+
+  def _start_loader(self) -> None:
+    if not config.YOLO_MODEL_PATH:
+      return
+    if self._model is not None:
+      return
+    if self._loader_thread and self._loader_thread.is_alive():
+      return
+    self._loader_thread = threading.Thread(target=self._load_in_background, name="koza-model-loader", daemon=True)
+    self._loader_thread.start()
+
+  def _start_watcher(self) -> None:
+    if not config.YOLO_MODEL_PATH or int(config.YOLO_MODEL_WATCH_SEC) <= 0:
+      return
+    if self._watch_thread and self._watch_thread.is_alive():
+      return
+    self._watch_thread = threading.Thread(target=self._watch_model_file, name="koza-model-watch", daemon=True)
+    self._watch_thread.start()
+
+  def _load_in_background(self) -> None:
+    t0 = time.monotonic()
+    with self._reload_lock:
+      self._set_status(state="loading", error=None)
+      try:
+        model, info = self._load_model(config.YOLO_MODEL_PATH, on_phase=lambda phase: self._set_status(state=phase))
+      except Exception as e:
+        self._set_status(state="failed", error=str(e) or e.__class__.__name__, timings_ms={"total": _elapsed_ms(t0)})
+        return
+      self._swap_model(model, info)
+      self._set_status(state="ready", timings_ms={**info["timings_ms"], "total": _elapsed_ms(t0)})
+    settle_gc()
+
+  def _allowed_model_path(self, path: str) -> str | None:
+    # Loading a .pt unpickles it, so a requested path must resolve inside the configured model's directory
+    if not config.YOLO_MODEL_PATH:
+      return None
+    root = os.path.dirname(os.path.realpath(config.YOLO_MODEL_PATH))
+    target = os.path.realpath(path)
+    if os.path.commonpath([root, target]) != root:
+      return None
+    return target
+
+  def reload_model(self, path: str | None = None) -> Dict[str, Any]:
+    if path:
+      target = self._allowed_model_path(path.strip())
+      if target is None:
+        return {"ok": False, "error": "path must be inside the configured model directory"}
+    else:
+      target = (self.status().get("path") or config.YOLO_MODEL_PATH or "").strip()
+    if not target:
+      return {"ok": False, "error": "model path is not configured"}
+    if not self._reload_lock.acquire(blocking=False):
+      return {"ok": False, "error": "reload already in progress"}
+
+    try:
+      t0 = time.monotonic()
+      try:
+        model, info = self._load_model(target)
+      except Exception as e:
+        # Rollback: the running model was never touched, it keeps serving
+        result = {
+          "ok": False,
+          "path": target,
+          "error": str(e) or e.__class__.__name__,
+          "rolled_back": True,
+          "ts_ms": int(time.time() * 1000),
+        }
+        self._set_status(last_reload=result)
+        return result
+
+      old = self._swap_model(model, info)
+      del old
+      # The previous model may sit in the permanent generation (settle_gc froze it): thaw it so its cycles
+      # can be collected, settle_gc then freezes the new model
+      gc.unfreeze()
+      gc.collect()
+      settle_gc()
+
+      st = self.status()
+      result = {
+        "ok": True,
+        "path": target,
+        "sha256": info.get("sha256"),
+        "generation": st.get("generation"),
+        "warmup_ms": info["timings_ms"].get("warmup"),
+        "timings_ms": {**info["timings_ms"], "total": _elapsed_ms(t0)},
+        "ts_ms": int(time.time() * 1000),
+      }
+      self._set_status(state="ready", error=None, last_reload=result)
+      return result
+    finally:
+      self._reload_lock.release()
+
+  def _swap_model(self, model, info: Dict[str, Any]):
+    # Taken between inference cycles: _run holds _infer_lock for the duration of a predict
+    with self._infer_lock:
+      old = self._model
+      self._model = model
+      with self._lock:
+        self._model_status["path"] = info.get("path")
+        self._model_status["sha256"] = info.get("sha256")
+        self._model_status["generation"] = int(self._model_status.get("generation") or 0) + 1
+        self._model_status["loaded_at_ms"] = int(time.time() * 1000)
+    return old
+
+  def _load_model(self, path: str, on_phase=None):
+    timings: Dict[str, float] = {}
+
+    t0 = time.monotonic()
+    yolo_cls = import_yolo()
+    timings["import"] = _elapsed_ms(t0)
+    if yolo_cls is None:
+      raise RuntimeError("ultralytics is not available")
+
+    t1 = time.monotonic()
+    sha = _file_sha256(path)
+    timings["hash"] = _elapsed_ms(t1)
+
+    t2 = time.monotonic()
+    model = yolo_cls(path)
+    timings["load"] = _elapsed_ms(t2)
+
+    if config.YOLO_WARMUP_ENABLED:
+      if on_phase is not None:
+        on_phase("warming")
+      t3 = time.monotonic()
+      self._warmup(model)
+      timings["warmup"] = _elapsed_ms(t3)
+
+    return model, {"path": path, "sha256": sha, "timings_ms": timings}
+
+  def _warmup(self, model) -> None:
+    settings = runtime_settings.current()
+    w = int(settings.camera_width) if int(settings.camera_width) > 0 else 640
+    h = int(settings.camera_height) if int(settings.camera_height) > 0 else 480
+    dummy = np.zeros((h, w, 3), dtype=np.uint8)
+    model.predict(source=dummy, conf=float(settings.yolo_conf), iou=float(settings.yolo_iou), verbose=False)
+
+  def _watch_model_file(self) -> None:
+    interval = max(1, int(config.YOLO_MODEL_WATCH_SEC))
+    last_sig = None
+    pending_sig = None
+
+    while not self._stop.is_set():
+      time.sleep(interval)
+      path = self.status().get("path") or config.YOLO_MODEL_PATH
+      try:
+        stt = os.stat(path)
+        sig = (int(stt.st_mtime_ns), int(stt.st_size))
+      except Exception:
+        continue
+
+      if last_sig is None:
+        last_sig = sig
+        continue
+      if sig == last_sig:
+        pending_sig = None
+        continue
+      # Wait for one unchanged poll so a file that is still being copied is not loaded
+      if sig != pending_sig:
+        pending_sig = sig
+        continue
+
+      pending_sig = None
+      last_sig = sig
+      try:
+        if _file_sha256(path) == self.status().get("sha256"):
+          continue
+      except Exception:
+        continue
+      self.reload_model(path)
+
+  def _record_cycle(self, settings: runtime_settings.RuntimeSettings, t_cycle: float, pkt: FramePacket) -> None:
+    self._stats.observe("cycle_ms", (time.monotonic() - t_cycle) * 1000.0)
+    self._stats.observe("result_age_ms", max(0, int(time.time() * 1000) - int(pkt.ts_ms)))
+    self._stats.tick("result_fps")
+    self._stats.set("settings_version", settings.version)
+
+  def _maybe_reference_infer(self, pkt: FramePacket, img: np.ndarray, scale: int, settings: runtime_settings.RuntimeSettings) -> None:
+    # Occasional full-frame, default-size inference (result discarded) so /stats can report what the ROI/imgsz saves
+    every = int(config.ROI_REFERENCE_EVERY)
+    if every <= 0 or not self._analyzer.roi_active(img.shape[1], img.shape[0], settings.yolo_imgsz):
+      return
+    self._infer_cycles += 1
+    if (self._infer_cycles - 1) % every != 0:
+      return
+    if scale > 1:
+      # img is a reduced decode; the reference has to see the frame a full decode would give
+      img = self._codec.decode(pkt.jpeg_bytes, 1)
+      if img is None:
+        return
+    with self._infer_lock:
+      model = self._model
+      if model is None:
+        return
+      t0 = time.monotonic()
+      model.predict(source=img, conf=float(settings.yolo_conf), iou=float(settings.yolo_iou), verbose=False)
+      self._stats.observe("infer_full_ms", (time.monotonic() - t0) * 1000.0)
+
+  def _decode_scale(self, pkt: FramePacket, settings: runtime_settings.RuntimeSettings) -> int:
+    scale = int(config.JPEG_DECODE_SCALE)
+    if scale in (1, 2, 4):
+      return scale
+    if scale != 0 or pkt.width <= 0 or pkt.height <= 0:
+      return 1
+    imgsz = int(settings.yolo_imgsz)
+    w, h = self._analyzer.roi_extent(int(pkt.width), int(pkt.height))
+    return pick_decode_scale(w, h, imgsz if imgsz > 0 else DEFAULT_MODEL_INPUT)
+
   def _run(self) -> None:
     while not self._stop.is_set():
+      profiler.checkpoint("engine")
       pkt: FramePacket | None = self._frame_source.latest()
       if not pkt:
         time.sleep(0.1)
         continue
 
+      settings = runtime_settings.current()
       self._frame_counter += 1
-      every = max(1, int(config.YOLO_INFER_EVERY_N_FRAMES))
+      every = max(1, int(settings.infer_every_n_frames))
       if (self._frame_counter % every) != 0:
         time.sleep(0.02)
         continue
 
       try:
-        img = cv2.imdecode(np.frombuffer(pkt.jpeg_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        t_cycle = time.monotonic()
+        scale = self._decode_scale(pkt, settings)
+        img = self._codec.decode(pkt.jpeg_bytes, scale)
         if img is None:
           time.sleep(0.1)
           continue
+        self._stats.observe("decode_ms", (time.monotonic() - t_cycle) * 1000.0)
+        self._stats.set("decode_scale", scale)
+        frame_scale = float(pkt.width) / float(img.shape[1]) if scale > 1 and pkt.width > 0 else 1.0
 
-        h_img, w_img = img.shape[:2]
-        frame_area_px = float(max(1, w_img * h_img))
         now_ts_ms = int(time.time() * 1000)
-
-        def _normalize_stage_key(stage_raw: str) -> str:
-          s = (stage_raw or "").strip().lower()
-          if not s:
-            return ""
-          s = s.replace("-", "_")
-          if s in ("adaptasyon", "adaptation", "adaptation_0_1", "adaptasyon_0_1", "day0", "day_0", "day1", "day_1"):
-            return "adaptasyon"
-          if s in ("koza", "cocoon", "cocoon_stage"):
-            return "koza"
-          if s in ("koza_oncesi", "kozaoncesi", "pre_koza", "prekoza", "pre_cocoon"):
-            return "koza_oncesi"
-          if s.startswith("larva"):
-            return s
-          if s.startswith("instar"):
-            parts = s.replace("instar", "").strip("_")
-            if parts.isdigit():
-              return f"larva_{parts}"
-            if parts.startswith("_") and parts[1:].isdigit():
-              return f"larva_{parts[1:]}"
-          return s
-
-        MOVEMENT_THRESHOLDS = {
-          "adaptasyon": {"risk_low": 0.15, "stress_high": 0.50, "ideal": (0.25, 0.40), "normal": (0.20, 0.45)},
-          "larva_1": {"risk_low": 0.20, "stress_high": 0.60, "ideal": (0.30, 0.50), "normal": (0.25, 0.55)},
-          "larva_2": {"risk_low": 0.15, "stress_high": 0.50, "ideal": (0.25, 0.40), "normal": (0.20, 0.45)},
-          "larva_3": {"risk_low": 0.10, "stress_high": 0.45, "ideal": (0.20, 0.35), "normal": (0.15, 0.40)},
-          "larva_4": {"risk_low": 0.08, "stress_high": 0.40, "ideal": (0.15, 0.30), "normal": (0.10, 0.35)},
-          "larva_5": {"risk_low": 0.05, "stress_high": 0.35, "ideal": (0.10, 0.25), "normal": (0.08, 0.30)},
-          "koza_oncesi": {"risk_low": 0.02, "stress_high": 0.25, "ideal": (0.05, 0.15), "normal": (0.03, 0.20)},
-          "koza": {"risk_low": None, "stress_high": None, "ideal": (0.00, 0.00), "normal": (0.00, 0.02)},
-        }
-
-        motion_score = None
-        movement_index = None
-        try:
-          gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-          if self._prev_gray is not None and self._prev_gray.shape == gray.shape:
-            diff = cv2.absdiff(gray, self._prev_gray)
-            mean_diff = float(np.mean(diff)) if diff.size else 0.0
-            movement_index = max(0.0, min(1.0, (mean_diff / 255.0)))
-            motion_score = movement_index * 100.0
-          self._prev_gray = gray
-        except Exception:
-          motion_score = None
-          movement_index = None
-
-        active_stage_key = _normalize_stage_key(getattr(config, "ACTIVE_STAGE", ""))
-        stage_thresholds = MOVEMENT_THRESHOLDS.get(active_stage_key)
-
-        movement_level = None
-        if movement_index is not None and stage_thresholds is not None:
-          risk_low = stage_thresholds.get("risk_low")
-          stress_high = stage_thresholds.get("stress_high")
-          if isinstance(risk_low, (int, float)) and movement_index < float(risk_low):
-            movement_level = "low_risk"
-          elif isinstance(stress_high, (int, float)) and movement_index > float(stress_high):
-            movement_level = "high_stress"
-          else:
-            movement_level = "normal"
-
-        molting = self._molting.update(
+        model_sha256 = None
+
+        def _predict(frame: np.ndarray):
+          nonlocal model_sha256
+          with self._infer_lock:
+            model = self._model
+            model_sha256 = self._model_status.get("sha256")
+            t_infer = time.monotonic()
+            res = model.predict(
+              source=frame,
+              conf=float(settings.yolo_conf),
+              iou=float(settings.yolo_iou),
+              verbose=False,
+              **predict_kwargs(frame, settings.yolo_imgsz),
+            )
+            self._stats.observe("infer_ms", (time.monotonic() - t_infer) * 1000.0)
+          return res
+
+        model_loaded = self._model is not None
+        dets, y_extra = self._analyzer.analyze(
+          img,
           ts_ms=now_ts_ms,
-          stage_key=active_stage_key,
-          movement_index=movement_index,
+          stage_raw=getattr(config, "ACTIVE_STAGE", ""),
+          predict=_predict if model_loaded else None,
+          imgsz=int(settings.yolo_imgsz),
+          frame_scale=frame_scale,
         )
+        for k, v in self._analyzer.last_input.items():
+          self._stats.set(k, v)
+        y_extra["governor"] = {"level": int(settings.throttle_level), "name": settings.throttle}
+        if not model_loaded:
+          y_extra["model_state"] = self.status().get("state")
+        elif model_sha256:
+          y_extra["model_sha256"] = model_sha256
 
-        if not self._model:
-          y_extra = {
-            "stage_hint": {
-              "cocoon_count": 0,
-              "larva_count": 0,
-              "has_cocoon": False,
-              "has_larva": False,
-              "stage": "none",
-            },
-            "larva_metrics": {
-              "larva_density_area_ratio": 0.0,
-              "larva_bbox_area_px_sum": 0.0,
-              **({"movement_index": float(movement_index)} if movement_index is not None else {}),
-              **({"motion_score": float(motion_score)} if motion_score is not None else {}),
-              **({"movement_level": movement_level} if movement_level is not None else {}),
-              **({"movement_stage": active_stage_key} if isinstance(active_stage_key, str) and active_stage_key else {}),
-              **(
-                {
-                  "movement_thresholds": {
-                    "ideal": list(stage_thresholds.get("ideal")) if stage_thresholds and isinstance(stage_thresholds.get("ideal"), tuple) else None,
-                    "normal": list(stage_thresholds.get("normal")) if stage_thresholds and isinstance(stage_thresholds.get("normal"), tuple) else None,
-                    "risk_low": stage_thresholds.get("risk_low") if stage_thresholds else None,
-                    "stress_high": stage_thresholds.get("stress_high") if stage_thresholds else None,
-                  }
-                }
-                if stage_thresholds is not None
-                else {}
-              ),
-            },
-            "molting": molting,
-            "model_loaded": False,
-          }
-          y = YoloResult(ts_ms=now_ts_ms, source_frame_ts_ms=pkt.ts_ms, detections=[], extra=y_extra)
-          with self._lock:
-            self._latest = y
+        y = YoloResult(ts_ms=now_ts_ms, source_frame_ts_ms=pkt.ts_ms, detections=dets, extra=y_extra)
+        self._publish(y)
+        self._record_cycle(settings, t_cycle, pkt)
+        if model_loaded:
+          self._maybe_reference_infer(pkt, img, scale, settings)
+        if not model_loaded:
           time.sleep(0.15)
           continue
-
-        diseased_conf_threshold = float(getattr(config, "DISEASED_CONF_THRESHOLD", 0.6) or 0.6)
-        diseased_min_hits = int(getattr(config, "DISEASED_MIN_HITS", 3) or 3)
-
-        def _is_cocoon_label(label: str) -> bool:
-          l = (label or "").strip().lower()
-          return l in ("cocoon", "cocoons", "koza", "koza_cocoon") or "cocoon" in l or "koza" in l
-
-        def _is_larva_label(label: str) -> bool:
-          l = (label or "").strip().lower()
-          return l in ("larva", "larvae", "kurt", "bocek", "böcek") or "larva" in l
-
-        def _is_diseased_label(label: str) -> bool:
-          l = (label or "").strip().lower()
-          return l in ("diseased", "disease", "hasta", "hastalik") or "diseas" in l or "hasta" in l
-
-        res = self._model.predict(
-          source=img,
-          conf=float(config.YOLO_CONF),
-          iou=float(config.YOLO_IOU),
-          verbose=False,
-        )
-
-        dets: list[Detection] = []
-        diseased_hit = False
-        cocoon_count = 0
-        larva_count = 0
-        larva_area_px_sum = 0.0
-        if res and len(res) > 0:
-          r0 = res[0]
-          names = getattr(r0, "names", None)
-          boxes = getattr(r0, "boxes", None)
-          if boxes is not None:
-            xyxy = getattr(boxes, "xyxy", None)
-            conf = getattr(boxes, "conf", None)
-            cls = getattr(boxes, "cls", None)
-            if xyxy is not None and conf is not None and cls is not None:
-              xyxy_list = xyxy.cpu().numpy().tolist()
-              conf_list = conf.cpu().numpy().tolist()
-              cls_list = cls.cpu().numpy().tolist()
-
-              for i in range(min(len(xyxy_list), len(conf_list), len(cls_list))):
-                x1, y1, x2, y2 = [float(v) for v in xyxy_list[i]]
-                c = float(conf_list[i])
-                ci = int(cls_list[i])
-                label = str(ci)
-                if isinstance(names, dict) and ci in names:
-                  label = str(names[ci])
-
-                if _is_diseased_label(label) and c >= diseased_conf_threshold:
-                  diseased_hit = True
-
-                if _is_cocoon_label(label):
-                  cocoon_count += 1
-                if _is_larva_label(label):
-                  larva_count += 1
-                  w_px = max(0.0, float(max(x1, x2) - min(x1, x2)))
-                  h_px = max(0.0, float(max(y1, y2) - min(y1, y2)))
-                  larva_area_px_sum += w_px * h_px
-
-                extra = None
-                if _is_cocoon_label(label) and self._metric_extractor is not None:
-                  extra = self._metric_extractor.extract(img, label, x1, y1, x2, y2)
-
-                dets.append(Detection(label=label, confidence=c, bbox=BBox(x1=x1, y1=y1, x2=x2, y2=y2), extra=extra))
-
-        self._diseased_window.append(bool(diseased_hit))
-        hits = int(sum(1 for x in self._diseased_window if x))
-        window_n = int(len(self._diseased_window))
-        confirmed = bool(window_n > 0 and hits >= diseased_min_hits)
-
-        larva_density_ratio = float(larva_area_px_sum / frame_area_px)
-        stage = "cocoon" if cocoon_count > 0 else "larva" if larva_count > 0 else "none"
-
-        y_extra = {
-          "stage_hint": {
-            "cocoon_count": int(cocoon_count),
-            "larva_count": int(larva_count),
-            "has_cocoon": bool(cocoon_count > 0),
-            "has_larva": bool(larva_count > 0),
-            "stage": stage,
-          },
-          "larva_metrics": {
-            "larva_density_area_ratio": float(larva_density_ratio),
-            "larva_bbox_area_px_sum": float(larva_area_px_sum),
-            **({"movement_index": float(movement_index)} if movement_index is not None else {}),
-            **({"motion_score": float(motion_score)} if motion_score is not None else {}),
-            **({"movement_level": movement_level} if movement_level is not None else {}),
-            **({"movement_stage": active_stage_key} if isinstance(active_stage_key, str) and active_stage_key else {}),
-            **(
-              {
-                "movement_thresholds": {
-                  "ideal": list(stage_thresholds.get("ideal")) if stage_thresholds and isinstance(stage_thresholds.get("ideal"), tuple) else None,
-                  "normal": list(stage_thresholds.get("normal")) if stage_thresholds and isinstance(stage_thresholds.get("normal"), tuple) else None,
-                  "risk_low": stage_thresholds.get("risk_low") if stage_thresholds else None,
-                  "stress_high": stage_thresholds.get("stress_high") if stage_thresholds else None,
-                }
-              }
-              if stage_thresholds is not None
-              else {}
-            ),
-          },
-          "molting": molting,
-          "diseased_confirmation": {
-            "window_n": int(window_n),
-            "min_hits": int(diseased_min_hits),
-            "hits": int(hits),
-            "threshold_conf": float(diseased_conf_threshold),
-            "confirmed": bool(confirmed),
-          }
-        }
-
-        y = YoloResult(ts_ms=now_ts_ms, source_frame_ts_ms=pkt.ts_ms, detections=dets, extra=y_extra)
-        with self._lock:
-          self._latest = y
       except Exception:
         time.sleep(0.2)
         continue
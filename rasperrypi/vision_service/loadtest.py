@@ -0,0 +1,466 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+# Scenario file (JSON):
+#
+#   {
+#     "profile": "pi4-4gb",
+#     "duration_sec": 60, "warmup_sec": 10,
+#     "source": {"path": "tray.mp4", "width": 1280, "height": 720},      path: video, image dir or omitted (synthetic)
+#     "model": {"infer_ms": 180, "detections": 8, "labels": ["larva", "cocoon"], "spin": false},
+#     "settings": {"camera_fps": 8, "infer_every_n_frames": 3},             PATCH /config fields
+#     "clients": [
+#       {"name": "dashboards", "endpoint": "/frame.jpg", "count": 4, "rate_hz": 2},
+#       {"name": "pollers", "endpoint": "/yolo/latest.json", "count": 10, "rate_hz": 1},
+#       {"name": "longpoll", "endpoint": "/yolo/latest.json", "count": 3, "mode": "longpoll"},
+#       {"name": "sse", "endpoint": "/yolo/events", "count": 2, "mode": "stream"}
+#     ],
+#     "slo": {"p99_ms": 500, "max_fps_drop": 0.1}                           used by --scale to find the capacity
+#   }
+#
+# Without --target the service runs in a child process (create_app + ReplayFrameSource + StubYoloModel), so the
+# clients do not share its GIL. With --target the same clients run against a real device.
+
+CLIENT_MODES = ("poll", "longpoll", "stream")
+ENGINE_KEYS = (("engine", "result_fps"), ("engine", "result_age_ms"), ("engine", "cycle_ms"), ("engine", "infer_ms"), ("camera", "capture_fps"))
+
+
+@dataclass
+class ClientGroup:
+  name: str
+  endpoint: str
+  count: int = 1
+  rate_hz: float = 0.0
+  mode: str = "poll"
+  timeout_sec: float = 10.0
+
+
+@dataclass
+class Scenario:
+  profile: str = "default"
+  duration_sec: float = 30.0
+  warmup_sec: float = 5.0
+  source: Dict[str, Any] = field(default_factory=dict)
+  model: Dict[str, Any] = field(default_factory=dict)
+  settings: Dict[str, Any] = field(default_factory=dict)
+  clients: List[ClientGroup] = field(default_factory=list)
+  slo: Dict[str, Any] = field(default_factory=dict)
+
+
+def load_scenario(path: str) -> Scenario:
+  with open(path, "r", encoding="utf-8") as f:
+    raw = json.load(f)
+  if not isinstance(raw, dict):
+    raise ValueError("scenario must be a JSON object")
+
+  groups: List[ClientGroup] = []
+  for i, c in enumerate(raw.get("clients") or []):
+    if not isinstance(c, dict) or not isinstance(c.get("endpoint"), str) or not c["endpoint"].startswith("/"):
+      raise ValueError(f"clients[{i}]: endpoint must be a path such as /frame.jpg")
+    mode = str(c.get("mode", "poll"))
+    if mode not in CLIENT_MODES:
+      raise ValueError(f"clients[{i}]: mode must be one of {', '.join(CLIENT_MODES)}")
+    groups.append(
+      ClientGroup(
+        name=str(c.get("name") or f"{mode}:{c['endpoint']}"),
+        endpoint=c["endpoint"],
+        count=max(1, int(c.get("count", 1))),
+        rate_hz=max(0.0, float(c.get("rate_hz", 0.0))),
+        mode=mode,
+        timeout_sec=max(0.5, float(c.get("timeout_sec", 10.0))),
+      )
+    )
+  if not groups:
+    raise ValueError("scenario needs at least one client group")
+
+  return Scenario(
+    profile=str(raw.get("profile", "default")),
+    duration_sec=max(1.0, float(raw.get("duration_sec", 30.0))),
+    warmup_sec=max(0.0, float(raw.get("warmup_sec", 5.0))),
+    source=dict(raw.get("source") or {}),
+    model=dict(raw.get("model") or {}),
+    settings=dict(raw.get("settings") or {}),
+    clients=groups,
+    slo=dict(raw.get("slo") or {}),
+  )
+
+
+def scaled(scenario: Scenario, factor: int) -> Scenario:
+  return replace(scenario, clients=[replace(g, count=g.count * factor) for g in scenario.clients])
+
+
+def within_slo(report: Dict[str, Any], baseline: Dict[str, float], slo: Dict[str, Any]) -> bool:
+  p99_limit = float(slo.get("p99_ms", 500.0))
+  max_drop = float(slo.get("max_fps_drop", 0.1))
+  for g in report["groups"]:
+    if g["errors"]:
+      return False
+    p99 = g["latency_ms"]["p99"]
+    # Long-poll and stream latencies are wait times by design; their freshness is covered by result_age_ms
+    if g["mode"] == "poll" and p99 is not None and p99 > p99_limit:
+      return False
+  base_fps = baseline.get("engine.result_fps")
+  load_fps = report["engine"]["under_load"].get("engine.result_fps")
+  if base_fps and load_fps is not None and load_fps < base_fps * (1.0 - max_drop):
+    return False
+  return True
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+  if not sorted_values:
+    return None
+  k = max(0, min(len(sorted_values) - 1, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+  return float(sorted_values[k])
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+  v = sorted(values)
+  return {
+    "n": len(v),
+    "p50": percentile(v, 50),
+    "p90": percentile(v, 90),
+    "p99": percentile(v, 99),
+    "max": float(v[-1]) if v else None,
+  }
+
+
+def _free_port() -> int:
+  with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    s.bind(("127.0.0.1", 0))
+    return int(s.getsockname()[1])
+
+
+def _serve_stub(scenario: Scenario, port: int) -> None:
+  import uvicorn
+
+  from vision_service import runtime_settings
+  from vision_service.infrastructure.memory_stats import MemoryStats
+  from vision_service.infrastructure.opencv_metric_extractor import OpenCvMetricExtractor
+  from vision_service.infrastructure.replay_source import ReplayFrameSource
+  from vision_service.infrastructure.stub_model import StubYoloModel
+  from vision_service.infrastructure.yolo_engine import UltralyticsYoloEngine
+  from vision_service.presentation.http_api import create_app
+
+  if scenario.settings:
+    _, errors = runtime_settings.STORE.apply(dict(scenario.settings))
+    if errors:
+      raise SystemExit(f"loadtest: invalid settings: {'; '.join(errors)}")
+
+  src = ReplayFrameSource(
+    path=scenario.source.get("path"),
+    width=int(scenario.source.get("width", 0)),
+    height=int(scenario.source.get("height", 0)),
+    max_frames=int(scenario.source.get("max_frames", 300)),
+  )
+  src.start()
+  model = StubYoloModel(
+    infer_ms=float(scenario.model.get("infer_ms", 150.0)),
+    detections=int(scenario.model.get("detections", 6)),
+    labels=scenario.model.get("labels") or ("larva", "cocoon"),
+    spin=bool(scenario.model.get("spin", False)),
+  )
+  engine = UltralyticsYoloEngine(src, metric_extractor=OpenCvMetricExtractor(), model=model)
+  engine.start()
+
+  app = create_app(src, engine, memory=MemoryStats())
+  uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+class _Recorder:
+  def __init__(self) -> None:
+    self.latency_ms: List[float] = []
+    self.freshness_ms: List[float] = []
+    self.errors = 0
+    self.status: Dict[int, int] = {}
+
+  def status_code(self, code: int) -> None:
+    self.status[code] = self.status.get(code, 0) + 1
+
+
+def _now_ms() -> int:
+  return int(time.time() * 1000)
+
+
+async def _poll_client(client, url: str, group: ClientGroup, deadline: float, rec: _Recorder) -> None:
+  loop = asyncio.get_running_loop()
+  interval = 1.0 / group.rate_hz if group.rate_hz > 0 else 0.0
+  next_t = loop.time()
+  while loop.time() < deadline:
+    t0 = time.perf_counter()
+    try:
+      r = await client.get(url)
+      rec.status_code(r.status_code)
+      if r.status_code >= 400:
+        rec.errors += 1
+    except Exception:
+      rec.errors += 1
+    rec.latency_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    if interval > 0:
+      # Fixed schedule; when a request overruns its slot the missed slots are skipped rather than burst
+      next_t = max(next_t + interval, loop.time())
+      await asyncio.sleep(max(0.0, next_t - loop.time()))
+
+
+async def _longpoll_client(client, url: str, group: ClientGroup, deadline: float, rec: _Recorder) -> None:
+  loop = asyncio.get_running_loop()
+  last = -1
+  while loop.time() < deadline:
+    t0 = time.perf_counter()
+    try:
+      r = await client.get(url, params={"after_ts": last, "timeout": group.timeout_sec})
+      rec.status_code(r.status_code)
+      if r.status_code == 200:
+        ts = int(r.json().get("ts_ms", 0))
+        rec.freshness_ms.append(float(_now_ms() - ts))
+        last = ts
+      elif r.status_code >= 400:
+        rec.errors += 1
+        await asyncio.sleep(0.5)
+    except Exception:
+      rec.errors += 1
+      await asyncio.sleep(0.5)
+    rec.latency_ms.append((time.perf_counter() - t0) * 1000.0)
+
+
+async def _stream_client(client, url: str, group: ClientGroup, deadline: float, rec: _Recorder) -> None:
+  loop = asyncio.get_running_loop()
+
+  async def consume() -> None:
+    t0 = time.perf_counter()
+    async with client.stream("GET", url) as r:
+      rec.status_code(r.status_code)
+      rec.latency_ms.append((time.perf_counter() - t0) * 1000.0)
+      async for line in r.aiter_lines():
+        if not line.startswith("data:"):
+          continue
+        try:
+          ts = int(json.loads(line[5:]).get("ts_ms", 0))
+        except Exception:
+          continue
+        rec.freshness_ms.append(float(_now_ms() - ts))
+
+  while loop.time() < deadline:
+    try:
+      await asyncio.wait_for(consume(), timeout=max(0.1, deadline - loop.time()))
+    except asyncio.TimeoutError:
+      return
+    except Exception:
+      rec.errors += 1
+      await asyncio.sleep(0.5)
+
+
+_CLIENTS = {"poll": _poll_client, "longpoll": _longpoll_client, "stream": _stream_client}
+
+
+def _engine_sample(stats: Dict[str, Any]) -> Dict[str, float]:
+  out: Dict[str, float] = {}
+  for section, key in ENGINE_KEYS:
+    v = (stats.get(section) or {}).get(key)
+    if isinstance(v, (int, float)):
+      out[f"{section}.{key}"] = float(v)
+  return out
+
+
+async def _sample_stats(client, base: str, until: float, samples: List[Dict[str, float]]) -> None:
+  loop = asyncio.get_running_loop()
+  while loop.time() < until:
+    try:
+      r = await client.get(f"{base}/stats")
+      if r.status_code == 200:
+        samples.append(_engine_sample(r.json()))
+    except Exception:
+      pass
+    await asyncio.sleep(1.0)
+
+
+def _mean_samples(samples: List[Dict[str, float]]) -> Dict[str, float]:
+  keys = sorted({k for s in samples for k in s})
+  out: Dict[str, float] = {}
+  for k in keys:
+    vals = [s[k] for s in samples if k in s]
+    if vals:
+      out[k] = float(round(sum(vals) / len(vals), 2))
+  return out
+
+
+async def _wait_ready(client, base: str, timeout: float) -> None:
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      r = await client.get(f"{base}/yolo/latest.json")
+      if r.status_code == 200:
+        return
+    except Exception:
+      pass
+    await asyncio.sleep(0.25)
+  raise RuntimeError(f"{base} did not produce a result within {timeout:.0f}s")
+
+
+async def run_scenario(scenario: Scenario, base: str) -> Dict[str, Any]:
+  try:
+    import httpx  # type: ignore
+  except Exception:
+    raise RuntimeError("httpx is required for the load generator (pip install -r requirements-loadtest.txt)")
+
+  total_clients = sum(g.count for g in scenario.clients)
+  limits = httpx.Limits(max_connections=total_clients + 4, max_keepalive_connections=total_clients + 4)
+  async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(30.0, read=None)) as client:
+    await _wait_ready(client, base, timeout=60.0)
+    loop = asyncio.get_running_loop()
+
+    baseline: List[Dict[str, float]] = []
+    if scenario.warmup_sec > 0:
+      await _sample_stats(client, base, loop.time() + scenario.warmup_sec, baseline)
+
+    deadline = loop.time() + scenario.duration_sec
+    under_load: List[Dict[str, float]] = []
+    recorders: Dict[str, _Recorder] = {g.name: _Recorder() for g in scenario.clients}
+
+    async def start_client(group: ClientGroup) -> None:
+      # Spread client start times so they do not fire in lockstep
+      period = 1.0 / group.rate_hz if group.rate_hz > 0 else 0.2
+      await asyncio.sleep(random.uniform(0.0, period))
+      await _CLIENTS[group.mode](client, f"{base}{group.endpoint}", group, deadline, recorders[group.name])
+
+    tasks = [start_client(g) for g in scenario.clients for _ in range(g.count)]
+    await asyncio.gather(_sample_stats(client, base, deadline, under_load), *tasks)
+
+  groups = []
+  for g in scenario.clients:
+    rec = recorders[g.name]
+    groups.append(
+      {
+        "name": g.name,
+        "endpoint": g.endpoint,
+        "mode": g.mode,
+        "clients": g.count,
+        "requests": len(rec.latency_ms),
+        "errors": rec.errors,
+        "status": {str(k): v for k, v in sorted(rec.status.items())},
+        "rps": float(round(len(rec.latency_ms) / scenario.duration_sec, 2)),
+        "latency_ms": _summary(rec.latency_ms),
+        **({"freshness_ms": _summary(rec.freshness_ms)} if rec.freshness_ms else {}),
+      }
+    )
+
+  return {
+    "profile": scenario.profile,
+    "target": base,
+    "duration_sec": scenario.duration_sec,
+    "clients": total_clients,
+    "groups": groups,
+    "engine": {"baseline": _mean_samples(baseline), "under_load": _mean_samples(under_load)},
+  }
+
+
+def _fmt(v: Optional[float]) -> str:
+  return "-" if v is None else f"{v:.1f}"
+
+
+def print_report(report: Dict[str, Any], out=sys.stdout) -> None:
+  print(f"profile {report['profile']}  target {report['target']}  {report['clients']} clients  {report['duration_sec']:.0f}s", file=out)
+  print(f"{'group':<16} {'endpoint':<20} {'mode':<9} {'n':>3} {'req':>7} {'err':>5} {'rps':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}", file=out)
+  for g in report["groups"]:
+    lat = g["latency_ms"]
+    print(
+      f"{g['name'][:16]:<16} {g['endpoint'][:20]:<20} {g['mode']:<9} {g['clients']:>3} {g['requests']:>7} {g['errors']:>5} "
+      f"{g['rps']:>7.1f} {_fmt(lat['p50']):>8} {_fmt(lat['p90']):>8} {_fmt(lat['p99']):>8} {_fmt(lat['max']):>8}",
+      file=out,
+    )
+    fr = g.get("freshness_ms")
+    if fr:
+      print(f"{'':<16} {'  result age':<20} {'':<9} {'':>3} {fr['n']:>7} {'':>5} {'':>7} {_fmt(fr['p50']):>8} {_fmt(fr['p90']):>8} {_fmt(fr['p99']):>8} {_fmt(fr['max']):>8}", file=out)
+
+  base = report["engine"]["baseline"]
+  load = report["engine"]["under_load"]
+  print(f"\n{'engine':<28} {'baseline':>10} {'under load':>12}", file=out)
+  for k in sorted(set(base) | set(load)):
+    print(f"{k:<28} {_fmt(base.get(k)):>10} {_fmt(load.get(k)):>12}", file=out)
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+  p = argparse.ArgumentParser(prog="python -m vision_service.loadtest", description="HTTP load generator for the vision service")
+  p.add_argument("scenario", help="scenario JSON file")
+  p.add_argument("--target", default=None, help="base URL of a running service; default: start a replay/stub service locally")
+  p.add_argument("--json", default=None, help="also write the report as JSON to this file")
+  p.add_argument(
+    "--scale",
+    default=None,
+    help="comma separated client multipliers, e.g. 1,2,4,8; reports the largest one that stays within the scenario slo",
+  )
+  return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+  args = _parse_args(argv)
+  try:
+    scenario = load_scenario(args.scenario)
+  except (OSError, ValueError) as e:
+    print(f"loadtest: {e}", file=sys.stderr)
+    return 2
+
+  server = None
+  base = (args.target or "").rstrip("/")
+  if not base:
+    port = _free_port()
+    server = multiprocessing.get_context("spawn").Process(target=_serve_stub, args=(scenario, port), daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{port}"
+
+  factors = [1]
+  if args.scale:
+    try:
+      factors = sorted({max(1, int(x)) for x in args.scale.split(",") if x.strip()})
+    except ValueError:
+      print("loadtest: --scale must be comma separated integers", file=sys.stderr)
+      return 2
+
+  reports: List[Dict[str, Any]] = []
+  try:
+    baseline: Dict[str, float] = {}
+    for i, factor in enumerate(factors):
+      # The idle baseline is measured once; later steps only need a short settle time
+      step = scaled(scenario, factor) if i == 0 else replace(scaled(scenario, factor), warmup_sec=0.0)
+      report = asyncio.run(run_scenario(step, base))
+      if i == 0:
+        baseline = report["engine"]["baseline"]
+      else:
+        report["engine"]["baseline"] = baseline
+      report["scale"] = factor
+      report["within_slo"] = within_slo(report, baseline, scenario.slo)
+      reports.append(report)
+      print_report(report)
+      print(file=sys.stdout)
+  except RuntimeError as e:
+    print(f"loadtest: {e}", file=sys.stderr)
+    return 1
+  finally:
+    if server is not None:
+      server.terminate()
+      server.join(timeout=5)
+
+  out: Dict[str, Any] = reports[0] if len(reports) == 1 else {"profile": scenario.profile, "steps": reports}
+  if len(reports) > 1:
+    ok = [r for r in reports if r["within_slo"]]
+    capacity = max((r["clients"] for r in ok), default=0)
+    out["capacity_clients"] = capacity
+    print(f"capacity ({scenario.profile}): {capacity} concurrent clients within slo {scenario.slo or {}}")
+  if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+      json.dump(out, f, indent=2)
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
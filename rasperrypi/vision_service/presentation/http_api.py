@@ -1,18 +1,126 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import hmac
+import json
+from typing import Any, Dict, Optional
 
-from fastapi import FastAPI, Response
+from fastapi import Body, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
 from vision_service import config
-from vision_service.application.usecases import get_latest_frame_jpeg, get_latest_yolo_json
+from vision_service.application.usecases import (
+  get_health,
+  get_latest_frame_jpeg,
+  get_latest_yolo_json,
+  get_runtime_config,
+  get_stats,
+  update_runtime_config,
+)
+from vision_service.domain.compact_codec import encode_compact, msgpack_available, pack
+from vision_service.infrastructure.profiler import PROFILER, ProfileBusy, ProfileError, ProfileStalled, dump_threads
 
 
-def create_app(frame_source, yolo_engine) -> FastAPI:
+# Wakes async waiters when the engine publishes a result; notify_threadsafe is called from the engine thread
+class _ResultBroadcast:
+  def __init__(self) -> None:
+    self._loop: Optional[asyncio.AbstractEventLoop] = None
+    self._waiter: Optional[asyncio.Future] = None
+
+  def notify_threadsafe(self, _result: Any = None) -> None:
+    loop = self._loop
+    if loop is None or loop.is_closed():
+      return
+    try:
+      loop.call_soon_threadsafe(self._wake)
+    except RuntimeError:
+      return
+
+  def _wake(self) -> None:
+    w = self._waiter
+    self._waiter = None
+    if w is not None and not w.done():
+      w.set_result(None)
+
+  async def wait(self, timeout: float) -> bool:
+    if self._loop is None:
+      self._loop = asyncio.get_running_loop()
+    if self._waiter is None:
+      self._waiter = self._loop.create_future()
+    try:
+      await asyncio.wait_for(asyncio.shield(self._waiter), timeout=max(0.0, timeout))
+    except asyncio.TimeoutError:
+      return False
+    return True
+
+
+def _parse_ts(raw: Optional[str]) -> Optional[int]:
+  if raw is None:
+    return None
+  try:
+    return int(float(raw))
+  except Exception:
+    return None
+
+
+def _admin_allowed(request: Request) -> bool:
+  # Fails closed: without a configured token the admin endpoints stay disabled
+  if not config.ADMIN_TOKEN:
+    return False
+  # Bytes, not str: compare_digest raises TypeError on non-ASCII str, which would surface as a 500
+  provided = request.headers.get("x-admin-token", "").encode("utf-8")
+  return hmac.compare_digest(provided, config.ADMIN_TOKEN.encode("utf-8"))
+
+
+def compact_response(recent: Dict[int, Dict[str, Any]], y: Dict[str, Any], base_ts: Optional[str], fmt: str) -> Response:
+  # pack() would quietly fall back to JSON; a client asking for something else must not misread the body
+  if fmt not in ("msgpack", "json"):
+    return JSONResponse(status_code=400, content={"ok": False, "error": "format must be msgpack or json"})
+  if fmt == "msgpack" and not msgpack_available():
+    return JSONResponse(status_code=400, content={"ok": False, "error": "msgpack is not installed, use format=json"})
+  ts = int(y["ts_ms"])
+  recent[ts] = y
+  while len(recent) > 8:
+    recent.pop(min(recent))
+
+  base = recent.get(_parse_ts(base_ts)) if base_ts is not None else None
+  if base is not None and int(base["ts_ms"]) == ts:
+    return Response(status_code=304, headers={"cache-control": "no-store"})
+  body, content_type = pack(encode_compact(y, base), fmt)
+  return Response(content=body, media_type=content_type, headers={"cache-control": "no-store"})
+
+
+def create_app(
+  frame_source,
+  yolo_engine,
+  startup: Dict[str, Any] | None = None,
+  governor=None,
+  recorder=None,
+  memory=None,
+) -> FastAPI:
   app = FastAPI(title="KozaTakip RaspberryPi Vision Service")
 
   allow = [o.strip() for o in config.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
+  broadcast = _ResultBroadcast()
+  yolo_engine.subscribe(broadcast.notify_threadsafe)
+  # Recently served results, so /yolo/latest.compact can answer with a delta against what the client already has
+  compact_recent: Dict[int, Dict[str, Any]] = {}
+
+  async def wait_newer(after_ts: int, timeout: float) -> Dict[str, Any] | None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0.0, timeout)
+    while True:
+      y = yolo_engine.latest()
+      if y is not None and int(y.ts_ms) > after_ts:
+        out = get_latest_yolo_json(yolo_engine, frame_source)
+        if out is not None:
+          return out
+      remaining = deadline - loop.time()
+      if remaining <= 0:
+        return None
+      await broadcast.wait(remaining)
+
   app.add_middleware(
     CORSMiddleware,
     allow_origins=allow if allow else ["*"],
@@ -23,7 +131,7 @@ def create_app(frame_source, yolo_engine) -> FastAPI:
 
   @app.get("/health")
   def health():
-    return {"ok": True}
+    return get_health(yolo_engine, frame_source, startup, governor)
 
   @app.get("/frame.jpg")
   def frame_jpeg():
@@ -33,11 +141,54 @@ def create_app(frame_source, yolo_engine) -> FastAPI:
     return Response(content=b, media_type="image/jpeg", headers={"cache-control": "no-store"})
 
   @app.get("/yolo/latest.json")
-  def yolo_latest():
+  async def yolo_latest(after_ts: Optional[str] = None, timeout: Optional[float] = None):
+    after = _parse_ts(after_ts)
+    if after is None:
+      y = get_latest_yolo_json(yolo_engine, frame_source)
+      if not y:
+        return Response(status_code=404)
+      return y
+
+    wait_sec = float(config.LONGPOLL_MAX_SEC) if timeout is None else min(max(0.0, float(timeout)), float(config.LONGPOLL_MAX_SEC))
+    y = await wait_newer(after, wait_sec)
+    if not y:
+      return Response(status_code=204, headers={"cache-control": "no-store"})
+    return JSONResponse(content=y, headers={"cache-control": "no-store"})
+
+  @app.get("/yolo/latest.compact")
+  async def yolo_latest_compact(base_ts: Optional[str] = None, format: str = "msgpack"):
     y = get_latest_yolo_json(yolo_engine, frame_source)
     if not y:
       return Response(status_code=404)
-    return y
+    return compact_response(compact_recent, y, base_ts, format)
+
+  @app.get("/yolo/events")
+  async def yolo_events(request: Request, after_ts: Optional[str] = None):
+    last = _parse_ts(request.headers.get("last-event-id"))
+    if last is None:
+      last = _parse_ts(after_ts)
+    if last is None:
+      last = -1
+
+    async def stream():
+      nonlocal last
+      yield "retry: 3000\n\n"
+      while True:
+        if await request.is_disconnected():
+          return
+        y = await wait_newer(last, float(config.SSE_KEEPALIVE_SEC))
+        if y is None:
+          yield ": keepalive\n\n"
+          continue
+        last = int(y["ts_ms"])
+        data = json.dumps(y, separators=(",", ":"))
+        yield f"id: {last}\nevent: yolo\ndata: {data}\n\n"
+
+    return StreamingResponse(
+      stream(),
+      media_type="text/event-stream",
+      headers={"cache-control": "no-store", "x-accel-buffering": "no"},
+    )
 
   @app.post("/config/stage")
   def set_stage(payload: Any):
@@ -49,4 +200,76 @@ def create_app(frame_source, yolo_engine) -> FastAPI:
     config.ACTIVE_STAGE = stage.strip()
     return {"ok": True, "stage": config.ACTIVE_STAGE}
 
+  @app.get("/config")
+  def runtime_config():
+    return get_runtime_config(yolo_engine, frame_source)
+
+  @app.patch("/config")
+  def patch_runtime_config(request: Request, payload: Any = Body(default=None)):
+    if not _admin_allowed(request):
+      return Response(status_code=403)
+    out, errors = update_runtime_config(payload, yolo_engine, frame_source)
+    if errors:
+      return JSONResponse(status_code=400, content={"ok": False, "errors": errors})
+    return {"ok": True, **out}
+
+  @app.get("/stats")
+  def stats():
+    return get_stats(yolo_engine, frame_source, memory)
+
+  @app.get("/recordings")
+  def recordings():
+    if recorder is None:
+      return {"enabled": False, "items": []}
+    return {**recorder.status(), "items": recorder.list_recordings()}
+
+  @app.get("/recordings/{rec_id}/{name}")
+  def recording_file(rec_id: str, name: str):
+    path = recorder.recording_file(rec_id, name) if recorder is not None else None
+    if not path:
+      return Response(status_code=404)
+    media = "application/json" if name.endswith(".json") else "image/jpeg"
+    return FileResponse(path, media_type=media)
+
+  @app.post("/model/reload")
+  def reload_model(request: Request, payload: Any = Body(default=None)):
+    if not _admin_allowed(request):
+      return Response(status_code=403)
+    path = None
+    if isinstance(payload, dict) and isinstance(payload.get("path"), str) and payload.get("path").strip():
+      path = payload.get("path").strip()
+    result = yolo_engine.reload_model(path)
+    if not result.get("ok"):
+      return JSONResponse(status_code=409, content=result)
+    return result
+
+  # Blocks for the requested duration, so it stays a sync endpoint and runs in the threadpool
+  @app.get("/debug/profile")
+  def debug_profile(
+    request: Request,
+    seconds: float = 10.0,
+    target: str = "engine",
+    mode: str = "sample",
+    format: str = "pstats",
+    interval_ms: float = 5.0,
+    limit: int = 60,
+  ):
+    if not _admin_allowed(request):
+      return Response(status_code=403)
+    try:
+      text = PROFILER.profile(target, seconds, mode=mode, fmt=format, interval_ms=interval_ms, limit=limit)
+    except ProfileBusy as e:
+      return PlainTextResponse(str(e), status_code=409)
+    except ProfileStalled as e:
+      return PlainTextResponse(str(e), status_code=504)
+    except ProfileError as e:
+      return PlainTextResponse(str(e), status_code=400)
+    return PlainTextResponse(text, headers={"cache-control": "no-store"})
+
+  @app.get("/debug/threads")
+  def debug_threads(request: Request):
+    if not _admin_allowed(request):
+      return Response(status_code=403)
+    return PlainTextResponse(dump_threads(), headers={"cache-control": "no-store"})
+
   return app
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+
+from vision_service import config
+from vision_service.infrastructure.shm_bus import ShmBusReader
+from vision_service.presentation.http_api import _parse_ts, compact_response
+
+_NO_STORE = {"cache-control": "no-store"}
+
+
+# Read-only app served from the shared-memory segments published by the capture/inference process.
+# Safe to run as N uvicorn workers (uvicorn --factory vision_service.presentation.shm_app:create_shm_app).
+# Control endpoints (PATCH /config, /model/reload, /recordings) stay on the producer's own app.
+def create_shm_app(reader: ShmBusReader | None = None) -> FastAPI:
+  app = FastAPI(title="KozaTakip RaspberryPi Vision Service (shm reader)")
+  bus = reader or ShmBusReader()
+  poll_sec = max(0.001, float(config.SHM_POLL_MS) / 1000.0)
+  compact_recent: Dict[int, Dict[str, Any]] = {}
+
+  async def wait_newer(after_ts: int, timeout: float) -> Optional[Tuple[int, bytes]]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0.0, timeout)
+    while True:
+      head = bus.result_header()
+      if head is not None and head[1] > after_ts:
+        got = bus.latest_result_bytes()
+        if got is not None:
+          return got
+      remaining = deadline - loop.time()
+      if remaining <= 0:
+        return None
+      await asyncio.sleep(min(poll_sec, remaining))
+
+  allow = [o.strip() for o in config.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
+  app.add_middleware(
+    CORSMiddleware,
+    allow_origins=allow if allow else ["*"],
+    allow_credentials=False,
+    allow_methods=["*"],
+    allow_headers=["*"],
+  )
+
+  @app.get("/health")
+  def health():
+    b = bus.health_bytes()
+    if b is None:
+      return Response(content=b'{"ok":false,"ready":false,"producer":"unavailable"}', status_code=503, media_type="application/json")
+    return Response(content=b, media_type="application/json", headers=_NO_STORE)
+
+  @app.get("/stats")
+  def stats():
+    b = bus.stats_bytes()
+    if b is None:
+      return Response(status_code=503)
+    return Response(content=b, media_type="application/json", headers=_NO_STORE)
+
+  @app.get("/frame.jpg")
+  def frame_jpeg():
+    pkt = bus.latest_frame()
+    if pkt is None:
+      return Response(status_code=404)
+    return Response(content=pkt.jpeg_bytes, media_type="image/jpeg", headers=_NO_STORE)
+
+  @app.get("/yolo/latest.json")
+  async def yolo_latest(after_ts: Optional[str] = None, timeout: Optional[float] = None):
+    after = _parse_ts(after_ts)
+    if after is None:
+      got = bus.latest_result_bytes()
+      if got is None:
+        return Response(status_code=404)
+      return Response(content=got[1], media_type="application/json")
+
+    wait_sec = float(config.LONGPOLL_MAX_SEC) if timeout is None else min(max(0.0, float(timeout)), float(config.LONGPOLL_MAX_SEC))
+    got = await wait_newer(after, wait_sec)
+    if got is None:
+      return Response(status_code=204, headers=_NO_STORE)
+    return Response(content=got[1], media_type="application/json", headers=_NO_STORE)
+
+  @app.get("/yolo/latest.compact")
+  async def yolo_latest_compact(base_ts: Optional[str] = None, format: str = "msgpack"):
+    y = bus.latest_result()
+    if not y:
+      return Response(status_code=404)
+    return compact_response(compact_recent, y, base_ts, format)
+
+  @app.get("/yolo/events")
+  async def yolo_events(request: Request, after_ts: Optional[str] = None):
+    last = _parse_ts(request.headers.get("last-event-id"))
+    if last is None:
+      last = _parse_ts(after_ts)
+    if last is None:
+      last = -1
+
+    async def stream():
+      nonlocal last
+      yield "retry: 3000\n\n"
+      while True:
+        if await request.is_disconnected():
+          return
+        got = await wait_newer(last, float(config.SSE_KEEPALIVE_SEC))
+        if got is None:
+          yield ": keepalive\n\n"
+          continue
+        last = int(got[0])
+        yield f"id: {last}\nevent: yolo\ndata: {got[1].decode('utf-8')}\n\n"
+
+    return StreamingResponse(
+      stream(),
+      media_type="text/event-stream",
+      headers={"cache-control": "no-store", "x-accel-buffering": "no"},
+    )
+
+  return app
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from vision_service import config
+
+
+@dataclass(frozen=True)
+class RuntimeSettings:
+  version: int
+  camera_fps: float
+  camera_width: int
+  camera_height: int
+  jpeg_quality: int
+  infer_every_n_frames: int
+  yolo_conf: float
+  yolo_iou: float
+  yolo_imgsz: int = 0
+  throttle_level: int = 0
+  throttle: str = "normal"
+
+
+@dataclass(frozen=True)
+class ThrottleLevel:
+  level: int
+  name: str
+  fps_scale: float
+  infer_every_mult: int
+  jpeg_quality_max: int
+
+
+THROTTLE_LEVELS: List[ThrottleLevel] = [
+  ThrottleLevel(level=0, name="normal", fps_scale=1.0, infer_every_mult=1, jpeg_quality_max=100),
+  ThrottleLevel(level=1, name="warm", fps_scale=0.75, infer_every_mult=2, jpeg_quality_max=75),
+  ThrottleLevel(level=2, name="hot", fps_scale=0.5, infer_every_mult=3, jpeg_quality_max=65),
+  ThrottleLevel(level=3, name="critical", fps_scale=0.25, infer_every_mult=5, jpeg_quality_max=50),
+]
+
+
+# field -> (type, min, max)
+_FIELDS: Dict[str, Tuple[type, float, float]] = {
+  "camera_fps": (float, 0.5, 60.0),
+  "camera_width": (int, 160, 4096),
+  "camera_height": (int, 120, 4096),
+  "jpeg_quality": (int, 10, 100),
+  "infer_every_n_frames": (int, 1, 100),
+  "yolo_conf": (float, 0.01, 0.99),
+  "yolo_iou": (float, 0.01, 0.99),
+  "yolo_imgsz": (int, 0, 1920),
+}
+
+
+def _from_config() -> RuntimeSettings:
+  return RuntimeSettings(
+    version=1,
+    camera_fps=max(0.5, float(config.CAMERA_FPS)),
+    camera_width=int(config.CAMERA_WIDTH),
+    camera_height=int(config.CAMERA_HEIGHT),
+    jpeg_quality=int(max(10, min(100, config.JPEG_QUALITY))),
+    infer_every_n_frames=max(1, int(config.YOLO_INFER_EVERY_N_FRAMES)),
+    yolo_conf=float(config.YOLO_CONF),
+    yolo_iou=float(config.YOLO_IOU),
+    yolo_imgsz=max(0, int(config.YOLO_IMGSZ)),
+  )
+
+
+def _throttled(base: RuntimeSettings, t: ThrottleLevel | None) -> RuntimeSettings:
+  if t is None or t.level <= 0:
+    return base
+  return replace(
+    base,
+    camera_fps=max(0.5, float(base.camera_fps) * float(t.fps_scale)),
+    infer_every_n_frames=int(base.infer_every_n_frames) * int(t.infer_every_mult),
+    jpeg_quality=min(int(base.jpeg_quality), int(t.jpeg_quality_max)),
+    throttle_level=int(t.level),
+    throttle=t.name,
+  )
+
+
+def settings_to_dict(s: RuntimeSettings) -> Dict[str, Any]:
+  return asdict(s)
+
+
+def validate_patch(patch: Any) -> Tuple[Dict[str, Any], List[str]]:
+  errors: List[str] = []
+  changes: Dict[str, Any] = {}
+  if not isinstance(patch, dict) or not patch:
+    return changes, ["body must be a non-empty object"]
+
+  for key, raw in patch.items():
+    spec = _FIELDS.get(key)
+    if spec is None:
+      errors.append(f"{key}: unknown setting")
+      continue
+    typ, lo, hi = spec
+    if isinstance(raw, bool) or not isinstance(raw, (int, float)):
+      errors.append(f"{key}: must be a number")
+      continue
+    if not math.isfinite(raw):
+      errors.append(f"{key}: must be a finite number")
+      continue
+    if typ is int and float(raw) != int(raw):
+      errors.append(f"{key}: must be an integer")
+      continue
+    v = typ(raw)
+    if v < lo or v > hi:
+      errors.append(f"{key}: must be between {lo:g} and {hi:g}")
+      continue
+    changes[key] = v
+
+  return changes, errors
+
+
+class RuntimeSettingsStore:
+  def __init__(self, initial: RuntimeSettings | None = None) -> None:
+    self._lock = threading.Lock()
+    self._base = initial if initial is not None else _from_config()
+    self._throttle: Optional[ThrottleLevel] = None
+    self._current = self._base
+    self._last_change: Optional[Dict[str, Any]] = None
+
+  def get(self) -> RuntimeSettings:
+    return self._current
+
+  def base(self) -> RuntimeSettings:
+    return self._base
+
+  def set_throttle(self, t: ThrottleLevel | None) -> RuntimeSettings:
+    with self._lock:
+      self._throttle = t
+      self._current = _throttled(self._base, t)
+      return self._current
+
+  def last_change(self) -> Optional[Dict[str, Any]]:
+    with self._lock:
+      return dict(self._last_change) if self._last_change else None
+
+  def apply(self, patch: Any, expected_version: int | None = None, stats_before: Dict[str, Any] | None = None) -> Tuple[RuntimeSettings, List[str]]:
+    changes, errors = validate_patch(patch)
+    with self._lock:
+      cur = self._base
+      if expected_version is not None and int(expected_version) != cur.version:
+        errors.append(f"version: expected {cur.version}")
+      if errors:
+        return cur, errors
+
+      changed = {k: v for k, v in changes.items() if getattr(cur, k) != v}
+      if not changed:
+        return cur, []
+
+      nxt = replace(cur, version=cur.version + 1, **changed)
+      self._base = nxt
+      self._current = _throttled(nxt, self._throttle)
+      self._last_change = {
+        "version": nxt.version,
+        "ts_ms": int(time.time() * 1000),
+        "changed": {k: {"from": getattr(cur, k), "to": v} for k, v in changed.items()},
+        **({"stats_before": stats_before} if stats_before else {}),
+      }
+      return nxt, []
+
+
+STORE = RuntimeSettingsStore()
+
+
+def current() -> RuntimeSettings:
+  return STORE.get()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import argparse
+from typing import List, Optional
+
+import uvicorn
+
+from vision_service import config
+
+
+# Serves the read-only endpoints from the shared-memory segments of an already running
+# `python -m vision_service` (started with KOZA_SHM_ENABLED=1), e.g. on another port or with more workers.
+def main(argv: Optional[List[str]] = None) -> int:
+  p = argparse.ArgumentParser(prog="python -m vision_service.serve", description="Serve frames/results from shared memory")
+  p.add_argument("--host", default=config.BIND_HOST)
+  p.add_argument("--port", type=int, default=config.BIND_PORT)
+  p.add_argument("--workers", type=int, default=max(1, int(config.HTTP_WORKERS)))
+  args = p.parse_args(argv)
+
+  uvicorn.run(
+    "vision_service.presentation.shm_app:create_shm_app",
+    factory=True,
+    host=args.host,
+    port=int(args.port),
+    workers=max(1, int(args.workers)),
+  )
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())